@@ -32,10 +32,12 @@ import numpy as np
 
 # package modules
 from aeolis.utils import *
+import aeolis.kernels
 
 # initialize logger
 logger = logging.getLogger(__name__)
 
+@process(outputs=['theta_stat', 'theta_dyn'])
 def angele_of_repose(s,p):
     '''Determine the dynamic and static angle of repose.
     
@@ -72,6 +74,8 @@ def angele_of_repose(s,p):
     return s
 
 
+@process(inputs=['zb', 'zne', 'ds', 'dn', 'theta_stat', 'theta_dyn'],
+         outputs=['zb', 'gradh'])
 def avalanche(s, p):
     '''Avalanching occurs if bed slopes exceed critical slopes.
     
@@ -79,6 +83,12 @@ def avalanche(s, p):
     of a critical static slope ``theta_stat`` by the bed slope. The iteration
     stops if the bed slope does not exceed the dynamic critical slope
     ``theta_dyn``.
+
+    The iteration is computed by :func:`relax`, which only updates the
+    slip faces, or by the compiled kernel
+    :func:`aeolis.kernels.avalanche` if Numba is available. The number
+    of iterations and the number of cells with a changed bed level are
+    stored in ``p['_avalanche']``.
     
     Parameters
     ----------
@@ -105,12 +115,18 @@ def avalanche(s, p):
         
 
 
-        E = 0.2
-
-        grad_h_down = np.zeros((ny,nx,4))
-        flux_down = np.zeros((ny,nx,4))
-        slope_diff = np.zeros((ny,nx))
-        grad_h = np.zeros((ny,nx))
+        if p['method_avalanche'] == 'explicit':
+            # relax all cells simultaneously with a fixed factor
+            E = 0.2
+            colors = [None]
+        elif p['method_avalanche'] == 'redblack':
+            # relax cells in a checkerboard pattern, alternating
+            # between the red and black cells, with a factor
+            # proportional to the grid spacing
+            E = p['relax_avalanche'] * min(np.min(s['ds']), np.min(s['dn']))
+            colors = [0, 1]
+        else:
+            logger.log_and_raise('Unknown avalanching method [%s]' % p['method_avalanche'], exc=ValueError)
 
         max_iter_ava = p['max_iter_ava']
         
@@ -122,75 +138,327 @@ def avalanche(s, p):
 
         initiate_avalanche = (max_grad_h > tan_stat) 
 
+        n_iter = 0
+        n_cells = 0
+
         if initiate_avalanche:
 
-            for i in range(0,max_iter_ava):
-
-                grad_h_down *= 0.
-                flux_down *= 0.
-                slope_diff *= 0.
-                grad_h *= 0.
-
-                max_grad_h, grad_h, grad_h_down = calc_gradients(s['zb'], nx, ny, s['ds'], s['dn'], s[ 'zne'])
-
-                if max_grad_h < tan_dyn:
-                    break
-
-                # Calculation of flux
-
-                grad_h_nonerod = (s['zb'] - s['zne']) / s['ds'] # HAS TO BE ADJUSTED!    
-				
-                ix = np.logical_and(grad_h > tan_dyn, grad_h_nonerod > 0)
-                slope_diff[ix] = np.tanh(grad_h[ix]) - np.tanh(0.9*tan_dyn)    
-                
-                ix = grad_h_nonerod < grad_h - tan_dyn 
-                slope_diff[ix] = np.tanh(grad_h_nonerod[ix])				                    
-
-                ix = grad_h != 0
-                
-                if ny == 1:
-                    #1D interpretation
-                    flux_down[:,:,0][ix] = slope_diff[ix] * grad_h_down[:,:,0][ix] / grad_h[ix]
-                    flux_down[:,:,2][ix] = slope_diff[ix] * grad_h_down[:,:,2][ix] / grad_h[ix]
-                    
-                    # Calculation of change in bed level
-                    
-                    q_in = np.zeros((ny,nx))
-                    
-                    q_out = 0.5*np.abs(flux_down[:,:,0]) + 0.5*np.abs(flux_down[:,:,2])
-                    
-                    q_in[0,1:-1] =   0.5*(np.maximum(flux_down[0,:-2,0],0.) \
-                                        - np.minimum(flux_down[0,2:,0],0.) \
-                                        + np.maximum(flux_down[0,2:,2],0.) \
-                                        - np.minimum(flux_down[0,:-2,2],0.))
-                else:
-                    # 2D interpretation
-                    flux_down[:,:,0][ix] = slope_diff[ix] * grad_h_down[:,:,0][ix] / grad_h[ix]
-                    flux_down[:,:,1][ix] = slope_diff[ix] * grad_h_down[:,:,1][ix] / grad_h[ix]
-                    flux_down[:,:,2][ix] = slope_diff[ix] * grad_h_down[:,:,2][ix] / grad_h[ix]
-                    flux_down[:,:,3][ix] = slope_diff[ix] * grad_h_down[:,:,3][ix] / grad_h[ix]
-
-                    # Calculation of change in bed level
-
-                    q_in = np.zeros((ny,nx))
-
-                    q_out = 0.5*np.abs(flux_down[:,:,0]) + 0.5* np.abs(flux_down[:,:,1]) + 0.5*np.abs(flux_down[:,:,2]) + 0.5* np.abs(flux_down[:,:,3])
-
-                    q_in[1:-1,1:-1] =   0.5*(np.maximum(flux_down[1:-1,:-2,0],0.) \
-                                        - np.minimum(flux_down[1:-1,2:,0],0.) \
-                                        + np.maximum(flux_down[:-2,1:-1,1],0.) \
-                                        - np.minimum(flux_down[2:,1:-1,1],0.) \
-
-                                        + np.maximum(flux_down[1:-1,2:,2],0.) \
-                                        - np.minimum(flux_down[1:-1,:-2,2],0.) \
-                                        + np.maximum(flux_down[2:,1:-1,3],0.) \
-                                        - np.minimum(flux_down[:-2,1:-1,3],0.))
-
-                s['zb'] += E * (q_in - q_out)
+            zb0 = s['zb'].copy()
+
+            if aeolis.kernels.use_jit(p) and np.ndim(tan_dyn) == 0:
+                n_iter = aeolis.kernels.avalanche(s['zb'], s['zne'], s['ds'], s['dn'], float(tan_dyn),
+                                                  E, len(colors), max_iter_ava, ny == 1)
+            else:
+                n_iter = relax(s, grad_h, grad_h_down, tan_dyn, E, colors, max_iter_ava)
+
+            n_cells = np.sum(s['zb'] != zb0)
+
+            logger.debug('Avalanching in %d iterations affected %d cells' % (n_iter, n_cells))
+
+        p['_avalanche'] = dict(iterations=n_iter, cells=n_cells)
 
     return s	    
 
 
+def relax(s, grad_h, grad_h_down, tan_dyn, E, colors, max_iter_ava):
+    '''Relax bed slopes steeper than the dynamic critical slope
+
+    After the first iteration, only the bounding box around the cells
+    with a non-zero avalanching flux, extended with the cells that
+    can be affected by it, is updated. The bed level is updated in
+    place.
+
+    Parameters
+    ----------
+    s : dict
+        Spatial grids
+    grad_h : numpy.ndarray
+        Bed slope
+    grad_h_down : numpy.ndarray
+        Downslope gradients in 4 different directions
+    tan_dyn : float or numpy.ndarray
+        Dynamic critical bed slope
+    E : float
+        Relaxation factor
+    colors : list
+        Colors in which cells are relaxed, ``[None]`` for simultaneous
+        and ``[0, 1]`` for red-black relaxation
+    max_iter_ava : int
+        Maximum number of iterations
+
+    Returns
+    -------
+    int
+        Number of iterations
+
+    '''
+
+    ny, nx = s['zb'].shape
+    n_iter = 0
+
+    max_grad_h = np.max(grad_h)
+
+    # start with entire grid
+    window = (slice(0, ny), slice(0, nx))
+    grad_h_window = grad_h
+    first = True
+    converged = False
+
+    for i in range(0,max_iter_ava):
+
+        relaxed = False
+
+        for color in colors:
+
+            if not first:
+
+                # update gradients in window, except for the edges
+                # of the window that are not at the edges of the
+                # grid, as these lack neighbouring cells
+                ny_window, nx_window = s['zb'][window].shape
+                _, grad_h_window, grad_h_down = calc_gradients(s['zb'][window], nx_window, ny_window,
+                                                               s['ds'][window], s['dn'][window], s['zne'][window])
+                inner, inner_window = get_inner(window, (ny, nx))
+                grad_h[inner] = grad_h_window[inner_window]
+                max_grad_h = np.max(grad_h)
+
+            first = False
+
+            if max_grad_h < tan_dyn:
+                converged = True
+                break
+
+            # Calculation of flux
+
+            flux_down = calc_fluxes(s['zb'][window], s['zne'][window], s['ds'][window],
+                                    grad_h_window, grad_h_down, get_window(tan_dyn, window))
+
+            ix = np.any(flux_down != 0., axis=2)
+            if not np.any(ix):
+                converged = True
+                break
+
+            # only cells of the current color release sediment
+            if color is not None:
+                flux_down[get_parity(window) != color,:] = 0.
+
+            # Calculation of change in bed level
+
+            s['zb'][window] += E * calc_change(flux_down, ny == 1)
+            relaxed = True
+
+            # bed levels change in cells with non-zero flux and
+            # their neighbours, which affects the gradients and
+            # fluxes up to two cells further and the change in bed
+            # level in the next iteration up to three cells further
+            window = get_bbox(ix, window, pad=4, shape=(ny, nx))
+
+        if relaxed:
+            n_iter += 1
+
+        if converged:
+            break
+
+    return n_iter
+
+
+def calc_fluxes(zb, zne, ds, grad_h, grad_h_down, tan_dyn):
+    '''Calculates the avalanching fluxes in 4 different directions
+
+    Parameters
+    ----------
+    zb : numpy.ndarray
+        Bed level
+    zne : numpy.ndarray
+        Level of non-erodible layer
+    ds : numpy.ndarray
+        Grid spacing in x-direction
+    grad_h : numpy.ndarray
+        Bed slope
+    grad_h_down : numpy.ndarray
+        Downslope gradients in 4 different directions
+    tan_dyn : float or numpy.ndarray
+        Dynamic critical bed slope
+
+    Returns
+    -------
+    numpy.ndarray
+        Downslope fluxes in 4 different directions
+
+    '''
+
+    slope_diff = np.zeros(zb.shape)
+    flux_down = np.zeros(grad_h_down.shape)
+
+    grad_h_nonerod = (zb - zne) / ds # HAS TO BE ADJUSTED!    
+
+    ix = np.logical_and(grad_h > tan_dyn, grad_h_nonerod > 0)
+    slope_diff[ix] = np.tanh(grad_h[ix]) - np.tanh(0.9*get_window(tan_dyn, ix))
+
+    ix = grad_h_nonerod < grad_h - tan_dyn 
+    slope_diff[ix] = np.tanh(grad_h_nonerod[ix])
+
+    ix = grad_h != 0
+
+    if zb.shape[0] == 1:
+        #1D interpretation
+        directions = [0, 2]
+    else:
+        # 2D interpretation
+        directions = [0, 1, 2, 3]
+
+    for j in directions:
+        flux_down[:,:,j][ix] = slope_diff[ix] * grad_h_down[:,:,j][ix] / grad_h[ix]
+
+    return flux_down
+
+
+def calc_change(flux_down, is1d=False):
+    '''Calculates the change in bed level due to avalanching fluxes
+
+    Parameters
+    ----------
+    flux_down : numpy.ndarray
+        Downslope fluxes in 4 different directions
+    is1d : bool, optional
+        Use 1D interpretation (default: False)
+
+    Returns
+    -------
+    numpy.ndarray
+        Change in bed level
+
+    '''
+
+    q_in = np.zeros(flux_down.shape[:2])
+
+    if is1d:
+        #1D interpretation
+        q_out = 0.5*np.abs(flux_down[:,:,0]) + 0.5*np.abs(flux_down[:,:,2])
+
+        q_in[0,1:-1] =   0.5*(np.maximum(flux_down[0,:-2,0],0.) \
+                            - np.minimum(flux_down[0,2:,0],0.) \
+                            + np.maximum(flux_down[0,2:,2],0.) \
+                            - np.minimum(flux_down[0,:-2,2],0.))
+    else:
+        # 2D interpretation
+        q_out = 0.5*np.abs(flux_down[:,:,0]) + 0.5* np.abs(flux_down[:,:,1]) + 0.5*np.abs(flux_down[:,:,2]) + 0.5* np.abs(flux_down[:,:,3])
+
+        q_in[1:-1,1:-1] =   0.5*(np.maximum(flux_down[1:-1,:-2,0],0.) \
+                            - np.minimum(flux_down[1:-1,2:,0],0.) \
+                            + np.maximum(flux_down[:-2,1:-1,1],0.) \
+                            - np.minimum(flux_down[2:,1:-1,1],0.) \
+
+                            + np.maximum(flux_down[1:-1,2:,2],0.) \
+                            - np.minimum(flux_down[1:-1,:-2,2],0.) \
+                            + np.maximum(flux_down[2:,1:-1,3],0.) \
+                            - np.minimum(flux_down[:-2,1:-1,3],0.))
+
+    return q_in - q_out
+
+
+def get_bbox(ix, window, pad, shape):
+    '''Padded bounding box of cells within a window
+
+    Parameters
+    ----------
+    ix : numpy.ndarray
+        Boolean mask of cells within window
+    window : tuple of slices
+        Window in grid
+    pad : int
+        Number of cells to extend the bounding box with
+    shape : tuple
+        Shape of grid
+
+    Returns
+    -------
+    tuple of slices
+        Padded bounding box in grid clipped to grid
+
+    '''
+
+    bbox = []
+    for axis, (w, n) in enumerate(zip(window, shape)):
+        jx = np.flatnonzero(np.any(ix, axis=1-axis)) + w.start
+        bbox.append(slice(max(jx[0] - pad, 0), min(jx[-1] + pad + 1, n)))
+
+    return tuple(bbox)
+
+
+def get_inner(window, shape):
+    '''Window without the edges that are not at the edge of the grid
+
+    Parameters
+    ----------
+    window : tuple of slices
+        Window in grid
+    shape : tuple
+        Shape of grid
+
+    Returns
+    -------
+    tuple of slices
+        Inner window in grid
+    tuple of slices
+        Inner window relative to window
+
+    '''
+
+    inner = []
+    inner_window = []
+    for w, n in zip(window, shape):
+        start = w.start if w.start == 0 else w.start + 1
+        stop = w.stop if w.stop == n or n == 1 else w.stop - 1
+        inner.append(slice(start, stop))
+        inner_window.append(slice(start - w.start, stop - w.start))
+
+    return tuple(inner), tuple(inner_window)
+
+
+def get_parity(window):
+    '''Checkerboard pattern of cells in window
+
+    Parameters
+    ----------
+    window : tuple of slices
+        Window in grid
+
+    Returns
+    -------
+    numpy.ndarray
+        Zero for red cells and one for black cells in window
+
+    '''
+
+    rows = np.arange(window[0].start, window[0].stop)
+    cols = np.arange(window[1].start, window[1].stop)
+
+    return (rows[:,np.newaxis] + cols[np.newaxis,:]) % 2
+
+
+def get_window(x, window):
+    '''Window of spatially varying parameter
+
+    Parameters
+    ----------
+    x : float or numpy.ndarray
+        Spatially uniform or varying parameter
+    window : tuple of slices or numpy.ndarray
+        Window or mask in grid
+
+    Returns
+    -------
+    float or numpy.ndarray
+        Parameter in window
+
+    '''
+
+    if np.ndim(x) == 0:
+        return x
+    return x[window]
+
+
 def calc_gradients(zb, nx, ny, ds, dn, zne):
     '''Calculates the downslope gradients in the bed that are needed for
     avalanching module
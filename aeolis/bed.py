@@ -91,6 +91,10 @@ def initialize(s, p):
     # initialize bathymetry
     s['zb'][:,:] = p['bed_file']
     s['zb0'][:,:] = p['bed_file']
+
+    # initialize non-erodible layer
+    if p['process_nelayer'] or p['th_nelayer']:
+        s['zne'][:,:] = p['ne_file']
     
     #initialize thickness of erodable or dry top layer
     s['zdry'][:,:] = 0.05
@@ -125,6 +129,8 @@ def initialize(s, p):
     return s
 
 
+@process(inputs=['Hs', 'thlyr', 'mass'],
+         outputs=['mass'])
 def mixtoplayer(s, p):
     '''Mix grain size distribution in top layer of the bed.
 
@@ -159,42 +165,46 @@ def mixtoplayer(s, p):
         nl = p['nlayers']
         nf = p['nfractions']
 
-        # compute depth of disturbance for each cell and repeat for each layer
+        # compute depth of disturbance for each cell
         DOD = p['facDOD'] * s['Hs']
 
-        # compute ratio total layer thickness and depth of disturbance 
-        ix = DOD > 0.
-        f = np.ones(DOD.shape)
-        f[ix] = np.minimum(1., s['thlyr'].sum(axis=2)[ix] / DOD[ix])
+        # mixing only occurs in cells affected by waves, so the
+        # mixing is computed on the packed wave-affected cells only
+        ix_wav = np.flatnonzero(DOD > 0.)
+        if ix_wav.size == 0:
+            return s
 
-        # correct shapes
-        DOD = DOD[:,:,np.newaxis].repeat(nl, axis=2)
-        f = f[:,:,np.newaxis].repeat(nl, axis=2)
+        DOD = DOD.reshape((-1,1))[ix_wav,:]
+        thlyr = s['thlyr'].reshape((-1,nl))[ix_wav,:]
+
+        # compute ratio total layer thickness and depth of disturbance 
+        f = np.minimum(1., thlyr.sum(axis=1, keepdims=True) / DOD)
+        f = f[:,:,np.newaxis]
 
         # determine what layers are above the depth of disturbance
-        ix = (s['thlyr'].cumsum(axis=2) <= DOD) & (DOD > 0.)
-        ix = ix[:,:,:,np.newaxis].repeat(nf, axis=3)
-        f = f[:,:,:,np.newaxis].repeat(nf, axis=3)
+        ix = thlyr.cumsum(axis=1) <= DOD
         
         # average mass over layers
         if np.any(ix):
-            ix[:,:,0,:] = True # at least mix the top layer
-            mass = s['mass'].copy()
-            mass[~ix] = np.nan
-            
+            ix[:,0] = True # at least mix the top layer
+            ix = ix[:,:,np.newaxis]
+
+            mass = s['mass'].reshape((-1,nl,nf))
+            m = mass[ix_wav,:,:]
+
             gd = normalize(p['grain_dist']) * p['rhog'] * (1. - p['porosity'])
-            gd = gd.reshape((1,1,1,-1)).repeat(ny, axis=0) \
-                                       .repeat(nx, axis=1) \
-                                       .repeat(nl, axis=2)
+            gd = gd.reshape((1,1,-1))
 
-            mass1 = np.nanmean(mass, axis=2, keepdims=True).repeat(nl, axis=2)
-            mass2 = gd * s['thlyr'][:,:,:,np.newaxis].repeat(nf, axis=-1)
-            mass = mass1 * f + mass2 * (1. - f)
-        
-            s['mass'][ix] = mass[ix]
+            mass1 = np.sum(m * ix, axis=1, keepdims=True) / np.sum(ix, axis=1, keepdims=True)
+            mass2 = gd * thlyr[:,:,np.newaxis]
+            
+            mass[ix_wav,:,:] = np.where(ix, mass1 * f + mass2 * (1. - f), m)
+            s['mass'] = mass.reshape((ny,nx,nl,nf))
             
     return s
 
+@process(inputs=['pickup', 'mass', 'zb', 'zs', 'zb0'],
+         outputs=['pickup', 'mass', 'zb', 'zs'])
 def update(s, p):
     '''Update bathymetry and bed composition
 
@@ -230,17 +240,22 @@ def update(s, p):
     nf = p['nfractions']
 
     # determine net erosion
-    pickup = s['pickup'].reshape((-1,nf))
+    pickup0 = s['pickup'].reshape((-1,nf))
+
+    # only cells with non-zero pickup exchange sediment with the bed,
+    # so the exchange is computed on the packed active cells only
+    ix_act = np.flatnonzero(np.any(pickup0 != 0., axis=-1))
+    pickup = pickup0[ix_act,:]
 
     # determine total mass that should be exchanged between layers
     dm = -np.sum(pickup, axis=-1, keepdims=True).repeat(nf, axis=-1)
     
-    # get erosion and deposition cells
+    # get erosion cells
     ix_ero = dm[:,0] < 0.
-    ix_dep = dm[:,0] > 0.
     
     # reshape mass matrix
-    m = s['mass'].reshape((-1,nl,nf))
+    mass = s['mass'].reshape((-1,nl,nf))
+    m = mass[ix_act,:,:]
 
     # negative mass may occur in case of deposition due to numerics,
     # which should be prevented
@@ -249,33 +264,46 @@ def update(s, p):
     # determine weighing factors
     d = normalize(m, axis=2)
     
-    # move mass among layers
+    # determine weighing factors of the layers below and above each
+    # layer, the lowest layer exchanges sediment with an infinite
+    # source that follows the original grain size distribution
+    gd = normalize(p['grain_dist']).reshape((1,1,nf))
+    d_below = np.concatenate((d[:,1:,:], np.broadcast_to(gd, (d.shape[0],1,nf))), axis=1)
+    d_above = np.concatenate((np.zeros((d.shape[0],1,nf)), d[:,:-1,:]), axis=1)
+    d_ero = d.copy()
+    d_ero[:,0,:] = 0.
+    
+    # move mass among layers: in erosion cells each layer is
+    # repleted from the layer below, in deposition cells each layer
+    # passes its excess to the layer below
+    dm = dm[:,np.newaxis,:]
     m[:,0,:] -= pickup
-    for i in range(1,nl):
-        m[ix_ero,i-1,:] -= dm[ix_ero,:] * d[ix_ero,i,:]
-        m[ix_ero,i,  :] += dm[ix_ero,:] * d[ix_ero,i,:]
-        m[ix_dep,i-1,:] -= dm[ix_dep,:] * d[ix_dep,i-1,:]
-        m[ix_dep,i,  :] += dm[ix_dep,:] * d[ix_dep,i-1,:]
-    m[ix_dep,-1,:] -= dm[ix_dep,:] * d[ix_dep,-1,:]
-    m[ix_ero,-1,:] -= dm[ix_ero,:] * normalize(p['grain_dist'])[np.newaxis,:].repeat(np.sum(ix_ero), axis=0)
+    m += np.where(ix_ero[:,np.newaxis,np.newaxis],
+                  dm * (d_ero - d_below),
+                  dm * (d_above - d))
+    dm = dm[:,0,:]
 
     # remove tiny negatives
     m = prevent_tiny_negatives(m, p['max_error'])
 
     # warn if not all negatives are gone
-    if m.min() < 0:
+    if m.size > 0 and m.min() < 0:
         logger.warning(format_log('Negative mass',
                                   nrcells=np.sum(np.any(m<0., axis=-1)),
                                   minvalue=m.min(),
                                   minwind=s['uw'].min(),
                                   time=p['_time']))
         
-    # reshape mass matrix
-    s['mass'] = m.reshape((ny+1,nx+1,nl,nf))
+    # scatter packed cells back into mass matrix and pickup
+    mass[ix_act,:,:] = m
+    pickup0[ix_act,:] = pickup
+    s['mass'] = mass.reshape((ny+1,nx+1,nl,nf))
 
     # update bathy
     if p['process_bedupdate']:
-        dz = dm[:,0].reshape((ny+1,nx+1)) / (p['rhog'] * (1. - p['porosity']))
+        dz = np.zeros(((ny+1)*(nx+1),))
+        dz[ix_act] = dm[:,0] / (p['rhog'] * (1. - p['porosity']))
+        dz = dz.reshape((ny+1,nx+1))
         
         #s['dzb'] = dz
         
@@ -370,20 +398,19 @@ def prevent_negative_mass(m, dm, pickup):
     dep = -np.minimum(0., pickup)
 
     # determine gross erosion
-    erog = np.sum(ero, axis=1, keepdims=True).repeat(nf, axis=1)
+    erog = np.sum(ero, axis=1, keepdims=True)
 
     # determine net deposition cells with some erosional fractions
-    ix = ix_dep & (erog[:,0] > 0)
+    ix = (ix_dep & (erog[:,0] > 0))[:,np.newaxis]
 
     # remove erosional fractions from pickup and remove an equal mass
     # of accretive fractions from the pickup, adapt sediment exchange
     # mass and bed composition accordingly
     if np.any(ix):
-        d = normalize(dep, axis=1)
-        ddep = erog[ix,:] * d[ix,:]
-        pickup[ix,:] = -dep[ix,:] + ddep
-        dm[ix,:] = -np.sum(pickup[ix,:], axis=-1, keepdims=True).repeat(nf, axis=-1)
-        m[ix,0,:] -= ero[ix,:] - ddep # FIXME: do not use deposition in normalization
+        ddep = erog * normalize(dep, axis=1)
+        pickup = np.where(ix, ddep - dep, pickup)
+        dm = np.where(ix, -np.sum(pickup, axis=-1, keepdims=True), dm)
+        m[:,0,:] -= np.where(ix, ero - ddep, 0.) # FIXME: do not use deposition in normalization
 
     ###
     ### case #2: deposition cells with deposition larger than the mass present in the top layer
@@ -400,43 +427,77 @@ def prevent_negative_mass(m, dm, pickup):
         # determine distribution of deposition
         d = normalize(pickup, axis=1)
 
-        # walk through layers from top to bottom
-        for i in range(nl):
-
-            ix = (n > i).flatten()
-            if not np.any(ix):
-                break
+        # determine number of layers filled with deposited sediment
+        k = np.minimum(n[:,0], nl).astype(int)
+        ix = k > 0
 
-            # move all sediment below current layer down one layer
-            m[ix,(i+1):,:] = m[ix,i:-1,:]
+        # bury existing layers under layers with deposited sediment
+        dep = mx[ix,:] * d[ix,:]
+        m[ix,:,:] = bury(m[ix,:,:], k[ix], dep)
 
-            # fill current layer with deposited sediment
-            m[ix,i,:] = mx[ix,:].repeat(nf, axis=1) * d[ix,:]
-
-            # remove deposited sediment from pickup
-            pickup[ix,:] -= m[ix,i,:]
+        # remove deposited sediment from pickup
+        pickup[ix,:] -= k[ix,np.newaxis] * dep
 
         # discard any remaining deposits at locations where all layers
         # are filled with fresh deposits
-        ix = (dm[:,:1] > mx).flatten()
-        if np.any(ix):
-            pickup[ix,:] = 0.
+        ix = dm[:,:1] > mx
+        pickup = np.where(ix, 0., pickup)
 
         # recompute sediment exchange mass
-        dm[ix,:] = -np.sum(pickup[ix,:], axis=-1, keepdims=True).repeat(nf, axis=-1)
+        dm = np.where(ix, -np.sum(pickup, axis=-1, keepdims=True), dm)
 
     return m, dm, pickup
 
 
-def average_change(l, s, p):
+def bury(m, k, dep):
+    '''Bury bed layers under layers of deposited sediment
+
+    Each column of bed layers is treated as a circular buffer. Moving
+    the top layer pointer ``k`` layers upward moves all existing
+    layers ``k`` layers down at once. The ``k`` lowest layers wrap
+    around to the top of the column and are overwritten with the
+    deposited sediment. The bed composition of the ``k`` lowest
+    layers is lost.
+
+    Parameters
+    ----------
+    m : np.ndarray
+        Sediment mass in bed (nx*ny, nl, nf)
+    k : np.ndarray
+        Number of layers filled with deposited sediment (nx*ny)
+    dep : np.ndarray
+        Sediment mass in a single layer of deposits (nx*ny, nf)
+
+    Returns
+    -------
+    np.ndarray
+        Sediment mass in bed (nx*ny, nl, nf)
+
+    '''
+
+    nl = m.shape[1]
+
+    # move top layer pointer and read all columns in logical order
+    j = np.arange(nl)[np.newaxis,:]
+    ix = np.mod(j - k[:,np.newaxis], nl)
+    m = np.take_along_axis(m, ix[:,:,np.newaxis], axis=1)
+
+    # overwrite wrapped layers with deposited sediment
+    ix = j < k[:,np.newaxis]
+    m = np.where(ix[:,:,np.newaxis], dep[:,np.newaxis,:], m)
+
+    return m
+
+
+def average_change(l, s, p, dt):
     
     #Compute bed level change with previous time step [m/timestep]
     s['dzb'] = s['zb'] - l['zb']
         
     # Collect time steps
-    s['dzbyear'] = s['dzb'] * (3600. * 24. * 365.25) / (p['dt'] * p['accfac'])
+    s['dzbyear'] = s['dzb'] * (3600. * 24. * 365.25) / dt
 
-    n = (p['dt'] * p['accfac']) / p['avg_time']
+    n = dt / p['avg_time']
 
     s['dzbavg'] = n*s['dzbyear']+(1-n)*l['dzbavg']
     
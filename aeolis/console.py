@@ -31,7 +31,10 @@ import os
 import docopt
 import logging
 import numpy as np
-from aeolis.model import AeoLiSRunner, WindGenerator
+from aeolis.inout import read_configfile
+from aeolis.forcing import load
+from aeolis.wind import reduce_conditions, reduce_schedule
+from aeolis.model import AeoLiS, AeoLiSRunner, WindGenerator
 
 
 #class StreamFormatter(logging.Formatter):
@@ -90,17 +93,22 @@ def wind():
     '''aeolis-wind : a wind time series generation tool for the aeolis model
 
     Usage:
-        aeolis-wind <file> [--mean=MEAN] [--max=MAX] [--duration=DURATION] [--timestep=TIMESTEP]
+        aeolis-wind <file> [--mean=MEAN] [--max=MAX] [--duration=DURATION] [--timestep=TIMESTEP] [--realizations=N] [--seed=SEED] [--direction=DIRECTION] [--direction-std=STD] [--direction-timescale=TIMESCALE]
 
     Positional arguments:
-        file               output file
+        file                           output file
 
     Options:
-        -h, --help           show this help message and exit
-        --mean=MEAN          mean wind speed [default: 10]
-        --max=MAX            maximum wind speed [default: 30]
-        --duration=DURATION  duration of time series [default: 3600]
-        --timestep=TIMESTEP  timestep of time series [default: 60]
+        -h, --help                     show this help message and exit
+        --mean=MEAN                    mean wind speed [default: 10]
+        --max=MAX                      maximum wind speed [default: 30]
+        --duration=DURATION            duration of time series [default: 3600]
+        --timestep=TIMESTEP            timestep of time series [default: 60]
+        --realizations=N               number of realizations, written to a binary NumPy file if more than one [default: 1]
+        --seed=SEED                    seed of random number generator
+        --direction=DIRECTION          mean wind direction [default: 0]
+        --direction-std=STD            standard deviation of wind direction, constant if zero [default: 0]
+        --direction-timescale=TIMESCALE  correlation time scale of wind direction [default: 3600]
 
     '''
 
@@ -108,19 +116,157 @@ def wind():
 
     arguments = docopt.docopt(wind.__doc__)
 
+    fname = arguments['<file>']
+    n = int(arguments['--realizations'])
+    seed = int(arguments['--seed']) if arguments['--seed'] is not None else None
+
     # create random wind time series
     generator = WindGenerator(mean_speed=float(arguments['--mean']),
                               max_speed=float(arguments['--max']),
-                              dt=float(arguments['--timestep']))
-    generator.generate(duration=float(arguments['--duration']))
-    generator.write_time_series(arguments['<file>'])
-
-    u = generator.get_time_series()[1]
+                              dt=float(arguments['--timestep']),
+                              seed=seed)
+    ensemble = generator.generate_ensemble(n=n,
+                                           duration=float(arguments['--duration']),
+                                           direction=float(arguments['--direction']),
+                                           direction_std=float(arguments['--direction-std']),
+                                           direction_timescale=float(arguments['--direction-timescale']))
+
+    # write single binary file, readable by aeolis, or text file
+    if n > 1 or fname.endswith('.npy'):
+        if not fname.endswith('.npy'):
+            fname += '.npy'
+        np.save(fname, ensemble)
+    else:
+        np.savetxt(fname, ensemble[0])
+
+    print('Written %d realization(s) to %s' % (n, fname))
+    print('')
 
-    fmt = '%-4s : %6.3f m/s'
+    # summary statistics across ensemble
+    u = ensemble[:,:,1]
+    fmt = '%-14s : %6.3f m/s'
     print(fmt % ('min', np.min(u)))
     print(fmt % ('mean', np.mean(u)))
     print(fmt % ('max', np.max(u)))
+    print(fmt % ('std', np.std(u)))
+    if n > 1:
+        umean = np.mean(u, axis=1)
+        print(fmt % ('min mean', np.min(umean)))
+        print(fmt % ('max mean', np.max(umean)))
+        print(fmt % ('std mean', np.std(umean)))
+    if float(arguments['--direction-std']) > 0.:
+        udir = ensemble[:,:,2] / 180. * np.pi
+        fmt = '%-14s : %6.1f deg'
+        print(fmt % ('mean direction', np.mod(np.arctan2(np.mean(np.sin(udir)),
+                                                        np.mean(np.cos(udir))) * 180. / np.pi, 360.)))
+        print(fmt % ('std direction', np.std(np.mod(ensemble[:,:,2] - float(arguments['--direction']) + 180., 360.))))
+
+
+def wind_reduce():
+    '''aeolis-wind-reduce : a wind input reduction tool for the aeolis model
+
+    Usage:
+        aeolis-wind-reduce <config> <file> [--speeds=N] [--directions=N] [--duration=DURATION] [--validate]
+
+    Positional arguments:
+        config               configuration file
+        file                 output file
+
+    Options:
+        -h, --help           show this help message and exit
+        --speeds=N           number of wind speed classes [default: 4]
+        --directions=N       number of wind direction sectors [default: 8]
+        --duration=DURATION  duration of reduced time series, duration of wind time series if not given
+        --validate           compare net bed level change with a simulation with the full wind time series
+
+    '''
+
+    print_license()
+
+    arguments = docopt.docopt(wind_reduce.__doc__)
+
+    fname = os.path.abspath(arguments['<file>'])
+    fpath, configfile = os.path.split(os.path.abspath(arguments['<config>']))
+    os.chdir(fpath)
+
+    p = read_configfile(configfile)
+    if p['wind_file'] is None:
+        print('No wind time series [wind_file] in %s' % configfile)
+        return
+    elif isinstance(p['wind_file'], str):
+        p['wind_file'] = load(p['wind_file'], realization=p['forcing_realization'])
+
+    # reduce wind time series
+    conditions = reduce_conditions(p['wind_file'], p,
+                                   nspeeds=int(arguments['--speeds']),
+                                   ndirections=int(arguments['--directions']))
+
+    if arguments['--duration'] is not None:
+        duration = float(arguments['--duration'])
+    else:
+        t = p['wind_file'][:,0]
+        duration = t[-1] - t[0] + (t[-1] - t[0]) / max(1, len(t) - 1)
+
+    schedule = reduce_schedule(conditions, duration)
+
+    np.savetxt(fname, schedule)
+    np.savetxt('%s.conditions%s' % os.path.splitext(fname), conditions,
+               header='wind velocity [m/s], wind direction [deg], weight [-], potential transport [kg/m/s]')
+
+    fmt = '%10s %10s %10s %12s'
+    print(fmt % ('speed', 'direction', 'weight', 'transport'))
+    for c in conditions:
+        print('%10.3f %10.1f %10.4f %12.4e' % tuple(c))
+
+    # compare net bed level change
+    if arguments['--validate']:
+        dzb_full = bed_change(configfile)
+        dzb_reduced = bed_change(configfile, wind=schedule)
+
+        err = dzb_reduced - dzb_full
+        mse = np.mean(err**2)
+        ref = np.mean(dzb_full**2)
+
+        fmt = '%-22s : %12.4e'
+        print('')
+        print(fmt % ('rmse net bed change', np.sqrt(mse)))
+        print(fmt % ('max. error', np.max(np.abs(err))))
+        print(fmt % ('net volume full', np.sum(dzb_full)))
+        print(fmt % ('net volume reduced', np.sum(dzb_reduced)))
+        print(fmt % ('skill', 1. - mse / ref if ref > 0. else np.nan))
+
+
+def bed_change(configfile, wind=None):
+    '''Simulate net bed level change
+
+    Parameters
+    ----------
+    configfile : str
+        Model configuration file
+    wind : numpy.ndarray, optional
+        Wind time series replacing ``wind_file``
+
+    Returns
+    -------
+    numpy.ndarray
+        Net bed level change at the end of the simulation
+
+    '''
+
+    model = AeoLiS(configfile=configfile)
+    model.initialize()
+
+    if wind is not None:
+        wind = wind.copy()
+        if model.p['wind_convention'] == 'cartesian':
+            wind[:,2] = 270.0 - wind[:,2]
+        model.p['wind_file'] = wind
+
+    zb0 = model.s['zb'].copy()
+    while model.t < model.p['tstop']:
+        model.update()
+
+    return model.s['zb'] - zb0
 
 
 def print_license():
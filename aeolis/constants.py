@@ -79,6 +79,8 @@ MODEL_STATE = {
         'lateral',                    # NEW #
         'dxrhoveg',                   # NEW #
         'vegfac',                     # NEW # [] Vegetation factor 
+        'active',                     # NEW # [-] Cells where the shear velocity exceeds the threshold of at least one fraction
+        'accfaceff',                  # NEW # [-] Effective numerical acceleration factor applied in the time step
     ),
     ('ny','nx','nfractions') : (
         'Cu',                               # [kg/m^2] Equilibrium sediment concentration integrated over saltation height
@@ -147,6 +149,8 @@ DEFAULT_CONFIG = {
     'tide_file'                     : None,               # Filename of ASCII file with time series of water levels
     'wave_file'                     : None,               # Filename of ASCII file with time series of wave heights
     'meteo_file'                    : None,               # Filename of ASCII file with time series of meteorlogical conditions
+    'forcing_window'                : 0.,           # NEW # [s] Duration of forcing time series read from file at once during the simulation, entire file if zero
+    'forcing_realization'           : 0,            # NEW # Index of realization in ensemble of forcing time series in binary NumPy file
     'bedcomp_file'                  : None,               # Filename of ASCII file with initial bed composition
     'threshold_file'                : None,               # Filename of ASCII file with shear velocity threshold
     'ne_file'                       : None,         # NEW # Filename of ASCII file with non-erodible layer
@@ -161,10 +165,35 @@ DEFAULT_CONFIG = {
     'dy'                            : 1.,
     'CFL'                           : 1.,                 # [-] CFL number to determine time step in explicit scheme
     'accfac'                        : 1.,                 # [-] Numerical acceleration factor
+    'accfac_adaptive'               : False,        # NEW # Adapt numerical acceleration factor to bed level change
+    'accfac_min'                    : 1.,           # NEW # [-] Minimum adaptive numerical acceleration factor
+    'accfac_max'                    : 100.,         # NEW # [-] Maximum adaptive numerical acceleration factor
+    'accfac_growth'                 : 1.1,          # NEW # [-] Maximum growth factor of the adaptive numerical acceleration factor per time step
+    'tol_accfac'                    : .01,          # NEW # [m] Maximum bed level change per time step with adaptive numerical acceleration factor
     'tstart'                        : 0.,                 # [s] Start time of simulation
     'tstop'                         : 3600.,              # [s] End time of simulation
     'restart'                       : None,               # [s] Interval for which to write restart files
     'dzb_interval'                  : 86400,        # NEW # [s] Interval used for calcuation of vegetation growth
+    'dt_adaptive'                   : False,        # NEW # Enable error-controlled adaptive time step for implicit schemes
+    'dt_min'                        : 1.,           # NEW # [s] Minimum adaptive time step
+    'dt_max'                        : 86400.,       # NEW # [s] Maximum adaptive time step
+    'dt_growth'                     : 2.,           # NEW # [-] Maximum growth factor of the adaptive time step
+    'tol_zb'                        : .01,          # NEW # [m] Maximum bed level change per adaptive time step
+    'tol_Ct'                        : .5,           # NEW # [-] Maximum change in sediment concentration per adaptive time step relative to the maximum equilibrium concentration
+    'tol_pickup'                    : .5,           # NEW # [-] Maximum pickup per adaptive time step relative to the mass in the top bed layer
+    'fastforward'                   : False,        # NEW # Skip periods in which the wind shear velocity is below the threshold everywhere
+    'fastforward_factor'            : 1.,           # NEW # [-] Safety factor on the maximum wind shear velocity used to detect periods below the threshold
+    'tol_fastforward'               : 1e-6,         # NEW # [kg/m^2] Maximum sediment concentration at which periods below the threshold are skipped
+    'spinup'                        : False,        # NEW # Spin up bed composition to equilibrium before the simulation
+    'spinup_accfac'                 : 100.,         # NEW # [-] Maximum numerical acceleration factor during spin-up
+    'spinup_max_steps'              : 1000,         # NEW # [-] Maximum number of time steps during spin-up
+    'spinup_period'                 : 0.,           # NEW # [s] Period over which the grain size distribution of the top bed layer is averaged during spin-up, every time step if zero
+    'tol_spinup'                    : 1e-3,         # NEW # [-] Maximum change in grain size distribution of the top bed layer per time step or period at which spin-up is converged
+    'spinup_cache'                  : 'spinup',     # NEW # Directory with spun-up bed compositions, not cached if empty
+    'dt_vegetation'                 : 0.,           # NEW # [s] Interval at which vegetation germinates and grows, every time step if smaller than the time step
+    'dt_shear'                      : 0.,           # NEW # [s] Interval at which the wind shear perturbation is computed, every time step if smaller than the time step
+    'dudir_shear'                   : 0.,           # NEW # [deg] Change in wind direction at which the wind shear perturbation is computed within dt_shear
+    'dt_avalanche'                  : 0.,           # NEW # [s] Interval at which avalanching is computed, every time step if smaller than the time step
     'output_times'                  : 60.,                # [s] Output interval in seconds of simulation time
     'output_file'                   : None,               # Filename of netCDF4 output file
     'output_vars'                   : ['zb', 'zs',
@@ -224,6 +253,7 @@ DEFAULT_CONFIG = {
     'lateral'                       : 0.,           # NEW # [1/year] Posibility of lateral expension per year
     'veg_gamma'                     : 1.,           # NEW # [-] Constant on influence of sediment burial
     'veg_sigma'                     : 0.8,          # NEW # [-] Sigma in gaussian distrubtion of vegetation cover filter  
+    'veg_tolerance'                 : 0.,           # NEW # [-] Maximum change in vegetation density before the vegetation shear reduction factor is recomputed
     'sedimentinput'                 : 0.,           # NEW # [-] Constant boundary sediment influx (only used in solve_pieter)
     'scheme'                        : 'euler_backward',   # Name of numerical scheme (euler_forward, euler_backward or crank_nicolson)
     'boundary_lateral'              : 'circular',         # Name of lateral boundary conditions (circular, constant ==noflux)
@@ -239,11 +269,16 @@ DEFAULT_CONFIG = {
     'max_error'                     : 1e-6,               # [-] Maximum error at which to quit iterative solution in implicit numerical schemes
     'max_iter'                      : 1000,               # [-] Maximum number of iterations at which to quit iterative solution in implicit numerical schemes
     'max_iter_ava'                  : 1000,               # [-] Maximum number of iterations at which to quit iterative solution in avalanching calculation
+    'method_avalanche'              : 'explicit',         # NEW # Name of method to compute avalanching (explicit or redblack)
+    'relax_avalanche'               : 1.,                 # NEW # [-] Relaxation factor relative to the grid spacing in red-black avalanching
+    'jit'                           : True,               # NEW # Use compiled kernels for loop-based routines if Numba is available
+    'numexpr'                       : True,               # NEW # Use numexpr for long elementwise expressions if available
     'refdate'                       : '2020-01-01 00:00', # [-] Reference datetime in netCDF output
     'callback'                      : None,               # Reference to callback function (e.g. example/callback.py':callback)
     'wind_convention'               : 'nautical',         # Convention used for the wind direction in the input files
     'alfa'                         : 0,                   # [deg] Real-world grid cell orientation wrt the North (clockwise)
     'solver'                        : 'trunk',      # NEW # Choose the solver to be used (steadystate / trunk / pieter)
+    'incremental'                   : False,        # NEW # Skip processes if the spatial grids they read did not change since their previous execution
 }
 
 #: Required model configuration parameters
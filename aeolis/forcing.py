@@ -0,0 +1,536 @@
+'''This file is part of AeoLiS.
+
+AeoLiS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+AeoLiS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with AeoLiS.  If not, see <http://www.gnu.org/licenses/>.
+
+AeoLiS  Copyright (C) 2015 Bas Hoonhout
+
+bas.hoonhout@deltares.nl         b.m.hoonhout@tudelft.nl
+Deltares                         Delft University of Technology
+Unit of Hydraulic Engineering    Faculty of Civil Engineering and Geosciences
+Boussinesqweg 1                  Stevinweg 1
+2629 HVDelft                     2628CN Delft
+The Netherlands                  The Netherlands
+
+'''
+
+
+from __future__ import absolute_import, division
+
+import os
+import logging
+import threading
+import numpy as np
+
+# package modules
+from aeolis.utils import *
+
+
+# check if netCDF4 is available
+try:
+    import netCDF4
+    HAVE_NETCDF = True
+except ImportError:
+    HAVE_NETCDF = False
+
+
+# initialize logger
+logger = logging.getLogger(__name__)
+
+
+#: Forcing time series and the channels derived from their columns
+FORCING_FILES = {
+    'wind_file'  : lambda f: {'uw':f[:,1],
+                              'sin_udir':np.sin(f[:,2] / 180. * np.pi),
+                              'cos_udir':np.cos(f[:,2] / 180. * np.pi)},
+    'tide_file'  : lambda f: {'zs':f[:,1]},
+    'wave_file'  : lambda f: {'Hs':f[:,1]},
+    'meteo_file' : lambda f: dict(zip(('T','RH','U','Q','P'), f[:,1:].T)),
+}
+
+
+def compile_timelines(sources):
+    '''Align forcing time series on common time axes
+
+    All forcing time series are split in channels, like the wind
+    velocity and the sine and cosine of the wind direction. Time
+    series are repeated in a circular manner, see
+    :func:`~utils.interp_circular`. Time series with the same time
+    range therefore repeat identically and are aligned on a common
+    sorted time axis that contains the times of all these time
+    series. As the time series are interpolated linearly, this does
+    not change the interpolated values. The slopes of all channels
+    between subsequent times are computed once.
+
+    Parameters
+    ----------
+    sources : dict
+        Forcing time series, or the window read from a forcing file
+        with the time range of the entire file, see
+        :func:`get_sources`
+
+    Returns
+    -------
+    dict
+        Compiled forcing with the forcing time series it is based on
+        and a list of time axes with their channels
+
+    See Also
+    --------
+    interpolate
+
+    '''
+
+    series = []
+    for key, (f, xmin, xmax) in sources.items():
+        f = np.asarray(f)
+        if xmin is None:
+            xmin, xmax = f[:,0].min(), f[:,0].max()
+        for name, fp in FORCING_FILES[key](f).items():
+            series.append((name, xmin, xmax, f[:,0], fp))
+
+    # group time series with the same time range
+    axes = {}
+    for name, xmin, xmax, xp, fp in series:
+        axes.setdefault((xmin, xmax), []).append((name, xp, fp))
+
+    timelines = []
+    for (xmin, xmax), group in axes.items():
+        xp = group[0][1]
+        if not all([np.array_equal(xp, x) for _, x, _ in group]):
+            xp = np.unique(np.concatenate([x for _, x, _ in group]))
+        fp = np.column_stack([f if np.array_equal(x, xp) else np.interp(xp, x, f)
+                              for _, x, f in group])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = np.diff(fp, axis=0) / np.diff(xp)[:,np.newaxis]
+
+        timelines.append(dict(names=[name for name, _, _ in group],
+                              xmin=xmin,
+                              xmax=xmax,
+                              xp=xp,
+                              fp=fp,
+                              slopes=slopes))
+
+    return dict(sources={k:v[0] for k, v in sources.items()}, timelines=timelines, t=None, values={})
+
+
+def interpolate(p, t):
+    '''Interpolate all forcing channels to a given time
+
+    The forcing is compiled upon first use and recompiled if any of
+    the forcing time series is replaced, or if another window is read
+    from a forcing file. Each time axis is searched once for all its
+    channels, which are interpolated together. The result is cached
+    for subsequent calls at the same time, for example from
+    :func:`~wind.interpolate` and :func:`~hydro.interpolate`. The
+    interpolated values are identical to
+    :func:`~utils.interp_circular`.
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+    t : float
+        Current time
+
+    Returns
+    -------
+    dict
+        Interpolated value of each channel
+
+    See Also
+    --------
+    compile_timelines
+    get_sources
+
+    '''
+
+    sources = get_sources(p, t)
+
+    forcing = p.get('_forcing')
+    if forcing is None or \
+       set(sources.keys()) != set(forcing['sources'].keys()) or \
+       any([v[0] is not forcing['sources'][k] for k, v in sources.items()]):
+        forcing = p['_forcing'] = compile_timelines(sources)
+
+    if forcing['t'] == t:
+        return forcing['values']
+
+    values = {}
+    for tl in forcing['timelines']:
+        xp = tl['xp']
+        fp = tl['fp']
+
+        x = circular_time(t, tl['xmin'], tl['xmax'])
+
+        j = np.searchsorted(xp, x, side='right') - 1
+        if j < 0:
+            f = fp[0]
+        elif j >= len(xp) - 1 or x == xp[j]:
+            f = fp[j]
+        else:
+            f = tl['slopes'][j] * (x - xp[j]) + fp[j]
+
+        values.update(zip(tl['names'], f))
+
+    forcing['t'] = t
+    forcing['values'] = values
+
+    return values
+
+
+def get_sources(p, t):
+    '''Returns forcing time series around a given time
+
+    Forcing time series are taken from the model configuration. If
+    ``forcing_window`` is set, forcing files are not read upon
+    initialization, but read in windows of ``forcing_window`` seconds
+    around the current time by a :class:`ForcingReader`.
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+    t : float
+        Current time
+
+    Returns
+    -------
+    dict
+        Forcing time series, or the window read from a forcing file
+        with the start and end time of the entire file
+
+    '''
+
+    sources = {}
+    for key in FORCING_FILES.keys():
+        f = p.get(key)
+        if isinstance(f, str) and p.get('forcing_window', 0.) > 0.:
+            reader = get_reader(p, key)
+            sources[key] = (reader.get(circular_time(t, reader.xmin, reader.xmax)),
+                            reader.xmin, reader.xmax)
+        elif f is not None and isarray(f) and np.ndim(f) == 2 and len(f) > 0:
+            sources[key] = (f, None, None)
+
+    return sources
+
+
+def get_reader(p, key):
+    '''Returns forcing reader for a forcing file
+
+    Readers are created upon first use and kept in the model
+    configuration.
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+    key : str
+        Name of forcing file parameter, e.g. ``wind_file``
+
+    Returns
+    -------
+    ForcingReader
+        Forcing reader
+
+    '''
+
+    readers = p.setdefault('_readers', {})
+
+    fname = os.path.abspath(p[key])
+    realization = p.get('forcing_realization', 0)
+    if key not in readers or readers[key].fname != fname or \
+       readers[key].realization != realization:
+        transform = None
+        if key == 'wind_file' and p.get('wind_convention') == 'cartesian':
+            transform = cartesian_to_nautical
+        readers[key] = ForcingReader(fname, p['forcing_window'], transform=transform,
+                                     realization=realization)
+
+    return readers[key]
+
+
+def circular_time(t, xmin, xmax):
+    '''Map time on a circular time series
+
+    Parameters
+    ----------
+    t : float
+        Time
+    xmin : float
+        Start time of time series
+    xmax : float
+        End time of time series
+
+    Returns
+    -------
+    float
+        Time within the time series, see
+        :func:`~utils.interp_circular`
+
+    '''
+
+    return xmin + np.mod(t - xmax - 1., xmax - xmin + 1.)
+
+
+def cartesian_to_nautical(f):
+    '''Convert wind direction in a wind time series from cartesian to nautical convention'''
+
+    f[:,2] = 270.0 - f[:,2]
+    return f
+
+
+def load(fname, realization=0):
+    '''Read entire forcing file
+
+    Parameters
+    ----------
+    fname : str
+        Forcing file in text, NumPy (``.npy``) or netCDF (``.nc``)
+        format, see :class:`ForcingReader`
+    realization : int, optional
+        Index of realization in ensemble of forcing time series
+
+    Returns
+    -------
+    numpy.ndarray
+        Forcing time series
+
+    '''
+
+    reader = ForcingReader(fname, np.inf, realization=realization)
+    return reader.get(reader.xmin)
+
+
+class ForcingReader():
+    '''Windowed reader for forcing files
+
+    Reads a forcing file in windows of a given duration, such that
+    only the part of the forcing time series around the current time
+    is kept in memory. Once the current time passes the middle of
+    the current window, the next window is read in a background
+    thread. After the last window the first window is read, as
+    forcing time series are repeated in a circular manner.
+
+    Forcing files can be text files with a column for time and a
+    column for each forcing parameter, binary NumPy files (``.npy``)
+    with a two-dimensional array in the same layout, or an ensemble
+    of such arrays in a three-dimensional array, or netCDF files
+    (``.nc``) with a variable ``time`` and a variable along the time
+    dimension for each forcing parameter, in the order of the columns
+    of a text file. Text files are scanned once to index the position
+    of every ``stride`` lines.
+
+    Parameters
+    ----------
+    fname : str
+        Forcing file
+    window : float
+        Duration of window in seconds
+    transform : function, optional
+        Function applied to each window read
+    stride : int, optional
+        Number of lines between indexed positions in text files
+    realization : int, optional
+        Index of realization in ensemble of forcing time series in a
+        NumPy file, see :func:`~model.WindGenerator.generate_ensemble`
+
+    Examples
+    --------
+    >>> reader = ForcingReader('wind.txt', 30 * 24 * 3600.)
+    ... f = reader.get(3600.)
+
+    '''
+
+
+    def __init__(self, fname, window, transform=None, stride=1000, realization=0):
+
+        self.fname = os.path.abspath(fname)
+        self.window = window
+        self.transform = transform
+        self.stride = stride
+        self.realization = realization
+        self.ext = os.path.splitext(fname)[1].lower()
+
+        self.chunk = None
+        self.thread = None
+        self.prefetched = None
+
+        self.index()
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['thread'] = None
+        state['prefetched'] = None
+        return state
+
+
+    def index(self):
+        '''Index times in forcing file'''
+
+        if self.ext == '.npy':
+            self.times = self.load_array()[:,0]
+        elif self.ext == '.nc':
+            if not HAVE_NETCDF:
+                logger.log_and_raise('No netCDF4 available to read forcing file [%s]' % self.fname,
+                                     exc=ImportError)
+            with netCDF4.Dataset(self.fname, 'r') as nc:
+                self.times = np.asarray(nc.variables['time'][:], dtype=float)
+        else:
+            times = []
+            offsets = []
+            n = 0
+            with open(self.fname, 'rb') as fp:
+                offset = fp.tell()
+                line = fp.readline()
+                while line:
+                    line = line.strip()
+                    if line and not line.startswith(b'#'):
+                        if n % self.stride == 0:
+                            times.append(float(line.split()[0]))
+                            offsets.append(offset)
+                        last = float(line.split()[0])
+                        n += 1
+                    offset = fp.tell()
+                    line = fp.readline()
+            if n == 0:
+                logger.log_and_raise('Empty forcing file [%s]' % self.fname, exc=ValueError)
+            self.times = np.asarray(times)
+            self.offsets = np.asarray(offsets)
+            self.last = last
+
+        self.xmin = float(self.times[0])
+        self.xmax = float(self.times[-1]) if self.ext in ['.npy', '.nc'] else self.last
+
+
+    def read(self, x0, x1):
+        '''Read window from forcing file
+
+        Parameters
+        ----------
+        x0 : float
+            Start time of window
+        x1 : float
+            End time of window
+
+        Returns
+        -------
+        numpy.ndarray
+            Forcing time series from the last time before or at the
+            start time up to and including the first time after the
+            end time
+
+        '''
+
+        if self.ext == '.npy':
+            i0 = max(0, np.searchsorted(self.times, x0, side='right') - 1)
+            i1 = np.searchsorted(self.times, x1, side='right') + 1
+            f = np.array(self.load_array()[i0:i1], dtype=float)
+        elif self.ext == '.nc':
+            i0 = max(0, np.searchsorted(self.times, x0, side='right') - 1)
+            i1 = np.searchsorted(self.times, x1, side='right') + 1
+            with netCDF4.Dataset(self.fname, 'r') as nc:
+                columns = [np.asarray(v[i0:i1], dtype=float)
+                           for k, v in nc.variables.items()
+                           if v.dimensions == nc.variables['time'].dimensions]
+            f = np.column_stack(columns)
+        else:
+            i = max(0, np.searchsorted(self.times, x0, side='right') - 1)
+            lines = []
+            with open(self.fname, 'r') as fp:
+                fp.seek(self.offsets[i])
+                for line in fp:
+                    if not line.strip() or line.strip().startswith('#'):
+                        continue
+                    t = float(line.split()[0])
+                    if t <= x0:
+                        lines = []
+                    lines.append(line)
+                    if t > x1:
+                        break
+            f = np.loadtxt(lines, ndmin=2)
+
+        if self.transform is not None:
+            f = self.transform(f)
+
+        return f
+
+
+    def load_array(self):
+        '''Memory-map forcing time series in NumPy file'''
+
+        f = np.load(self.fname, mmap_mode='r')
+        if f.ndim == 3:
+            if not 0 <= self.realization < len(f):
+                logger.log_and_raise('Realization %d not found in forcing file [%s]' %
+                                     (self.realization, self.fname), exc=IndexError)
+            f = f[self.realization]
+        return f
+
+
+    def covers(self, chunk, x):
+        '''Check if window is sufficient to interpolate at a given time'''
+
+        if chunk is None:
+            return False
+        t = chunk[:,0]
+        return (t[0] <= x or t[0] == self.xmin) and (x < t[-1] or t[-1] == self.xmax)
+
+
+    def get(self, x):
+        '''Returns window of forcing time series around a given time
+
+        The current window is returned as long as it contains the
+        given time, such that the same array is returned in subsequent
+        calls.
+
+        Parameters
+        ----------
+        x : float
+            Time within the forcing time series
+
+        Returns
+        -------
+        numpy.ndarray
+            Window of forcing time series
+
+        '''
+
+        if not self.covers(self.chunk, x):
+            if self.thread is not None:
+                self.thread.join()
+                self.thread = None
+            if self.covers(self.prefetched, x):
+                self.chunk = self.prefetched
+            else:
+                logger.debug('Reading forcing file [%s] at t = %0.2f' % (self.fname, x))
+                self.chunk = self.read(x, x + self.window)
+            self.prefetched = None
+
+        # read next window in background
+        t = self.chunk[:,0]
+        if self.thread is None and self.prefetched is None and x > (t[0] + t[-1]) / 2.:
+            x0 = t[-1] if t[-1] < self.xmax else self.xmin
+            self.thread = threading.Thread(target=self.prefetch, args=(x0,))
+            self.thread.daemon = True
+            self.thread.start()
+
+        return self.chunk
+
+
+    def prefetch(self, x0):
+        '''Read window from forcing file in background'''
+
+        self.prefetched = self.read(x0, x0 + self.window)
@@ -31,6 +31,7 @@ import logging
 import numpy as np
 
 # package modules
+import aeolis.forcing
 from aeolis.utils import *
 
 
@@ -38,6 +39,9 @@ from aeolis.utils import *
 logger = logging.getLogger(__name__)
 
 
+@process(inputs=['zb', 'tide_mask', 'wave_mask'],
+         outputs=['zs', 'Hs', 'meteo'],
+         volatile=True)
 def interpolate(s, p, t):
     '''Interpolate hydrodynamic and meteorological conditions to current time step
 
@@ -61,28 +65,28 @@ def interpolate(s, p, t):
 
     '''
 
+    f = aeolis.forcing.interpolate(p, t)
+
     if p['process_tide']:
         if p['tide_file'] is not None:
-            s['zs'][:,:] = interp_circular(t, 
-                                           p['tide_file'][:,0], 
-                                           p['tide_file'][:,1])
+            s['zs'][:,:] = f['zs']
         else:
             s['zs'][:,:] = 0.
 
         # apply complex mask
-        s['zs'] = apply_mask(s['zs'], s['tide_mask'])
+        if not is_trivial_mask(s['tide_mask']):
+            s['zs'] = apply_mask(s['zs'], s['tide_mask'])
 
     if p['process_wave'] and p['wave_file'] is not None:
 
         # determine water depth
         h = np.maximum(0., s['zs'] - s['zb'])
     
-        s['Hs'][:,:] = interp_circular(t,
-                                       p['wave_file'][:,0],
-                                       p['wave_file'][:,1])
+        s['Hs'][:,:] = f['Hs']
 
         # apply complex mask
-        s['Hs'] = apply_mask(s['Hs'], s['wave_mask'])
+        if not is_trivial_mask(s['wave_mask']):
+            s['Hs'] = apply_mask(s['Hs'], s['wave_mask'])
 
         # add wave runup
         if p['process_runup']:
@@ -95,14 +99,10 @@ def interpolate(s, p, t):
         
     if p['process_meteo'] and  p['meteo_file'] is not None:
 
-        m = interp_array(t,
-                         p['meteo_file'][:,0],
-                         p['meteo_file'][:,1:], circular=True)
-
         # Symbols according to KNMI files: T = temperature [oC], RH =
         # precipitation [mm/hr], U = relative humidity [%], Q = global
         # radiation [J/m2], P = air pressure [kPa]
-        s['meteo'] = dict(zip(('T','RH','U','Q','P') , m))
+        s['meteo'] = {k:f[k] for k in ('T','RH','U','Q','P')}
 
     # ensure compatibility with XBeach: zs >= zb
     s['zs'] = np.maximum(s['zs'], s['zb'])
@@ -110,6 +110,8 @@ def interpolate(s, p, t):
     return s
 
 
+@process(inputs=['zs', 'zb', 'uw', 'moist', 'salt', 'meteo'],
+         outputs=['moist', 'salt'])
 def update(s, p, dt):
     '''Update soil moisture content
 
@@ -174,23 +176,24 @@ def update(s, p, dt):
         delta = saturation_pressure(met['T']) * (1. - met['RH']) # [kPa]
         gamma = (p['cpair'] * met['P']) / (.622 * l) # [kPa/K]
         u2 = .174 / np.log10(p['z'] / 2.) * s['uw'] # [m/s]
-   
-        evo = np.maximum(0., (m * rad \
-                              + gamma * 6.43 * (1. + 0.536 * u2) * delta) \
-                         / (l * (m + gamma)))
-
-        # convert evaporation from mm/day to m/s
-        evo = evo / 24. / 3600. / 1000.
 
         # convert precipitation from mm/hr to m/s
         pcp = met['RH'] / 3600. / 1000.
 
+        v = dict(m=m, rad=rad, gamma=gamma, u2=u2, delta=delta, l=l, pcp=pcp, dt=dt,
+                 moist=s['moist'][:,:,0], thlyr=p['layer_thickness'], nlayers=p['nlayers'])
+
+        evo = evaluate('(m * rad + gamma * 6.43 * (1. + 0.536 * u2) * delta) / (l * (m + gamma))', v,
+                       use_numexpr=p['numexpr'])
+
+        # convert evaporation from mm/day to m/s and update moisture
+        # content
+        v['evo'] = evo
+        moist = evaluate('moist + (pcp - where(evo < 0., 0., evo) / 24. / 3600. / 1000.) * dt / thlyr / nlayers', v,
+                         use_numexpr=p['numexpr'])
+
         # update moisture and salt content
-        s['moist'][:,:,0] = np.maximum(0.,
-                                       np.minimum(p['porosity'],
-                                                  s['moist'][:,:,0] \
-                                                  + (pcp - evo) * dt \
-                                                  / p['layer_thickness'] / p['nlayers']))
+        s['moist'][:,:,0] = np.maximum(0., np.minimum(p['porosity'], moist))
         s['salt'][:,:,0] = np.minimum(1., s['salt'][:,:,0] + pcp * dt / p['layer_thickness'])
 
     return s
@@ -31,12 +31,14 @@ import os
 import re
 import time
 import shutil
+import hashlib
 import logging
 import numpy as np
 
 # package modules
 from aeolis.utils import *
 from aeolis.constants import *
+from aeolis.forcing import FORCING_FILES, load
 
 # initialize logger
 logger = logging.getLogger(__name__)
@@ -54,7 +56,9 @@ def read_configfile(configfile, parse_files=True, load_defaults=True):
     Parameters are casted into the best matching variable type. If the
     variable type is ``str`` it is optionally interpreted as a
     filename. If the corresponding file is found it is parsed using
-    the ``numpy.loadtxt`` function.
+    the ``numpy.loadtxt`` function. Forcing files are parsed using
+    :func:`~forcing.load`, unless ``forcing_window`` is set, in which
+    case they are read in windows during the simulation.
 
     Parameters
     ----------
@@ -89,9 +93,16 @@ def read_configfile(configfile, parse_files=True, load_defaults=True):
             for line in fp:
                 if '=' in line and not line.strip().startswith('%'):
                     key, val = line.split('=')[:2]
-                    p[key.strip()] = parse_value(val, parse_files=parse_files)
+                    key = key.strip()
+                    p[key] = parse_value(val, parse_files=parse_files and key not in FORCING_FILES)
     else:
         logger.log_and_raise('File not found [%s]' % configfile, exc=IOError)
+
+    # read forcing files, unless read in windows during the simulation
+    if parse_files and not p.get('forcing_window'):
+        for key in FORCING_FILES.keys():
+            if isinstance(p.get(key), str) and os.path.isfile(p[key]):
+                p[key] = load(p[key], realization=p.get('forcing_realization', 0))
        
     # normalize grain size distribution
     if 'grain_dist' in p:
@@ -279,6 +290,47 @@ def parse_value(val, parse_files=True, force_list=False):
         return val
 
 
+def get_hash(p, exclude=[]):
+    '''Returns hash of model configuration
+
+    Arrays are hashed by their contents and files referred to by
+    string parameters by the contents of the file, such that model
+    configurations with the same input data have the same hash.
+    Private parameters, starting with an underscore, are not
+    hashed.
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+    exclude : list, optional
+        Names of parameters not to be hashed
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-1 hash
+
+    '''
+
+    h = hashlib.sha1()
+    for key in sorted(p.keys()):
+        if key.startswith('_') or key in exclude:
+            continue
+        val = p[key]
+        h.update(key.encode('utf-8'))
+        if isinstance(val, np.ndarray):
+            h.update(('%s %s' % (val.dtype, val.shape)).encode('utf-8'))
+            h.update(np.ascontiguousarray(val).tobytes())
+        elif isinstance(val, str) and os.path.isfile(val):
+            with open(val, 'rb') as fp:
+                h.update(fp.read())
+        else:
+            h.update(repr(val).encode('utf-8'))
+
+    return h.hexdigest()
+
+
 def backup(fname):
     '''Creates a backup file of the provided file, if it exists'''
     
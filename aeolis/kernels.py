@@ -0,0 +1,304 @@
+'''This file is part of AeoLiS.
+
+AeoLiS is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+AeoLiS is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with AeoLiS.  If not, see <http://www.gnu.org/licenses/>.
+
+AeoLiS  Copyright (C) 2015 Bas Hoonhout
+
+bas.hoonhout@deltares.nl         b.m.hoonhout@tudelft.nl
+Deltares                         Delft University of Technology
+Unit of Hydraulic Engineering    Faculty of Civil Engineering and Geosciences
+Boussinesqweg 1                  Stevinweg 1
+2629 HVDelft                     2628CN Delft
+The Netherlands                  The Netherlands
+
+'''
+
+
+from __future__ import absolute_import, division
+
+import math
+import logging
+import numpy as np
+
+
+# initialize logger
+logger = logging.getLogger(__name__)
+
+
+# check if numba is available
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+def jit(func):
+    '''Compile function with Numba, if available
+
+    Kernels are written as explicit loops over the grid that are
+    compiled to machine code if Numba is available. Otherwise the
+    function is returned unchanged and the calling module should use
+    its vectorized NumPy implementation instead. The uncompiled
+    kernel remains available as ``func.py_func`` in both cases.
+
+    Parameters
+    ----------
+    func : function
+        Kernel function
+
+    Returns
+    -------
+    function
+        Compiled kernel function
+
+    '''
+
+    if HAVE_NUMBA:
+        return numba.njit(cache=True)(func)
+
+    func.py_func = func
+    return func
+
+
+def use_jit(p):
+    '''Check if compiled kernels should be used
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    bool
+        True if Numba is available and enabled
+
+    '''
+
+    return HAVE_NUMBA and p['jit']
+
+
+@jit
+def avalanche(zb, zne, ds, dn, tan_dyn, E, ncolors, max_iter, is1d):
+    '''Relax bed slopes steeper than the dynamic critical slope
+
+    Loop-based equivalent of the iteration in
+    :func:`aeolis.avalanching.avalanche`. The bed level is updated in
+    place.
+
+    Parameters
+    ----------
+    zb : numpy.ndarray
+        Bed level
+    zne : numpy.ndarray
+        Level of non-erodible layer
+    ds : numpy.ndarray
+        Grid spacing in x-direction
+    dn : numpy.ndarray
+        Grid spacing in y-direction
+    tan_dyn : float
+        Dynamic critical bed slope
+    E : float
+        Relaxation factor
+    ncolors : int
+        Number of colors in which cells are relaxed, 1 for
+        simultaneous and 2 for red-black relaxation
+    max_iter : int
+        Maximum number of iterations
+    is1d : bool
+        Use 1D interpretation
+
+    Returns
+    -------
+    int
+        Number of iterations
+
+    '''
+
+    ny, nx = zb.shape
+
+    grad_h_down = np.zeros((ny, nx, 4))
+    flux_down = np.zeros((ny, nx, 4))
+    grad_h = np.zeros((ny, nx))
+    dz = np.zeros((ny, nx))
+
+    if is1d:
+        directions = np.array([0, 2])
+    else:
+        directions = np.array([0, 1, 2, 3])
+
+    n_iter = 0
+    converged = False
+
+    for i in range(max_iter):
+
+        relaxed = False
+
+        for color in range(ncolors):
+
+            # gradients
+            max_grad_h = 0.
+            for r in range(ny):
+                for c in range(nx):
+                    for j in range(4):
+                        grad_h_down[r,c,j] = 0.
+                    if c == 0 or c == nx-1 or (not is1d and (r == 0 or r == ny-1)):
+                        grad_h[r,c] = 0.
+                        continue
+
+                    # positive and negative x-direction
+                    zl = zb[r,c-1]
+                    zr = zb[r,c+1]
+                    if zr > zl:
+                        g0 = -(zb[r,c] - zl)
+                    else:
+                        g0 = zb[r,c] - zr
+                    if zl > zr:
+                        g2 = -(zb[r,c] - zr)
+                    else:
+                        g2 = zb[r,c] - zl
+                    if zr > zb[r,c] and zl > zb[r,c]:
+                        g0 = 0.
+                        g2 = 0.
+
+                    # positive and negative y-direction
+                    g1 = 0.
+                    g3 = 0.
+                    if not is1d:
+                        zd = zb[r-1,c]
+                        zu = zb[r+1,c]
+                        if zu > zd:
+                            g1 = -(zb[r,c] - zd)
+                        else:
+                            g1 = zb[r,c] - zu
+                        if zd > zu:
+                            g3 = -(zb[r,c] - zu)
+                        else:
+                            g3 = zb[r,c] - zd
+                        if zu > zb[r,c] and zd > zb[r,c]:
+                            g1 = 0.
+                            g3 = 0.
+
+                    grad_h_down[r,c,0] = g0 / ds[r,c]
+                    grad_h_down[r,c,1] = g1 / dn[r,c]
+                    grad_h_down[r,c,2] = g2 / ds[r,c]
+                    grad_h_down[r,c,3] = g3 / dn[r,c]
+
+                    grad_h[r,c] = math.sqrt(0.5*grad_h_down[r,c,0]**2 + 0.5*grad_h_down[r,c,1]**2 +
+                                            0.5*grad_h_down[r,c,2]**2 + 0.5*grad_h_down[r,c,3]**2)
+                    if grad_h[r,c] > max_grad_h:
+                        max_grad_h = grad_h[r,c]
+
+            if max_grad_h < tan_dyn:
+                converged = True
+                break
+
+            # fluxes
+            active = False
+            for r in range(ny):
+                for c in range(nx):
+                    for j in range(4):
+                        flux_down[r,c,j] = 0.
+
+                    slope_diff = 0.
+                    grad_h_nonerod = (zb[r,c] - zne[r,c]) / ds[r,c]
+                    if grad_h[r,c] > tan_dyn and grad_h_nonerod > 0:
+                        slope_diff = math.tanh(grad_h[r,c]) - math.tanh(0.9*tan_dyn)
+                    if grad_h_nonerod < grad_h[r,c] - tan_dyn:
+                        slope_diff = math.tanh(grad_h_nonerod)
+
+                    if grad_h[r,c] != 0:
+                        for j in directions:
+                            flux_down[r,c,j] = slope_diff * grad_h_down[r,c,j] / grad_h[r,c]
+                            if flux_down[r,c,j] != 0.:
+                                active = True
+
+                    # only cells of the current color release sediment
+                    if ncolors > 1 and (r + c) % 2 != color:
+                        for j in range(4):
+                            flux_down[r,c,j] = 0.
+
+            if not active:
+                converged = True
+                break
+
+            # change in bed level
+            for r in range(ny):
+                for c in range(nx):
+                    q_out = 0.
+                    for j in directions:
+                        q_out += 0.5*abs(flux_down[r,c,j])
+                    q_in = 0.
+                    if c > 0 and c < nx-1 and (is1d or (r > 0 and r < ny-1)):
+                        q_in = max(flux_down[r,c-1,0], 0.) - min(flux_down[r,c+1,0], 0.)
+                        if not is1d:
+                            q_in += max(flux_down[r-1,c,1], 0.) - min(flux_down[r+1,c,1], 0.)
+                        q_in += max(flux_down[r,c+1,2], 0.) - min(flux_down[r,c-1,2], 0.)
+                        if not is1d:
+                            q_in += max(flux_down[r+1,c,3], 0.) - min(flux_down[r-1,c,3], 0.)
+                        q_in *= 0.5
+                    dz[r,c] = q_in - q_out
+
+            for r in range(ny):
+                for c in range(nx):
+                    zb[r,c] += E * dz[r,c]
+
+            relaxed = True
+
+        if relaxed:
+            n_iter += 1
+
+        if converged:
+            break
+
+    return n_iter
+
+
+@jit
+def markov_chain(cdf, r, state):
+    '''Walk Markov chain given cumulative transition probabilities
+
+    Parameters
+    ----------
+    cdf : numpy.ndarray
+        Cumulative transition probabilities from each state (row) to
+        each state (column)
+    r : numpy.ndarray
+        Uniformly distributed random numbers, one for each transition
+    state : int
+        Initial state
+
+    Returns
+    -------
+    numpy.ndarray
+        States after each transition
+
+    '''
+
+    n = cdf.shape[1]
+    states = np.zeros(len(r), dtype=np.int64)
+
+    for k in range(len(r)):
+
+        # first state with a cumulative probability exceeding the
+        # random number, or the last state in case of round-off
+        j = 0
+        while j < n - 1 and not cdf[state,j] > r[k]:
+            j += 1
+
+        state = j
+        states[k] = state
+
+    return states
@@ -34,15 +34,15 @@ import time
 import glob
 import logging
 import warnings
-import operator
 import numpy as np
 import scipy.sparse
+import copy
 import pickle
 import scipy.sparse.linalg
+import scipy.signal
 import matplotlib.pyplot as plt
 from datetime import timedelta
 from bmi.api import IBmi
-from functools import reduce
 
 # package modules
 import aeolis.inout
@@ -52,8 +52,10 @@ import aeolis.wind
 import aeolis.threshold
 import aeolis.transport
 import aeolis.hydro
+import aeolis.forcing
 import aeolis.netcdf
 import aeolis.constants
+import aeolis.kernels
 
 import aeolis.vegetation
 
@@ -154,12 +156,15 @@ class AeoLiS(IBmi):
 
         self.t = 0.
         self.dt = 0.
+        self.dt_adaptive = 0. # next adaptive time step
         self.configfile = ''
 
         self.l = {} # previous spatial grids
         self.s = ModelState() # spatial grids
         self.p = {} # parameters
         self.c = {} # counters
+        self.m = {} # process memory
+        self.tp = {} # previous times of multi-rate processes
 
         self.configfile = configfile
 
@@ -201,6 +206,7 @@ class AeoLiS(IBmi):
 
         # initialize time
         self.t = self.p['tstart']
+        self.dt_adaptive = self.p['dt']
 
         # get model dimensions
         nx = self.p['nx']
@@ -218,10 +224,20 @@ class AeoLiS(IBmi):
 
         # initialize wind model
         self.s = aeolis.wind.initialize(self.s, self.p)
+
+        # initialize grain properties
+        self.s = aeolis.transport.initialize(self.s, self.p)
+
+        # initialize threshold cache
+        self.s = aeolis.threshold.initialize(self.s, self.p)
          
         #initialize vegetation model
         self.s = aeolis.vegetation.initialize(self.s, self.p)                  
 
+        # spin up bed composition
+        if self.p['spinup']:
+            self.spinup()
+
 
     def update(self, dt=-1):
         '''Time stepping function
@@ -250,6 +266,13 @@ class AeoLiS(IBmi):
         '''
 
 
+        if dt < 0. and dt >= -1. and self.p['fastforward']:
+            if self.fastforward():
+                return
+
+        if dt < 0. and dt >= -1. and self.p['dt_adaptive'] and self.p['scheme'] != 'euler_forward':
+            return self.update_adaptive()
+
         self.p['_time'] = self.t
 
         # store previous state
@@ -258,34 +281,54 @@ class AeoLiS(IBmi):
         self.l['dzbavg'] = self.s['dzbavg'].copy()
 
         # interpolate wind time series
-        self.s = aeolis.wind.interpolate(self.s, self.p, self.t)
+        self.run_process(aeolis.wind.interpolate, self.t)
         
+        # discard wind shear perturbation relative to the undisturbed
+        # wind shear after dt_shear, such that it is recomputed
+        rel = self.p.get('_shear')
+        if rel is not None and self.t >= rel['time'] + self.p['dt_shear']:
+            del self.p['_shear']
+
         if np.sum(self.s['uw']) != 0:
         
             # calculate wind shear (bed + separation bubble)
-            self.s = aeolis.wind.shear(self.s, self.p)
+            self.run_process(aeolis.wind.shear)
 
         # compute vegetation shear
         if self.p['process_vegetation']: 
-            self.s = aeolis.vegetation.vegshear(self.s, self.p)
+            self.run_process(aeolis.vegetation.vegshear)
         
         # determine optimal time step
         if not self.set_timestep(dt):
             return
 
+        # truncate acceleration factor to hit next output time
+        accfac = self.p['accfac']
+        tout = None
+        if self.p['accfac_adaptive']:
+            tout = self.get_next_output_time()
+            if self.t < self.p['tstop']:
+                tout = min(tout, self.p['tstop'])
+            if (tout - self.t) / self.dt < accfac:
+                self.p['accfac'] = (tout - self.t) / self.dt
+                self.s['Ct'] *= self.p['accfac'] / accfac
+            else:
+                tout = None
+        self.s['accfaceff'][...] = self.p['accfac']
+
         # interpolate hydrodynamic time series
-        self.s = aeolis.hydro.interpolate(self.s, self.p, self.t)
-        self.s = aeolis.hydro.update(self.s, self.p, self.dt)
+        self.run_process(aeolis.hydro.interpolate, self.t)
+        self.run_process(aeolis.hydro.update, self.dt)
 
         # mix top layer
-        self.s = aeolis.bed.mixtoplayer(self.s, self.p)
+        self.run_process(aeolis.bed.mixtoplayer)
         
         # compute threshold
-        self.s = aeolis.threshold.compute(self.s, self.p)
+        self.run_process(aeolis.threshold.compute, self.dt * self.p['accfac'])
 
         # compute saltation velocity and equilibrium transport
         #self.s = aeolis.transport.saltationvelocity(self.s, self.p)
-        self.s = aeolis.transport.equilibrium(self.s, self.p)
+        self.run_process(aeolis.transport.equilibrium)
 
         # compute instantaneous transport
         if self.p['scheme'] == 'euler_forward':
@@ -298,23 +341,536 @@ class AeoLiS(IBmi):
             logger.log_and_raise('Unknown scheme [%s]' % self.p['scheme'], exc=ValueError)
 
         # update bed
-        self.s = aeolis.bed.update(self.s, self.p)
+        self.run_process(aeolis.bed.update)
         
+        # avalanching, average bed level change and vegetation
+        avalanched = self.update_morphology()
+
+        # increment time
+        self.t += self.dt * self.p['accfac']
+        self._count('time')
+        self._count('accfac', self.p['accfac'])
+
+        # prevent round-off errors in output time
+        if tout is not None:
+            self.t = tout
+
+        # adapt acceleration factor for next time step
+        if self.p['accfac_adaptive']:
+            self.update_accfac(avalanched, accfac if tout is not None else None)
+
+
+    def update_morphology(self):
+        '''Avalanching, average bed level change and vegetation growth
+
+        Updates the processes that follow the bed level change in the
+        current time step of ``dt`` times ``accfac`` seconds, which
+        may be an entire skipped period, see
+        :func:`~model.AeoLiS.fastforward`. Avalanching and vegetation
+        growth are executed at their own interval, see
+        :func:`~model.AeoLiS.elapsed`.
+
+        Returns
+        -------
+        bool
+            True if avalanching changed the bed level, False otherwise
+
+        '''
+
         # avalanching
-        self.s = aeolis.avalanching.angele_of_repose(self.s, self.p)
-        self.s = aeolis.avalanching.avalanche(self.s, self.p)
+        avalanched = False
+        if self.elapsed('avalanche', self.p['dt_avalanche']):
+            self.run_process(aeolis.avalanching.angele_of_repose)
+            self.run_process(aeolis.avalanching.avalanche)
+
+            stats = self.p.pop('_avalanche', None)
+            if stats is not None:
+                self._count('avalanching.iterations', stats['iterations'])
+                self._count('avalanching.cells', stats['cells'])
+                avalanched = stats['cells'] > 0
         
         # calculate average bedlevel change over time
-        self.s = aeolis.bed.average_change(self.l, self.s, self.p)
+        self.s = aeolis.bed.average_change(self.l, self.s, self.p, self.dt * self.p['accfac'])
         
         # grow vegetation
         if self.p['process_vegetation']:
-            self.s = aeolis.vegetation.germinate(self.s, self.p)
-            self.s = aeolis.vegetation.grow(self.s, self.p)
+            dt_veg = self.elapsed('vegetation', self.p['dt_vegetation'])
+            if dt_veg:
+                self.run_process(aeolis.vegetation.germinate, dt_veg)
+                self.run_process(aeolis.vegetation.grow, dt_veg)
+
+        return avalanched
+
+
+    def update_accfac(self, avalanched=False, truncated=None):
+        '''Adapt morphological acceleration factor
+
+        Raises the acceleration factor ``accfac`` by at most a factor
+        ``accfac_growth`` per time step as long as the bed level
+        change in the previous time step is below the stability limit
+        ``tol_accfac``. The acceleration factor is lowered
+        proportionally if the bed level change exceeds the limit,
+        for example during storms, and by at least a factor
+        ``accfac_growth`` if avalanching occurred. The acceleration
+        factor is bounded by ``accfac_min`` and ``accfac_max``. As
+        the sediment concentration is scaled with the acceleration
+        factor, it is rescaled accordingly.
+
+        The acceleration factor of a time step is truncated such that
+        the time step does not pass the next output time, see
+        :func:`~model.AeoLiS.update`. After such a time step, the
+        acceleration factor before truncation is restored, unless the
+        acceleration factor needs to be lowered. The acceleration
+        factor applied in each time step is available as spatial grid
+        ``accfaceff``.
 
-        # increment time
-        self.t += self.dt * self.p['accfac']
-        self._count('time')
+        Parameters
+        ----------
+        avalanched : bool, optional
+            Avalanching occurred in the previous time step
+        truncated : float, optional
+            Acceleration factor before truncation to hit the output
+            time in the previous time step
+
+        See Also
+        --------
+        transport.equilibrium
+
+        '''
+
+        accfac = self.p['accfac']
+
+        dzb = np.max(np.abs(self.s['dzb']))
+        if dzb > 0.:
+            factor = min(self.p['accfac_growth'], max(.2, .9 * self.p['tol_accfac'] / dzb))
+        else:
+            factor = self.p['accfac_growth']
+        if avalanched:
+            factor = min(factor, 1. / self.p['accfac_growth'])
+
+        if truncated is not None and factor >= 1.:
+            self.p['accfac'] = truncated
+        else:
+            self.p['accfac'] = min(max(accfac * factor, self.p['accfac_min']), self.p['accfac_max'])
+        self.s['Ct'] *= self.p['accfac'] / accfac
+
+        if self.p['accfac'] < accfac:
+            logger.info(format_log('Acceleration factor reduced',
+                                   time=self.t,
+                                   accfac=self.p['accfac'],
+                                   dzb=dzb,
+                                   avalanching=avalanched))
+        else:
+            logger.debug(format_log('Acceleration factor',
+                                    time=self.t,
+                                    accfac=self.p['accfac'],
+                                    dzb=dzb))
+
+
+    def update_adaptive(self):
+        '''Time stepping function with error-controlled time step
+
+        Performs a single time step with an adaptive time step for
+        implicit numerical schemes. The time step is rejected and
+        repeated with a smaller time step if the bed level, sediment
+        concentration or pickup change faster than the tolerances
+        ``tol_zb``, ``tol_Ct`` and ``tol_pickup`` allow, or if the
+        iteration of the weights of the sediment fractions did not
+        converge. Rejected time steps are rolled back from a copy of
+        the model state, including the counters, such that the run
+        statistics only include accepted time steps. Rejected time
+        steps are counted as ``rejected``. The next time step grows
+        by at most a factor ``dt_growth`` during calm or steady
+        conditions. The time step is bounded by ``dt_min`` and
+        ``dt_max`` and truncated to hit the output times exactly.
+
+        See Also
+        --------
+        model.AeoLiS.update
+
+        '''
+
+        snapshot = self._snapshot_state()
+        rejected = 0
+
+        while True:
+
+            notconverged = self.get_count('notconverged')
+
+            # truncate time step to hit next output time
+            dt = min(max(self.dt_adaptive, self.p['dt_min']), self.p['dt_max'])
+            tout = self.get_next_output_time()
+            truncated = (tout - self.t) / self.p['accfac'] <= dt
+            if truncated:
+                dt = (tout - self.t) / self.p['accfac']
+
+            AeoLiS.update(self, dt)
+
+            # prevent round-off errors in output time
+            if truncated:
+                self.t = tout
+
+            err = self._timestep_error(snapshot)
+            converged = self.get_count('notconverged') == notconverged
+
+            if (err <= 1. and converged) or dt <= self.p['dt_min']:
+                break
+
+            # reject time step
+            self._restore_state(snapshot)
+            rejected += 1
+            logger.debug(format_log('Time step rejected',
+                                    time=self.t,
+                                    dt=dt,
+                                    error=err,
+                                    converged=converged))
+            if converged:
+                self.dt_adaptive = dt * max(.2, .9 / err)
+            else:
+                self.dt_adaptive = dt / 2.
+
+        if rejected > 0:
+            self._count('rejected', rejected)
+
+        # grow time step, unless truncated to hit output time
+        if err > 0.:
+            factor = min(self.p['dt_growth'], max(.2, .9 / err))
+        else:
+            factor = self.p['dt_growth']
+        if not truncated or factor < 1.:
+            self.dt_adaptive = dt * factor
+
+
+    def fastforward(self):
+        '''Skip period without aeolian transport
+
+        Detects the number of consecutive time steps ahead in which
+        the wind shear velocity from the wind time series is below the
+        threshold based on grain size only. The wind shear velocity is
+        multiplied by the maximum speed-up due to the wind shear
+        perturbation in the previous time step and by
+        ``fastforward_factor`` as safety margin. Other bed surface
+        properties only increase the threshold, so no sediment is
+        picked up in these time steps. If in addition the sediment
+        concentration is negligible, the time steps are skipped up to
+        the next output time. In the skipped period the soil moisture
+        and salt content are updated by :func:`~hydro.update`, of
+        which the exponential decay is integrated exactly over the
+        entire period unless the water level changes, and the bed is
+        affected by the marine processes. Avalanching, the average
+        bed level change and vegetation growth are updated over the
+        entire period, see :func:`~model.AeoLiS.update_morphology`.
+
+        Returns
+        -------
+        bool
+            True if a period was skipped, False otherwise
+
+        See Also
+        --------
+        model.AeoLiS.update
+        model.AeoLiS.get_next_output_time
+
+        '''
+
+        if not self.p['process_wind'] or self.p['wind_file'] is None or 'meteo' in self.s:
+            return False
+
+        if np.max(self.s['Ct']) > self.p['tol_fastforward']:
+            return False
+
+        uth = np.min(self.s['uth0'])
+        if uth <= 0.:
+            return False
+
+        # times of regular time steps up to next output time
+        dt = self.p['dt'] * self.p['accfac']
+        tend = min(self.get_next_output_time(), self.p['tstop'])
+        t = self.t + np.arange(max(1, int(np.ceil((tend - self.t) / dt - 1e-6)))) * dt
+
+        # maximum speed-up of wind shear velocity in previous time step
+        ustar0 = np.max(self.s['ustar0'])
+        speedup = max(1., np.max(self.s['ustar']) / ustar0) if ustar0 > 0. else 1.
+
+        # count time steps with wind shear velocity below threshold
+        fac = self.p['kappa'] / np.log(self.p['z'] / self.p['k'])
+        uw = np.asarray([aeolis.forcing.interpolate(self.p, ti)['uw'] for ti in t])
+        calm = np.abs(uw) * fac * speedup * self.p['fastforward_factor'] < uth
+        n = len(t) if np.all(calm) else np.argmin(calm)
+        if n == 0:
+            return False
+
+        # integrate soil moisture and salt content at the resolution
+        # of the time steps if the water level changes and exactly
+        # over the entire period otherwise, mixing by waves and
+        # resetting of the bed in the swash zone is still applied
+        # every time step
+        hydro = (self.p['process_tide'] and self.p['tide_file'] is not None) or \
+                (self.p['process_wave'] and self.p['wave_file'] is not None)
+
+        # store previous state
+        self.l = self.s.copy()
+        self.l['zb'] = self.s['zb'].copy()
+        self.l['dzbavg'] = self.s['dzbavg'].copy()
+
+        if not hydro:
+            self.run_process(aeolis.hydro.update, n * dt / self.p['accfac'])
+
+        self.s['pickup'][...] = 0.
+        for ti in t[:n]:
+            self.p['_time'] = ti
+            if hydro:
+                self.run_process(aeolis.hydro.interpolate, ti)
+                self.run_process(aeolis.hydro.update, dt / self.p['accfac'])
+            self.run_process(aeolis.bed.mixtoplayer)
+            self.run_process(aeolis.bed.update)
+
+        # avalanching, average bed level change and vegetation over
+        # the entire period
+        self.dt = n * self.p['dt']
+        self.update_morphology()
+
+        logger.info(format_log('Skipped period below threshold',
+                               time=self.t,
+                               duration=n * dt,
+                               steps=n))
+
+        self.t += n * dt
+        self._count('fastforward')
+        self._count('fastforward.steps', n)
+
+        return True
+
+
+    def spinup(self):
+        '''Spin up bed composition to equilibrium
+
+        Replaces a separate transient simulation of which the bed
+        composition is used as ``bedcomp_file``. Sediment transport
+        and the bed composition are updated with the steady state
+        solver until the grain size distribution in the top bed
+        layer changes less than ``tol_spinup``, or for at most
+        ``spinup_max_steps`` time steps. The bed level is reset after
+        every time step, such that the bed composition converges for
+        the initial bathymetry. Afterwards, the model state is reset
+        except for the bed composition. The spin-up time steps are
+        not included in the output statistics.
+
+        The numerical acceleration factor is adapted up to
+        ``spinup_accfac``, see :func:`~model.AeoLiS.update_accfac`,
+        such that the bed level change per time step does not exceed
+        the thickness of a bed layer. With time-varying forcing the
+        bed composition follows the forcing rather than becoming
+        steady. In that case, the grain size distribution is averaged
+        over periods of ``spinup_period`` seconds, for example the
+        duration of the forcing time series, and the averages of
+        subsequent periods are compared. Periods without transport
+        are not considered converged.
+
+        The converged bed composition is written to a binary NumPy
+        file in the directory ``spinup_cache`` named after the hash of
+        the model configuration, see :func:`~inout.get_hash`. If this
+        file exists, the bed composition is read from it and spin-up
+        is skipped.
+
+        Returns
+        -------
+        bool
+            True if the bed composition converged or was read from
+            file, False otherwise
+
+        See Also
+        --------
+        model.AeoLiS.solve_steadystate
+
+        '''
+
+        fname = None
+        if self.p['spinup_cache']:
+            h = aeolis.inout.get_hash(self.p, exclude=['tstop', 'restart', 'refdate', 'callback',
+                                                      'output_times', 'output_file',
+                                                      'output_vars', 'output_types',
+                                                      'spinup_cache'])
+            fname = os.path.join(self.p['spinup_cache'], '%s.npz' % h)
+            if os.path.exists(fname):
+                with np.load(fname) as f:
+                    if f['mass'].shape == self.s['mass'].shape:
+                        self.s['mass'][...] = f['mass']
+                        logger.info('Read spun-up bed composition [%s]' % fname)
+                        return True
+
+        snapshot = self._snapshot_state()
+        params = {k:self.p[k] for k in ['solver', 'accfac', 'dt_adaptive', 'fastforward',
+                                        'accfac_adaptive', 'accfac_max', 'tol_accfac']}
+        self.p.update(solver='steadystate',
+                      accfac=min(self.p['accfac_min'], self.p['spinup_accfac']),
+                      dt_adaptive=False,
+                      fastforward=False,
+                      accfac_adaptive=True,
+                      accfac_max=self.p['spinup_accfac'],
+                      tol_accfac=min(self.p['tol_accfac'], self.p['layer_thickness']))
+
+        def get_distribution():
+            m = self.s['mass'][:,:,0,:]
+            mt = np.sum(m, axis=-1, keepdims=True)
+            return np.divide(m, mt, out=np.zeros(m.shape), where=mt > 0.)
+
+        zb = self.s['zb'].copy()
+        converged = False
+        change = np.inf
+        n = 0
+        try:
+            gs = get_distribution()
+            gsavg, duration, transport = 0., 0., False
+            for n in range(1, self.p['spinup_max_steps'] + 1):
+                t = self.t
+                AeoLiS.update(self)
+                self.s['zb'][...] = zb
+                dt = self.t - t
+
+                # average grain size distribution over period
+                gsavg += get_distribution() * dt
+                duration += dt
+                transport |= np.any(self.s['pickup'] != 0.)
+                if duration < self.p['spinup_period']:
+                    continue
+
+                gsavg /= duration
+                change = np.max(np.abs(gsavg - gs))
+                if change < self.p['tol_spinup'] and transport:
+                    converged = True
+                    break
+
+                gs = gsavg
+                gsavg, duration, transport = 0., 0., False
+        finally:
+            self.p.update(params)
+
+        mass = self.s['mass'].copy()
+        self._restore_state(snapshot)
+        self.s['mass'][...] = mass
+        self._count('spinup.steps', n)
+
+        if converged:
+            logger.info(format_log('Spin-up of bed composition converged',
+                                   steps=n,
+                                   change=change))
+            if fname is not None:
+                if not os.path.exists(self.p['spinup_cache']):
+                    os.makedirs(self.p['spinup_cache'])
+                np.savez(fname, mass=mass)
+                logger.info('Written spun-up bed composition [%s]' % fname)
+        else:
+            logger.warning(format_log('Spin-up of bed composition not converged',
+                                      steps=n,
+                                      change=change))
+
+        return converged
+
+
+    def get_next_output_time(self):
+        '''Returns the first output time after the current time
+
+        Returns
+        -------
+        float
+            Next output time
+
+        '''
+
+        tstart = self.p['tstart']
+        dt = self.p['output_times']
+        n = np.floor((self.t - tstart) / dt + 1e-6) + 1.
+
+        return tstart + n * dt
+
+
+    def _snapshot_state(self):
+        '''Copy model state to roll back a time step
+
+        Returns
+        -------
+        dict
+            Copies of the spatial grids, time, times of multi-rate
+            processes, counters, process memory, acceleration factor
+            and private runtime parameters
+
+        '''
+
+        return dict(s={k:v.copy() for k, v in self.s.items() if isinstance(v, np.ndarray)},
+                    t=self.t,
+                    tp=self.tp.copy(),
+                    c=self.c.copy(),
+                    m=self.m.copy(),
+                    accfac=self.p['accfac'],
+                    p={k:v for k, v in self.p.items() if k.startswith('_')})
+
+
+    def _restore_state(self, snapshot):
+        '''Roll back model state to a copy
+
+        Parameters
+        ----------
+        snapshot : dict
+            Copy of model state, see :func:`~model.AeoLiS._snapshot_state`
+
+        '''
+
+        for k, v in snapshot['s'].items():
+            if isinstance(self.s.get(k), np.ndarray) and self.s[k].shape == v.shape:
+                self.s[k][...] = v
+            else:
+                self.s[k] = v.copy()
+
+        self.t = snapshot['t']
+        self.tp = snapshot['tp'].copy()
+        self.c = snapshot['c'].copy()
+        self.m = snapshot['m'].copy()
+        self.p['accfac'] = snapshot['accfac']
+
+        for k in [k for k in self.p.keys() if k.startswith('_')]:
+            if k not in snapshot['p']:
+                del self.p[k]
+        self.p.update(snapshot['p'])
+
+
+    def _timestep_error(self, snapshot):
+        '''Relative error of time step with respect to tolerances
+
+        Parameters
+        ----------
+        snapshot : dict
+            Copy of model state before the time step, see
+            :func:`~model.AeoLiS._snapshot_state`
+
+        Returns
+        -------
+        float
+            Largest ratio of bed level change, sediment concentration
+            change and pickup to their tolerance
+
+        '''
+
+        s0 = snapshot['s']
+        s = self.s
+
+        err_zb = np.max(np.abs(s['zb'] - s0['zb'])) / self.p['tol_zb']
+
+        Cumax = np.max(s['Cu'])
+        if Cumax > 0.:
+            err_Ct = np.max(np.abs(s['Ct'] - s0['Ct'])) / (self.p['tol_Ct'] * Cumax)
+        else:
+            err_Ct = 0.
+
+        mass = s0['mass'][:,:,0,:].sum(axis=-1)
+        pickup = np.abs(s['pickup']).sum(axis=-1)
+        ix = mass > 0.
+        if np.any(ix):
+            err_pickup = np.max(pickup[ix] / mass[ix]) / self.p['tol_pickup']
+        else:
+            err_pickup = 0.
+
+        return max(err_zb, err_Ct, err_pickup)
 
 
     def finalize(self):
@@ -541,6 +1097,14 @@ class AeoLiS(IBmi):
         elif var in self.p:
             self.p[var] = val
 
+            # update grain properties and empty threshold, shear and
+            # vegetation caches and process memory
+            self.s = aeolis.transport.initialize(self.s, self.p)
+            self.s = aeolis.threshold.initialize(self.s, self.p)
+            self.p.pop('_shear', None)
+            self.p.pop('_vegfac', None)
+            self.m = {}
+
 
     def set_var_index(self, i, val):
         '''Set spatial grid by index (in alphabetical order)
@@ -973,6 +1537,7 @@ class AeoLiS(IBmi):
 
             # throw warning if the maximum number of iterations was reached
             if np.any(ix):
+                self._count('notconverged')
                 logger.warning(format_log('Iteration not converged',
                                           nrcells=np.sum(ix),
                                           fraction=i,
@@ -1358,6 +1923,7 @@ class AeoLiS(IBmi):
 
             # throw warning if the maximum number of iterations was reached
             if np.any(ix):
+                self._count('notconverged')
                 logger.warning(format_log('Iteration not converged',
                                           nrcells=np.sum(ix),
                                           fraction=i,
@@ -1745,6 +2311,7 @@ class AeoLiS(IBmi):
             # throw warning if the maximum number of iterations was
             # reached
             if np.any(ix):
+                self._count('notconverged')
                 logger.warn(format_log('Iteration not converged',
                                        nrcells=np.sum(ix),
                                        fraction=i,
@@ -2173,6 +2740,7 @@ class AeoLiS(IBmi):
             # throw warning if the maximum number of iterations was
             # reached
             if np.any(ix):
+                self._count('notconverged')
                 logger.warn(format_log('Iteration not converged',
                                        nrcells=np.sum(ix),
                                        fraction=i,
@@ -2251,6 +2819,161 @@ class AeoLiS(IBmi):
         self.c[name] += n
 
 
+    def elapsed(self, name, interval):
+        '''Time elapsed since previous execution of multi-rate process
+
+        Processes that act on time scales much larger than the time
+        step, like vegetation growth, can be executed at their own
+        interval. The process is due if the time elapsed since its
+        previous execution at the end of the current time step
+        exceeds the interval. The process is due every time step if
+        the interval is smaller than the time step.
+
+        Parameters
+        ----------
+        name : str
+            Name of multi-rate process
+        interval : float
+            Interval at which the process is executed
+
+        Returns
+        -------
+        float
+            Time elapsed since previous execution of the process if
+            the process is due, otherwise zero
+
+        '''
+
+        t0 = self.tp.get(name, self.p['tstart'])
+        t = self.t + self.dt * self.p['accfac']
+
+        if t - t0 < interval - 1e-6 * self.dt:
+            return 0.
+
+        self.tp[name] = t
+
+        return t - t0
+
+
+    def run_process(self, func, *args):
+        '''Run model process
+
+        Runs a model process with the spatial grids, model
+        configuration and any additional arguments. If incremental
+        updating is enabled (``incremental``), the process is skipped
+        if the spatial grids and the model configuration parameters
+        it reads and its additional arguments did not change since
+        its previous execution. The spatial grids it writes are then
+        restored from its previous execution. The spatial grids read
+        and written by a process and the model configuration
+        parameters that it reads and that change during the
+        simulation, like the acceleration factor, are declared using
+        :func:`~utils.process`. Processes declared ``volatile`` are
+        never skipped. Changing other model configuration parameters
+        with :func:`~model.AeoLiS.set_var` empties the process memory.
+
+        The number of executions and skips of each process are
+        counted, see :func:`~model.AeoLiS.get_count`. For example,
+        ``wind.shear`` and ``wind.shear.skipped``.
+
+        Parameters
+        ----------
+        func : function
+            Model process
+        args : tuple
+            Additional arguments to model process
+
+        '''
+
+        name = '%s.%s' % (func.__module__.split('.')[-1], func.__name__)
+
+        if not self.p['incremental'] or getattr(func, 'volatile', True):
+            self.s = func(self.s, self.p, *args)
+            self._count(name)
+            return
+
+        m = self.m.get(name)
+        if m is not None and m['args'] == args and self._unchanged(m['inputs']) \
+           and self._unchanged(m['params'], self.p):
+            for k, v in m['outputs'].items():
+                if isinstance(self.s.get(k), np.ndarray) and self.s[k].shape == v.shape:
+                    self.s[k][...] = v
+                elif k in self.s:
+                    self.s[k] = copy.deepcopy(v)
+            self._count('%s.skipped' % name)
+            return
+
+        inputs = self._snapshot(func.inputs)
+        params = self._snapshot(func.params, self.p)
+        self.s = func(self.s, self.p, *args)
+        self.m[name] = dict(args=args,
+                            inputs=inputs,
+                            params=params,
+                            outputs=self._snapshot(func.outputs))
+        self._count(name)
+
+
+    def _snapshot(self, names, d=None):
+        '''Copy spatial grids or model configuration parameters
+
+        Parameters
+        ----------
+        names : iterable
+            Names of spatial grids or model configuration parameters
+        d : dict, optional
+            Model configuration, if not given the spatial grids are
+            copied
+
+        Returns
+        -------
+        dict
+            Copies of spatial grids, missing spatial grids are None
+
+        '''
+
+        if d is None:
+            d = self.s
+
+        return {k:copy.deepcopy(d.get(k)) for k in names}
+
+
+    def _unchanged(self, snapshot, d=None):
+        '''Check if spatial grids equal a previous copy
+
+        Parameters
+        ----------
+        snapshot : dict
+            Copies of spatial grids, see :func:`~model.AeoLiS._snapshot`
+        d : dict, optional
+            Model configuration, if not given the copies are compared
+            to the spatial grids
+
+        Returns
+        -------
+        bool
+            True if all spatial grids are equal to their copy
+
+        '''
+
+        if d is None:
+            d = self.s
+
+        def equal(x, v):
+            if isinstance(v, dict) or isinstance(x, dict):
+                return isinstance(v, dict) and isinstance(x, dict) and x.keys() == v.keys() \
+                    and all([equal(x[k], v[k]) for k in v.keys()])
+            elif isinstance(v, np.ndarray) or isinstance(x, np.ndarray):
+                return np.array_equal(x, v)
+            else:
+                return x == v
+
+        for k, v in snapshot.items():
+            if not equal(d.get(k), v):
+                return False
+
+        return True
+
+
     def _dims2shape(self, dims):
         '''Converts named dimensions to numbered shape
 
@@ -2365,7 +3088,9 @@ class AeoLiSRunner(AeoLiS):
         self.trestart = 0.
 
         self.n = 0 # time step counter
+        self.w = 0. # time covered by output stats
         self.o = {} # output stats
+        self.clear = False # clear output stats
 
         self.changed = False
         self.cwd = None
@@ -2515,16 +3240,21 @@ class AeoLiSRunner(AeoLiS):
 
 
     def set_params(self, **kwargs):
-        '''Set model configuration parameters'''
+        '''Set model configuration parameters and empty process memory'''
 
         if len(kwargs) > 0:
             self.changed = True
             self.p.update(kwargs)
+            self.m = {}
 
 
     def get_statistic(self, var, stat='avg'):
         '''Return statistic of spatial grid
 
+        The average and variance are weighted by the time step, such
+        that they represent the time-averaged model state regardless
+        of adaptive time steps or acceleration factors.
+
         Parameters
         ----------
         var : str
@@ -2542,14 +3272,14 @@ class AeoLiSRunner(AeoLiS):
         if stat in ['min', 'max', 'sum']:
             return self.o[var][stat]
         elif stat == 'avg':
-            if self.n > 0:
-                return self.o[var]['sum'] / self.n
+            if self.w > 0.:
+                return self.o[var]['avg'] / self.w
             else:
-                return np.zeros(self.o[var]['sum'].shape)
+                return np.zeros(self.o[var]['avg'].shape)
         elif stat == 'var':
-            if self.n > 1:
-                return (self.o[var]['var'] - self.o[var]['sum']**2 / self.n) \
-                    / (self.n - 1)
+            if self.n > 1 and self.w > 0.:
+                return (self.o[var]['var'] - self.o[var]['avg']**2 / self.w) \
+                    / (self.w * (self.n - 1) / self.n)
             else:
                 return np.zeros(self.o[var]['var'].shape)
         else:
@@ -2642,8 +3372,9 @@ class AeoLiSRunner(AeoLiS):
             self.output_clear()
             self.clear = False
 
+        t = self.t
         super(AeoLiSRunner, self).update(dt=dt)
-        self.output_update()
+        self.output_update(self.t - t)
 
 
     def write_params(self):
@@ -2703,8 +3434,9 @@ class AeoLiSRunner(AeoLiS):
     def output_clear(self):
         '''Clears output statistics dictionary
 
-        Creates a matrix for minimum, maximum, variance and summed
-        values for each output variable and sets the time step counter
+        Creates a matrix for minimum, maximum, summed, time-weighted
+        summed and time-weighted squared values for each output
+        variable and sets the time step counter and the time covered
         to zero.
 
         '''
@@ -2714,17 +3446,27 @@ class AeoLiSRunner(AeoLiS):
             self.o[k] = dict(min=np.zeros(s) + np.inf,
                              max=np.zeros(s) - np.inf,
                              var=np.zeros(s),
+                             avg=np.zeros(s),
                              sum=np.zeros(s))
 
         self.n = 0
+        self.w = 0.
 
 
-    def output_update(self):
+    def output_update(self, dt=1.):
         '''Updates output statistics dictionary
 
-        Updates matrices with minimum, maximum, variance and summed
-        values for each output variable with current spatial grid
-        values and increases time step counter with one.
+        Updates matrices with minimum, maximum, summed, time-weighted
+        summed and time-weighted squared values for each output
+        variable with current spatial grid values and increases time
+        step counter with one. The time-weighted values are used for
+        the average and variance, see
+        :func:`~model.AeoLiSRunner.get_statistic`.
+
+        Parameters
+        ----------
+        dt : float, optional
+            Time step by which the values are weighted
 
         '''
 
@@ -2734,12 +3476,15 @@ class AeoLiSRunner(AeoLiS):
                 self.o[k]['min'] = np.minimum(self.o[k]['min'], v)
             if 'max' in exts:
                 self.o[k]['max'] = np.maximum(self.o[k]['max'], v)
-            if 'sum' in exts or 'avg' in exts or 'var' in exts:
+            if 'sum' in exts:
                 self.o[k]['sum'] = self.o[k]['sum'] + v
+            if 'avg' in exts or 'var' in exts:
+                self.o[k]['avg'] = self.o[k]['avg'] + v * dt
             if 'var' in exts:
-                self.o[k]['var'] = self.o[k]['var'] + v**2
+                self.o[k]['var'] = self.o[k]['var'] + v**2 * dt
 
         self.n += 1
+        self.w += dt
 
 
     def output_write(self):
@@ -2822,6 +3567,9 @@ class AeoLiSRunner(AeoLiS):
                     self.s = state['s']
                     self.l = state['l']
                     self.c = state['c']
+                    self.tp = state.get('tp', {})
+                    self.dt_adaptive = state.get('dt_adaptive', self.p['dt'])
+                    self.m = {}
 
                     self.trestart = self.t
 
@@ -2841,7 +3589,9 @@ class AeoLiSRunner(AeoLiS):
                          'p':self.p,
                          's':self.s,
                          'l':self.l,
-                         'c':self.c}, fp)
+                         'c':self.c,
+                         'tp':self.tp,
+                         'dt_adaptive':self.dt_adaptive}, fp)
 
         logger.info('Written restart file [%s]' % restartfile)
 
@@ -2961,6 +3711,36 @@ class AeoLiSRunner(AeoLiS):
         logger.info(fmt % ('avg. time step',
                            aeolis.inout.print_value(float(self.p['tstop']) / n_time)))
 
+        n_fastforward = self.get_count('fastforward')
+        if n_fastforward:
+            logger.info(fmt % ('# skipped periods', aeolis.inout.print_value(n_fastforward)))
+            logger.info(fmt % ('# skipped time steps',
+                               aeolis.inout.print_value(self.get_count('fastforward.steps'))))
+
+        if self.p['accfac_adaptive']:
+            logger.info(fmt % ('avg. acceleration factor',
+                               aeolis.inout.print_value(float(self.get_count('accfac')) / n_time)))
+
+        n_rejected = self.get_count('rejected')
+        if n_rejected:
+            logger.info(fmt % ('# rejected time steps', aeolis.inout.print_value(n_rejected)))
+
+        n_spinup = self.get_count('spinup.steps')
+        if n_spinup:
+            logger.info(fmt % ('# spin-up time steps', aeolis.inout.print_value(n_spinup)))
+
+        n_avalanche = self.get_count('avalanching.avalanche')
+        if n_avalanche:
+            logger.info(fmt % ('avg. avalanching iterations',
+                               aeolis.inout.print_value(float(self.get_count('avalanching.iterations')) / n_avalanche)))
+            logger.info(fmt % ('avg. avalanching cells',
+                               aeolis.inout.print_value(float(self.get_count('avalanching.cells')) / n_avalanche)))
+
+        for k in sorted(self.c.keys()):
+            if k.endswith('.skipped'):
+                logger.info(fmt % ('# skipped %s' % k[:-8],
+                                   '%d of %d' % (self.c[k], self.c[k] + self.get_count(k[:-8]))))
+
         logger.info('**********************************************************')
         logger.info('')
 
@@ -2978,6 +3758,26 @@ class WindGenerator():
     The command-line function ``aeolis-wind`` is available that uses
     this class to generate AeoLiS wind input files.
 
+    Parameters
+    ----------
+    mean_speed : float, optional
+        Mean wind speed
+    max_speed : float, optional
+        Maximum wind speed
+    dt : float, optional
+        Time resolution
+    n_states : int, optional
+        Number of wind speed states of the Markov chain
+    shape : float, optional
+        Shape parameter of the Weibull distribution
+    scale : float, optional
+        Scale parameter of the Weibull distribution, relative to the
+        mean wind speed
+    seed : int or numpy.random.Generator, optional
+        Seed of the random number generator for reproducible wind
+        time series. If not given, the global random state of NumPy
+        is used, which can be seeded using ``numpy.random.seed``.
+
     Examples
     --------
     >>> wind = WindGenerator(mean_speed=10.).generate(duration=24*3600.)
@@ -3001,7 +3801,8 @@ class WindGenerator():
                  dt=60.,
                  n_states=30,
                  shape=2.,
-                 scale=2.):
+                 scale=2.,
+                 seed=None):
 
         self.mean_speed=mean_speed
         self.max_speed=max_speed
@@ -3010,8 +3811,12 @@ class WindGenerator():
         self.t=0.
         self.dt=dt
 
+        if seed is None:
+            self.random = np.random
+        else:
+            self.random = np.random.default_rng(seed)
+
         # setup matrix
-        n_rows = n_columns = n_states
         self.bin_size = float(max_speed)/n_states
 
         # weibull parameters
@@ -3025,33 +3830,28 @@ class WindGenerator():
 
         # distribution of probabilities, normalised
         fdpWind = self.weibullpdf(self.bins, weib_scale, weib_shape)
-        fdpWind = fdpWind / sum(fdpWind)
+        fdpWind = fdpWind / np.sum(fdpWind)
 
         # decreasing function
-        G = np.empty((n_rows, n_columns,))
-        for x in range(n_rows):
-            for y in range(n_columns):
-                G[x][y] = 2.0**float(-abs(x-y))
-
-        # initial value of the P matrix
-        P0 = np.diag(fdpWind)
+        i = np.arange(n_states)
+        G = 2.0**-np.abs(i[:,np.newaxis] - i[np.newaxis,:])
 
         # initital value of the p vector
         p0 = fdpWind
 
-        P, p = P0, p0
+        # fixed point of the state probabilities
+        p = p0
         rmse = np.inf
         while rmse > 1e-10:
             pp = p
-            r = self.matmult4(P,self.matmult4(G,p))
-            r = r/sum(r)
+            r = p * np.dot(G, p)
+            r = r/np.sum(r)
             p = p+0.5*(p0-r)
-            P = np.diag(p)
 
             rmse = np.sqrt(np.mean((p - pp)**2))
 
-        N=np.diag([1.0/i for i in self.matmult4(G,p)])
-        MTM=self.matmult4(N,self.matmult4(G,P))
+        # transition probabilities
+        MTM = G * p[np.newaxis,:] / np.dot(G, p)[:,np.newaxis]
         self.MTMcum = np.cumsum(MTM,1)
 
 
@@ -3068,23 +3868,115 @@ class WindGenerator():
         self.randoms1 = []
         self.randoms2 = []
 
-        self.update()
-        self.t = 0.
+        # determine number of time steps
+        n = self.get_number_of_steps(duration)
+        self.t = (n - 1) * self.dt
 
-        while self.t < duration:
-            self.update()
+        # draw all random numbers at once, in the same order as
+        # subsequent calls to update would
+        r = self.random.uniform(0, 1, (n, 2))
+        if aeolis.kernels.HAVE_NUMBA:
+            states = aeolis.kernels.markov_chain(self.MTMcum, r[:,0], self.state)
+        else:
+            states = self.markov_chain(self.MTMcum, r[:,0], self.state)
+        u = np.maximum(0., self.bins[states] - 0.5 + r[:,1] * self.bin_size)
+
+        self.randoms1 = r[:,0].tolist()
+        self.randoms2 = r[:,1].tolist()
+        self.states = states.tolist()
+        self.wind_speeds = u.tolist()
+        self.state = self.states[-1]
 
         return self
 
 
+    def generate_ensemble(self, n=1, duration=3600., direction=0.,
+                          direction_std=0., direction_timescale=3600.):
+        '''Generate ensemble of wind time series
+
+        All realizations are generated at once. The wind speed of
+        each realization follows from an independent Markov chain
+        like in :func:`generate`. The first realization is identical
+        to the wind time series generated by :func:`generate` with
+        the same seed. The wind direction is optionally generated by
+        a first-order autoregressive process around a mean wind
+        direction with a given standard deviation and correlation
+        time scale.
+
+        Parameters
+        ----------
+        n : int, optional
+            Number of realizations
+        duration : float, optional
+            Duration of wind time series
+        direction : float, optional
+            Mean wind direction in degrees
+        direction_std : float, optional
+            Standard deviation of wind direction in degrees, constant
+            wind direction if zero
+        direction_timescale : float, optional
+            Correlation time scale of wind direction
+
+        Returns
+        -------
+        numpy.ndarray
+            Ensemble of wind time series with time, wind speed and
+            wind direction (realizations x time x 3)
+
+        See Also
+        --------
+        console.wind
+
+        '''
+
+        m = self.get_number_of_steps(duration)
+
+        # wind speed
+        r = self.random.uniform(0, 1, (n, m, 2))
+        if aeolis.kernels.HAVE_NUMBA:
+            states = np.asarray([aeolis.kernels.markov_chain(self.MTMcum, ri, 0)
+                                 for ri in r[:,:,0]]).reshape((n, m))
+        else:
+            # limit size of table with transitions from each state
+            chunk = max(1, int(2**26 // (self.n_states * m)))
+            states = np.concatenate([self.markov_chain(self.MTMcum, r[i:i+chunk,:,0], 0)
+                                     for i in range(0, n, chunk)], axis=0)
+        u = np.maximum(0., self.bins[states] - 0.5 + r[:,:,1] * self.bin_size)
+
+        # wind direction
+        udir = np.zeros((n, m)) + direction
+        if direction_std > 0.:
+            a = np.exp(-self.dt / direction_timescale) if direction_timescale > 0. else 0.
+            x = self.random.standard_normal((n, m)) * direction_std
+            x[:,1:] *= np.sqrt(1. - a**2)
+            udir += scipy.signal.lfilter([1.], [1., -a], x, axis=1)
+        udir = np.mod(udir, 360.)
+
+        t = np.arange(m) * self.dt
+
+        return np.stack((np.broadcast_to(t, (n, m)), u, udir), axis=-1)
+
+
+    def get_number_of_steps(self, duration):
+        '''Returns number of time steps in wind time series of given duration'''
+
+        n = 1
+        t = 0.
+        while t < duration:
+            t += self.dt
+            n += 1
+
+        return n
+
+
     def update(self):
-        r1 = np.random.uniform(0,1)
-        r2 = np.random.uniform(0,1)
+        r1, r2 = self.random.uniform(0, 1, (2,))
 
         self.randoms1.append(r1)
         self.randoms2.append(r2)
 
-        self.state = next(j for j,v in enumerate(self.MTMcum[self.state]) if v > r1)
+        self.state = min(np.searchsorted(self.MTMcum[self.state], r1, side='right'),
+                         self.n_states - 1)
         self.states.append(self.state)
 
         u = np.maximum(0., self.bins[self.state] - 0.5 + r2 * self.bin_size)
@@ -3136,12 +4028,82 @@ class WindGenerator():
 
     @staticmethod
     def weibullpdf(data, scale, shape):
-        return [(shape/scale)
-                * ((x/scale)**(shape-1))
-                * np.exp(-1*(x/scale)**shape)
-                for x in data]
+        x = np.asarray(data)
+        return (shape/scale) * ((x/scale)**(shape-1)) * np.exp(-1*(x/scale)**shape)
 
 
     @staticmethod
-    def matmult4(m, v):
-        return [reduce(operator.add, map(operator.mul,r,v)) for r in m]
+    def markov_chain(cdf, r, state):
+        '''Walk Markov chain given cumulative transition probabilities
+
+        Vectorized equivalent of :func:`~kernels.markov_chain`. All
+        random numbers are assigned at once to the segments between
+        the cumulative transition probabilities using
+        ``numpy.searchsorted``, which determines the next state from
+        every state. The random numbers are divided in blocks, and
+        the chain is walked through all blocks simultaneously from
+        every possible initial state.
+        Finally, the blocks are connected by a walk over the final
+        states of each block. Multiple independent chains are walked
+        at once if the random numbers are given for each chain.
+
+        Parameters
+        ----------
+        cdf : numpy.ndarray
+            Cumulative transition probabilities from each state (row)
+            to each state (column)
+        r : numpy.ndarray
+            Uniformly distributed random numbers, one for each
+            transition (along the last axis) in each chain
+        state : int or numpy.ndarray
+            Initial state of each chain
+
+        Returns
+        -------
+        numpy.ndarray
+            States after each transition in each chain
+
+        '''
+
+        n = cdf.shape[0]
+        r = np.asarray(r)
+        shape = r.shape
+        r = r.reshape((-1, shape[-1]))
+        nchains, m = r.shape
+        if m == 0:
+            return np.zeros(shape, dtype=np.int64)
+
+        # the cumulative probabilities divide the random numbers in
+        # segments in which the next state from each state is the
+        # same, i.e. the first state with a cumulative probability
+        # exceeding the random number, or the last state in case of
+        # round-off
+        edges = np.unique(cdf)
+        lower = np.concatenate(([-np.inf], edges))
+        table = np.asarray([np.searchsorted(cdf[i], lower, side='right') for i in range(n)])
+        table = np.minimum(table, n - 1).ravel()
+
+        size = int(np.ceil(np.sqrt(m)))
+        nblocks = int(np.ceil(float(m) / size))
+        segments = np.zeros((nchains, nblocks * size), dtype=np.int64)
+        segments[:,:m] = np.searchsorted(edges, r, side='right')
+        segments = segments.reshape((nchains, nblocks, size))
+
+        # walk all blocks from all initial states
+        chains = np.arange(nchains)
+        blocks = np.arange(nblocks)
+        walks = np.zeros((size, nchains, nblocks, n), dtype=np.min_scalar_type(n))
+        states = np.tile(np.arange(n), (nchains, nblocks, 1))
+        for k in range(size):
+            states = table.take(states * len(lower) + segments[:,:,k,np.newaxis])
+            walks[k] = states
+
+        # connect blocks
+        state = np.zeros((nchains,), dtype=np.int64) + state
+        initial = np.zeros((nchains, nblocks), dtype=np.int64)
+        for i in range(nblocks):
+            initial[:,i] = state
+            state = walks[-1,chains,i,state]
+
+        states = walks[:,chains[:,np.newaxis],blocks[np.newaxis,:],initial]
+        return states.transpose((1, 2, 0)).reshape((nchains, -1))[:,:m].reshape(shape).astype(np.int64)
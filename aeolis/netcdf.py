@@ -309,6 +309,8 @@ def initialize(outputfile, outputvars, s, p, dimensions):
                 nc.setncattr(k, -1)
             elif isinstance(v, bool):
                 nc.setncattr(k, int(v))
+            elif np.ndim(v) > 1:
+                nc.setncattr(k, np.real(v).ravel())
             else:
                 nc.setncattr(k, np.real(v))
 
@@ -38,7 +38,10 @@ from aeolis.utils import *
 logger = logging.getLogger(__name__)
 
 
-def compute(s, p):
+@process(inputs=['moist', 'salt', 'mass', 'zb', 'zs', 'zne', 'zdry', 'dzb', 'udir',
+                 'meteo', 'ustar', 'threshold_mask', 'uth', 'uthf', 'uth0'],
+         outputs=['uth', 'uthf', 'uth0', 'active', 'zdry', 'dzdry'])
+def compute(s, p, dt):
     '''Compute wind velocity threshold based on bed surface properties
 
     Computes wind velocity threshold based on grain size fractions,
@@ -47,7 +50,11 @@ def compute(s, p):
     properties increase the current wind velocity threshold, except
     for the grain size fractions. Therefore, the computation is 
     initialized by the grain size fractions and subsequently altered 
-    by the other bed surface properties.
+    by the other bed surface properties. The threshold based on the
+    grain size fractions and soil moisture content is cached and only
+    recomputed if the soil moisture content changed. The salt content
+    and roughness contributions are cached likewise, see
+    :func:`compute_salt` and :func:`compute_roughness`.
 
     Parameters
     ----------
@@ -55,6 +62,8 @@ def compute(s, p):
         Spatial grids
     p : dict
         Model configuration parameters
+    dt : float
+        Time step including the numerical acceleration factor
 
     Returns
     -------
@@ -69,23 +78,40 @@ def compute(s, p):
     compute_humidity
     compute_roughness
     non_erodible
+    compute_active
+    inputs_changed
 
     '''
 
     if p['process_threshold'] and p['threshold_file'] is None:
 
-        if p['th_grainsize']:
-            s = compute_grainsize(s, p)
-        if p['th_bedslope']:
-            s = compute_bedslope(s, p)
+        # the threshold based on grain size and moisture content is
+        # cached and only recomputed if the moisture content (or the
+        # wet cells if moisture is not considered) changed
         if p['th_moisture']:
-            s = compute_moisture(s, p)
+            changed = inputs_changed(p, 'moisture', s['moist'][:,:,:1])
         else:
             # no aeolian transport when the bed level is lower than the water level
-            ix = s['zb'] - s['zs'] < - p['eps']
-            s['uth'][ix] = np.inf
+            wet = s['zb'] - s['zs'] < - p['eps']
+            changed = inputs_changed(p, 'moisture', wet)
+        
+        cache = p['_threshold']
+        if p['th_grainsize'] and not changed and 'uth' in cache:
+            s['uth'][:,:,:] = cache['uth']
+        else:
+            if p['th_grainsize']:
+                s = compute_grainsize(s, p)
+            if p['th_bedslope']:
+                s = compute_bedslope(s, p)
+            if p['th_moisture']:
+                s = compute_moisture(s, p)
+            else:
+                s['uth'][wet] = np.inf
+            if p['th_grainsize']:
+                cache['uth'] = s['uth'].copy()
+            
         if p['th_drylayer']:
-            s = dry_layer(s, p)
+            s = dry_layer(s, p, dt)
         if p['th_humidity']:
             s = compute_humidity(s, p)
         if p['th_salt']:
@@ -94,13 +120,112 @@ def compute(s, p):
             s = compute_roughness(s, p)
                     
         # apply complex mask
-        s['uth'] = apply_mask(s['uth'], s['threshold_mask'])
+        if not is_trivial_mask(s['threshold_mask']):
+            s['uth'] = apply_mask(s['uth'], s['threshold_mask'])
         s['uthf'] = s['uth'].copy()
         
     #non-erodible layer (NEW)
     if p['th_nelayer']:
         s = non_erodible(s,p)
 
+    s = compute_active(s, p)
+
+    return s
+
+
+def initialize(s, p):
+    '''Initialize threshold cache
+
+    Contributions to the wind velocity threshold that only depend on
+    bed surface properties that change infrequently are cached in the
+    model configuration and reused as long as these properties do not
+    change. The cache is emptied upon initialization.
+
+    Parameters
+    ----------
+    s : dict
+        Spatial grids
+    p : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    dict
+        Spatial grids
+
+    See Also
+    --------
+    inputs_changed
+
+    '''
+
+    p['_threshold'] = {}
+
+    return s
+
+
+def inputs_changed(p, name, *inputs):
+    '''Check if the inputs of a cached threshold contribution changed
+
+    Compares the inputs with the copies stored during the previous
+    call for the same threshold contribution. The stored copies are
+    replaced by the current inputs if they differ.
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+    name : str
+        Name of the threshold contribution
+    inputs : np.ndarray
+        Current inputs of the threshold contribution
+
+    Returns
+    -------
+    bool
+        True if the inputs changed or were not stored before
+
+    '''
+
+    cache = p.setdefault('_threshold', {})
+    key = '%s_inputs' % name
+
+    if key in cache and all([np.array_equal(x, y) for x, y in zip(cache[key], inputs)]):
+        return False
+
+    cache[key] = [np.copy(x) for x in inputs]
+    return True
+
+
+def compute_active(s, p):
+    '''Determine cells that can be eroded
+
+    A cell can only be eroded if the shear velocity exceeds the
+    shear velocity threshold of at least one sediment fraction. All
+    other cells have a zero equilibrium sediment concentration, for
+    example because they are submerged, too moist, masked or covered
+    by a non-erodible layer. The per-cell transport processes are only
+    evaluated in the active cells. The active cells are refreshed
+    every time the threshold is computed and thereby follow any
+    changes in masks, water levels and thresholds.
+
+    Parameters
+    ----------
+    s : dict
+        Spatial grids
+    p : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    dict
+        Spatial grids
+
+    '''
+
+    uth = np.minimum(s['uth'], s['uthf'])
+    s['active'] = np.any(s['ustar'][:,:,np.newaxis] > uth, axis=-1).astype(float)
+
     return s
 
 
@@ -188,12 +313,12 @@ def compute_moisture(s, p):
     
     return s
 
-def dry_layer(s, p):
+def dry_layer(s, p, dt):
 
     Tdry_top = 12. * 3600.
     zdry_max = 0.05
 
-    s['dzdry'] = (zdry_max - s['zdry']) * (p['dt'] * p['accfac'])  / Tdry_top + s['dzb'] 
+    s['dzdry'] = (zdry_max - s['zdry']) * dt  / Tdry_top + s['dzb'] 
     s['zdry'] += s['dzdry']
     s['zdry'] = np.minimum(np.maximum(s['zdry'], 0), zdry_max)
 
@@ -257,12 +382,15 @@ def compute_salt(s, p):
     ny = p['ny']+1
     nf = p['nfractions']
 
-    # compute effect of salt content on shear velocity threshold
-    cs = p['csalt'] * (1. - s['salt'][:,:,:1])
-    CS = 1.03 * np.exp(.1027 * 1e3 * cs).repeat(nf, axis=-1)
+    # compute effect of salt content on shear velocity threshold, the
+    # effect is cached and only recomputed if the salt content changed
+    cache = p.setdefault('_threshold', {})
+    if inputs_changed(p, 'salt', s['salt'][:,:,:1]) or 'CS' not in cache:
+        cs = p['csalt'] * (1. - s['salt'][:,:,:1])
+        cache['CS'] = 1.03 * np.exp(.1027 * 1e3 * cs)
     
     # modify shear velocity threshold
-    s['uth'] *= CS
+    s['uth'] *= cache['CS']
 
     return s
 
@@ -325,6 +453,10 @@ def compute_roughness(s, p):
         u_{*,th,r} = u_{*,th,s} * \\sqrt{\\left( 1 - m \\sum_{k=n_0}^{n_k} \hat{w}^{\mathrm{bed}}_k \\right)
                                          \\left( 1 + m \\frac{\\beta}{\\sigma} \\sum_{k=n_0}^{n_k} \hat{w}^{\mathrm{bed}}_k \\right)}
 
+    The amplification factor is cached and only recomputed if the
+    bed composition of the top layer or the non-erodible fractions
+    changed, see :func:`inputs_changed`.
+
     Parameters
     ----------
     s : dict
@@ -339,23 +471,22 @@ def compute_roughness(s, p):
 
     '''
 
-    nx = p['nx']+1
-    ny = p['ny']+1
-    nf = p['nfractions']
-
-    # mass fraction of non-erodible fractions used as roughness measure
-    mass = s['mass'][:,:,0,:].reshape((-1,nf))
-    gd = np.zeros((nx*ny,))
-    for i in range(nf):
-        ix = (s['ustar'] <= s['uth'][:,:,i]).flatten()
-        gd[ix] += mass[ix,i]
-    gd /= mass.sum(axis=-1)
+    # mass fraction of non-erodible fractions used as roughness
+    # measure, the effect is cached and only recomputed if the bed
+    # composition of the top layer or the non-erodible fractions
+    # changed
+    mass = s['mass'][:,:,0,:]
+    ix = s['ustar'][:,:,np.newaxis] <= s['uth']
+    cache = p.setdefault('_threshold', {})
+    if inputs_changed(p, 'roughness', mass, ix) or 'Rti' not in cache:
+        gd = np.sum(mass * ix, axis=-1) / mass.sum(axis=-1)
 
-    # compute inverse of shear stress ratio
-    Rti = np.sqrt((1. - p['m'] * gd) * (1. + p['m'] * p['beta'] / p['sigma'] * gd))
+        # compute inverse of shear stress ratio
+        Rti = np.sqrt((1. - p['m'] * gd) * (1. + p['m'] * p['beta'] / p['sigma'] * gd))
+        cache['Rti'] = Rti[:,:,np.newaxis]
 
     # modify shear velocity threshold
-    s['uth'] *= Rti.reshape((ny,nx,1)).repeat(nf, axis=-1)
+    s['uth'] *= cache['Rti']
     
     return s
 
@@ -363,6 +494,9 @@ def non_erodible(s,p):
     '''Modify wind velocity threshold based on the presence of a 
     non-erodible layer.
 
+    The level of the non-erodible layer is read from ``ne_file`` upon
+    initialization of the bed, see :func:`aeolis.bed.initialize`.
+
     Parameters
     ----------
     s : dict
@@ -377,10 +511,6 @@ def non_erodible(s,p):
 
     '''
     
-    nf = p['nfractions']
-    
-    s['zne'][:,:] = p['ne_file']
-    
     #Hard method
     
 #    ix = s['zb'] <= s['zne']
@@ -394,11 +524,10 @@ def non_erodible(s,p):
     
     ix = s['zb'] <= s['zne'] + thuthlyr
 
-    ustar = s['ustar']
-    uth = s['uth']
-    
-    for i in range(nf):
-        s['uth'][ix,i] += np.maximum((1-(s['zb'][ix]-s['zne'][ix])/thuthlyr)*(ustar[ix]*2.0-uth[ix,i]), uth[ix,i])
+    f = (1. - (s['zb'][ix] - s['zne'][ix]) / thuthlyr)[:,np.newaxis]
+    ustar = s['ustar'][ix][:,np.newaxis]
+    uth = s['uth'][ix,:]
+
+    s['uth'][ix,:] = uth + np.maximum(f * (ustar * 2.0 - uth), uth)
     
     return s    
-
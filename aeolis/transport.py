@@ -38,8 +38,12 @@ from aeolis.utils import *
 # initialize logger
 logger = logging.getLogger(__name__)
 
-def grainspeed(s, p):
-    '''Compute grain speed according to Duran 2007 (p. 42)
+def initialize(s, p):
+    '''Initialize grain properties
+
+    The grain properties only depend on the model configuration and
+    are therefore computed once and cached in the model
+    configuration. See :func:`grain_constants`.
 
     Parameters
     ----------
@@ -52,36 +56,46 @@ def grainspeed(s, p):
     -------
     dict
         Spatial grids
-        '''
-    
-    # Create each grain fraction
-    
-    nf = p['nfractions']
-    d = p['grain_size']
-    
-    z = s['zb']
-    x = s['x']
-    y = s['y']
-    
-    uth = s['uth']  
-    uth0 = s['uth0']    
-    ustar = s['ustar']
-    ustars = s['ustars']
-    ustarn = s['ustarn']
 
+    '''
+
+    p['_grain'] = grain_constants(p)
+
+    return s
+
+
+def grain_constants(p):
+    '''Compute grain properties according to Duran 2007 (p. 42)
+
+    Computes the properties of each sediment fraction that are used
+    in the grain speed computation and only depend on the grain size,
+    densities, viscosity and gravity.
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    dict
+        Grain properties per fraction
+
+    See Also
+    --------
+    grainspeed
+
+    '''
+
+    d = np.asarray(p['grain_size'], dtype=float)
     
-    rhog = p['rhog']
-    rhoa = p['rhoa']
-    s = rhog/rhoa
+    g = p['g']
+    v = p['v']
+    s = p['rhog'] / p['rhoa']
     
     A = 0.95
-    B = 5.12        
-    
-    g = np.repeat(p['g'], nf, axis = 0)
-    v = np.repeat(p['v'], nf, axis = 0)
-    
-    kappa = p['kappa']
-        
+    B = 5.12
+
     # Drag coefficient (Duran, 2007 -> Jimenez and Madsen, 2003)
     
     r       = 1. # Duran 2007, p. 33
@@ -91,35 +105,70 @@ def grainspeed(s, p):
     
     lv      = (v**2/(p['Aa']**2*g*(s-1)))**(1/3)
 
-    zm      = c * uth * tv  # characteristic height of the saltation layer +- 20 mm
     z0      = d/20.  # grain based roughness layer +- 10 mu m - Duran 2007 p.32
     z1      = 35. * lv # reference height +- 35 mm
   
     alpha   = 0.17 * d / lv
-#    s['alpha'] = alpha
 
     Sstar   = d/(4*v)*np.sqrt(g*d*(s-1.))
     Cd      = (4/3)*(A+np.sqrt(2*alpha)*B/Sstar)**2
     
     uf = np.sqrt(4/(3*Cd)*(s-1.)*g*d)                                            # Grain settling velocity - Jimnez and Madsen, 2003
-   
-    # Initiate arrays
+
+    return dict(c=c, tv=tv, lv=lv, z0=z0, z1=z1,
+                alpha=alpha, Sstar=Sstar, Cd=Cd, uf=uf,
+                logz=np.log(z1 / z0), sqa=np.sqrt(2. * alpha))
+
+
+def grainspeed(s, p):
+    '''Compute grain speed according to Duran 2007 (p. 42)
+
+    The grain properties are taken from the model configuration, see
+    :func:`initialize`. The grain speed is computed for all fractions
+    at once and written into the preallocated spatial grids ``u0``,
+    ``us``, ``un`` and ``u``.
+
+    Parameters
+    ----------
+    s : dict
+        Spatial grids
+    p : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    tuple
+        Grain speed ``u0``, ``us``, ``un`` and ``u``
+        '''
     
-    ets = np.zeros(uth.shape)
-    etn = np.zeros(uth.shape)
+    if '_grain' in p:
+        gc = p['_grain']
+    else:
+        gc = grain_constants(p)
     
+    z = s['zb']
+    x = s['x']
+    y = s['y']
     
-
-    ueff = np.zeros(uth.shape)
-    ueff0 = np.zeros(uth.shape)
+    uth = s['uth']  
+    uth0 = s['uth0']    
+    ustar = s['ustar']
+    
+    kappa = p['kappa']
     
-    ustar = np.repeat(ustar[:,:,np.newaxis], nf, axis=2)
-    ustars = np.repeat(ustars[:,:,np.newaxis], nf, axis=2)
-    ustarn = np.repeat(ustarn[:,:,np.newaxis], nf, axis=2)
+    zm = gc['c'] * uth * gc['tv']  # characteristic height of the saltation layer +- 20 mm
     
     # Efficient wind velocity (Duran, 2006 - Partelli, 2013)
-    ueff = (uth0 / kappa) * (np.log(z1 / z0))
-    ueff0 = (uth0 / kappa) * (np.log(z1 / z0)) 
+    ueff0 = (uth0 / kappa) * gc['logz']
+    
+    # determine ueff for different grainsizes
+    ustar3 = ustar[:,:,np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ueff = evaluate('where((ustar3 >= uth) & (ustar3 > 0.), '
+                        '(uth / kappa) * (logz + 2*(sqrt(1+z1/zm*(ustar3**2/uth**2-1))-1)), ueff0)',
+                        dict(ustar3=ustar3, uth=uth, zm=zm, ueff0=ueff0, kappa=kappa,
+                             logz=gc['logz'], z1=gc['z1']),
+                        use_numexpr=p['numexpr'])
     
     # Surface gradient
     dzs = np.zeros(z.shape)
@@ -135,55 +184,48 @@ def grainspeed(s, p):
     dzs[:,-1] = dzs[:,-2]
     dzn[-1,:] = dzn[-2,:]
     
-    dhs = np.repeat(dzs[:,:,np.newaxis], nf, axis = 2)
-    dhn = np.repeat(dzn[:,:,np.newaxis], nf, axis = 2)
+    dhs = dzs[:,:,np.newaxis]
+    dhn = dzn[:,:,np.newaxis]
     
     # Wind direction
-        
-    ix = (ustar > 0.) #* (ustar >= uth) 
     
-    ets[ix] = ustars[ix] / ustar[ix]
-    etn[ix] = ustarn[ix] / ustar[ix]
+    ix = (ustar > 0.)
+    
+    ets = np.zeros(ustar.shape)
+    etn = np.zeros(ustar.shape)
     
-    Axs = ets + 2*alpha*dhs
-    Axn = etn + 2*alpha*dhn
+    ets[ix] = s['ustars'][ix] / ustar[ix]
+    etn[ix] = s['ustarn'][ix] / ustar[ix]
+    
+    ets = ets[:,:,np.newaxis]
+    etn = etn[:,:,np.newaxis]
+    
+    Axs = ets + 2*gc['alpha']*dhs
+    Axn = etn + 2*gc['alpha']*dhn
     Ax = np.hypot(Axs, Axn)
     
     # Compute grain speed
     
-    u0 = np.zeros(uth.shape)
-    us = np.zeros(uth.shape)
-    un = np.zeros(uth.shape)
-    u  = np.zeros(uth.shape)
-
-    for i in range(nf):  
-        # determine ueff for different grainsizes
-        
-        ix = (ustar[:,:,i] >= uth[:,:,i])*(ustar[:,:,i] > 0.)
-        
-        ueff[ix,i] = (uth[ix,i] / kappa) * (np.log(z1[i] / z0[i]) + 2*(np.sqrt(1+z1[i]/zm[ix,i]*(ustar[ix,i]**2/uth[ix,i]**2-1))-1))
-         
-        # loop over fractions
-        u0[:,:,i] = (ueff0[:,:,i] - uf[i] / (np.sqrt(2 * alpha[i])))
- 
-        us[:,:,i] = (ueff[:,:,i] - uf[i] / (np.sqrt(2. * alpha[i]) * Ax[:,:,i])) * ets[:,:,i] \
-                        - (np.sqrt(2*alpha[i]) * uf[i] / Ax[:,:,i]) * dhs[:,:,i]  
-        
-        un[:,:,i] = (ueff[:,:,i] - uf[i] / (np.sqrt(2. * alpha[i]) * Ax[:,:,i])) * etn[:,:,i] \
-                        - (np.sqrt(2*alpha[i]) * uf[i] / Ax[:,:,i]) * dhn[:,:,i] 
-        
-        u[:,:,i] = np.hypot(us[:,:,i], un[:,:,i])                
-        
-        # set the grain velocity to zero inside the separation bubble
-        ix = (ustar[:,:,i] == 0.)
-        
-        u0[ix,i] = 0.
-        us[ix,i] = 0.
-        un[ix,i] = 0.
-        u[ix,i] = 0.
-                        
+    uf = gc['uf']
+    sqa = gc['sqa']
+    
+    s['u0'][:,:,:] = ueff0 - uf / sqa
+    v = dict(ueff=ueff, uf=uf, sqa=sqa, Ax=Ax, ets=ets, etn=etn, dhs=dhs, dhn=dhn)
+    evaluate('(ueff - uf / (sqa * Ax)) * ets - (sqa * uf / Ax) * dhs', v,
+             use_numexpr=p['numexpr'], out=s['us'])
+    evaluate('(ueff - uf / (sqa * Ax)) * etn - (sqa * uf / Ax) * dhn', v,
+             use_numexpr=p['numexpr'], out=s['un'])
+    np.hypot(s['us'], s['un'], out=s['u'])
+    
+    # set the grain velocity to zero inside the separation bubble
+    ix = (ustar == 0.)
+    
+    s['u0'][ix,:] = 0.
+    s['us'][ix,:] = 0.
+    s['un'][ix,:] = 0.
+    s['u'][ix,:] = 0.
         
-    return u0, us, un, u
+    return s['u0'], s['us'], s['un'], s['u']
 
 
 def saltationvelocity(s, p):
@@ -237,6 +279,10 @@ def saltationvelocity(s, p):
     return s
 
 
+@process(inputs=['zb', 'x', 'y', 'ustar', 'ustars', 'ustarn', 'ustar0', 'uth', 'uthf', 'uth0',
+                 'active', 'Cu', 'Cuf', 'Cu0'],
+         outputs=['u0', 'us', 'un', 'u', 'Cu', 'Cuf', 'Cu0'],
+         params=['accfac'])
 def equilibrium(s, p):
     '''Compute equilibrium sediment concentration following Bagnold (1937)
 
@@ -273,44 +319,46 @@ def equilibrium(s, p):
         #un = s['un']   
         #u  = s['u']
         
-        ustar  = s['ustar'][:,:,np.newaxis].repeat(nf, axis=2)
-        ustar0 = s['ustar0'][:,:,np.newaxis].repeat(nf, axis=2)
+        ustar  = s['ustar'][:,:,np.newaxis]
+        ustar0 = s['ustar0'][:,:,np.newaxis]
         
         uth    = s['uth']
         uthf   = s['uthf']
         uth0 = s['uth0']
-
-        rhoa   = p['rhoa'] 
-        g      = p['g']
+        
+        method = p['method_transport'].lower()
+        if method not in ['bagnold', 'kawamura', 'lettau', 'dk']:
+            logger.log_and_raise('Unknown transport formulation [%s]' % method, exc=ValueError)   
         
         s['Cu']  = np.zeros(uth.shape)
         s['Cuf'] = np.zeros(uth.shape)
     
                 
-        ix = (ustar != 0.)*(u != 0.)
+        ix0 = (ustar != 0.)*(u != 0.)
+
+        # the equilibrium sediment concentration is zero if the shear
+        # velocity does not exceed the threshold, so only evaluate the
+        # active cells (see :func:`threshold.compute_active`)
+        ix = ix0 * (s['active'][:,:,np.newaxis] > 0.)
         
-        if p['method_transport'].lower() == 'bagnold':
-            s['Cu'][ix]  = np.maximum(0., p['Cb'] * rhoa / g * (ustar[ix] - uth[ix])**3 / u[ix])
-            s['Cuf'][ix] = np.maximum(0., p['Cb'] * rhoa / g * (ustar[ix] - uthf[ix])**3 / u[ix])
-            
-            s['Cu0'][ix] = np.maximum(0., p['Cb'] * rhoa / g * (ustar0[ix] - uth0[ix])**3 / u[ix])
+        ustar_ix = np.broadcast_to(ustar, uth.shape)[ix]
+        uth_ix = uth[ix]
+        uthf_ix = uthf[ix]
+        u_ix = u[ix]
         
-        elif p['method_transport'].lower() == 'kawamura':
-            s['Cu'][ix]  = np.maximum(0., p['Ck'] * rhoa / g * (ustar[ix] + uth[ix])**2 * (ustar[ix] - uth[ix]) / u[ix])
-            s['Cuf'][ix] = np.maximum(0, p['Ck'] * rhoa / g * (ustar[ix] + uthf[ix])**2 * (ustar[ix] - uthf[ix]) / u[ix])
-        
-        elif p['method_transport'].lower() == 'lettau':
-            s['Cu'][ix]  = np.maximum(0., p['Cl'] * rhoa / g * ustar[ix]**2 * (ustar[ix] - uth[ix]) / u[ix])
-            s['Cuf'][ix] = np.maximum(0., p['Cl'] * rhoa / g * ustar[ix]**2 * (ustar[ix] - uthf[ix]) / u[ix])
-
-        elif p['method_transport'].lower() == 'dk':
-            s['Cu'][ix]  = np.maximum(0., p['Cdk'] * rhoa / g * uth[ix] * (ustar[ix]**2 - uth[ix]**2) / u[ix])
-            s['Cuf'][ix] = np.maximum(0., p['Cdk'] * rhoa / g * uthf[ix] * (ustar[ix]**2 - uthf[ix]**2) / u[ix])
-            
-            s['Cu0'][ix]  = np.maximum(0., p['Cdk'] * rhoa / g * uth0[ix] * (ustar0[ix]**2 - uth0[ix]**2) / u[ix])
+        Cu = concentration(ustar_ix, uth_ix, u_ix, p)
+        s['Cu'][ix] = Cu
         
+        # the fluid threshold only differs from the threshold if a
+        # non-erodible layer is present
+        if np.array_equal(uth_ix, uthf_ix):
+            s['Cuf'][ix] = Cu
         else:
-            logger.log_and_raise('Unknown transport formulation [%s]' % method, exc=ValueError)   
+            s['Cuf'][ix] = concentration(ustar_ix, uthf_ix, u_ix, p)
+        
+        if method in ['bagnold', 'dk']:
+            s['Cu0'][ix0] = concentration(np.broadcast_to(ustar0, uth0.shape)[ix0],
+                                          uth0[ix0], u[ix0], p)
                                        
     s['Cu']  *= p['accfac']
     s['Cuf'] *= p['accfac']
@@ -319,6 +367,55 @@ def equilibrium(s, p):
     return s
 
 
+def concentration(ustar, uth, u, p):
+    '''Compute equilibrium sediment concentration for a transport formulation
+
+    Evaluates the transport formulation selected by
+    ``method_transport``: Bagnold (1937), Kawamura (1951), Lettau and
+    Lettau (1978) or DK.
+
+    Parameters
+    ----------
+    ustar : numpy.ndarray
+        Shear velocity
+    uth : numpy.ndarray
+        Shear velocity threshold
+    u : numpy.ndarray
+        Grain speed
+    p : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    numpy.ndarray
+        Equilibrium sediment concentration
+
+    See Also
+    --------
+    equilibrium
+
+    '''
+
+    method = p['method_transport'].lower()
+    
+    if method == 'bagnold':
+        expr = 'Cb * rhoa / g * (ustar - uth)**3 / u'
+    elif method == 'kawamura':
+        expr = 'Ck * rhoa / g * (ustar + uth)**2 * (ustar - uth) / u'
+    elif method == 'lettau':
+        expr = 'Cl * rhoa / g * ustar**2 * (ustar - uth) / u'
+    elif method == 'dk':
+        expr = 'Cdk * rhoa / g * uth * (ustar**2 - uth**2) / u'
+    else:
+        logger.log_and_raise('Unknown transport formulation [%s]' % method, exc=ValueError)   
+
+    C = evaluate(expr, dict(ustar=ustar, uth=uth, u=u, rhoa=p['rhoa'], g=p['g'],
+                            Cb=p['Cb'], Ck=p['Ck'], Cl=p['Cl'], Cdk=p['Cdk']),
+                 use_numexpr=p['numexpr'])
+
+    return np.maximum(0., C, out=C)
+
+
 def compute_weights(s, p):
     '''Compute weights for sediment fractions
 
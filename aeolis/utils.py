@@ -29,6 +29,29 @@ import re
 import numpy as np
 
 
+# check if numexpr is available
+try:
+    import numexpr
+    HAVE_NUMEXPR = True
+except ImportError:
+    HAVE_NUMEXPR = False
+
+
+# functions available in expressions evaluated without numexpr
+EXPRESSION_FUNCTIONS = {
+    'where':np.where,
+    'sqrt':np.sqrt,
+    'exp':np.exp,
+    'log':np.log,
+    'log10':np.log10,
+    'abs':np.abs,
+    'sin':np.sin,
+    'cos':np.cos,
+    'tanh':np.tanh,
+    'arctan2':np.arctan2,
+}
+
+
 def isiterable(x):
     '''Check if variable is iterable'''
 
@@ -309,3 +332,107 @@ def apply_mask(arr, mask):
     arr += np.imag(mask)
 
     return arr
+
+
+def is_trivial_mask(mask):
+    '''Check if complex mask leaves any array unaltered
+
+    Masks that are not specified in the model configuration are
+    initialized as the scalar unity. Applying such a mask does not
+    change the array it is applied to, but still costs full-grid
+    operations.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray or float
+        Array, matrix or scalar with complex mask values
+
+    Returns
+    -------
+    bool
+        True if the mask is a scalar equal to unity
+
+    '''
+
+    return np.ndim(mask) == 0 and mask == 1.
+
+
+def process(inputs=(), outputs=(), params=(), volatile=False):
+    '''Declare spatial grids read and written by a model process
+
+    Decorator that attaches the names of the spatial grids that are
+    read (``inputs``) and written (``outputs``) by a model process to
+    the process function, as well as the names of the model
+    configuration parameters that change during the simulation and
+    are read by the process (``params``). The declarations are used
+    by the model to skip a process if none of its inputs and
+    parameters changed since its previous execution, see
+    :meth:`aeolis.model.AeoLiS.run_process`. Processes that depend on
+    time or random numbers are declared ``volatile`` and are never
+    skipped.
+
+    Parameters
+    ----------
+    inputs : list of str
+        Names of spatial grids read by the process
+    outputs : list of str
+        Names of spatial grids written by the process
+    params : list of str
+        Names of model configuration parameters read by the process
+        that change during the simulation
+    volatile : bool
+        Never skip the process (default: False)
+
+    Returns
+    -------
+    function
+        Decorator
+
+    '''
+
+    def decorator(func):
+        func.inputs = tuple(inputs)
+        func.outputs = tuple(outputs)
+        func.params = tuple(params)
+        func.volatile = volatile
+        return func
+
+    return decorator
+
+
+def evaluate(expr, local_dict, use_numexpr=True, out=None):
+    '''Evaluate elementwise array expression
+
+    Long elementwise expressions are evaluated in a single
+    multithreaded pass without intermediate arrays using numexpr, if
+    available. Otherwise the expression is evaluated using NumPy. The
+    expression should therefore only use arithmetic, comparison and
+    logical operators and the functions supported by both, see
+    ``EXPRESSION_FUNCTIONS``.
+
+    Parameters
+    ----------
+    expr : str
+        Elementwise expression
+    local_dict : dict
+        Arrays and scalars used in the expression
+    use_numexpr : bool, optional
+        Use numexpr, if available (default: True)
+    out : numpy.ndarray, optional
+        Array to write result into
+
+    Returns
+    -------
+    numpy.ndarray
+        Result of expression
+
+    '''
+
+    if HAVE_NUMEXPR and use_numexpr:
+        return numexpr.evaluate(expr, local_dict=local_dict, out=out, casting='unsafe')
+
+    result = eval(expr, dict(EXPRESSION_FUNCTIONS), local_dict)
+    if out is None:
+        return result
+    out[...] = result
+    return out
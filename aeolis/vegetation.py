@@ -32,13 +32,16 @@ import matplotlib.pyplot as plt
 
 # package modules
 import aeolis.wind
-#from aeolis.utils import *
+from aeolis.utils import process
 
 # initialize logger
 logger = logging.getLogger(__name__)
 
 def initialize (s,p):
     
+    # empty vegetation factor cache
+    p.pop('_vegfac', None)
+
     if p['veg_file'] is not None:
         s['rhoveg'][:, :] = p['veg_file']
 
@@ -55,6 +58,8 @@ def initialize (s,p):
     return s
 
 
+@process(inputs=['ustar', 'ustars', 'ustarn', 'rhoveg'],
+         outputs=['vegfac', 'ustar', 'ustars', 'ustarn'])
 def vegshear(s, p):
     
     ustar  = s['ustar'].copy()
@@ -70,14 +75,25 @@ def vegshear(s, p):
     etn[ix] = ustarn[ix] / ustar[ix]
     
 
-    # Raupach, 1993
-    roughness = p['gamma_vegshear']
-    
-    vegfac = 1. / np.sqrt(1. + roughness * s['rhoveg'])
-    
-    # Smoothen the change in vegfac between surrounding cells following a gaussian distribution filter 
+    # the vegetation factor only changes with the vegetation density,
+    # which evolves slowly, and is therefore only recomputed if the
+    # vegetation density changed more than ``veg_tolerance``
+    cache = p.get('_vegfac')
+    if cache is None or np.max(np.abs(s['rhoveg'] - cache['rhoveg'])) > p['veg_tolerance']:
+
+        # Raupach, 1993
+        roughness = p['gamma_vegshear']
+        
+        vegfac = 1. / np.sqrt(1. + roughness * s['rhoveg'])
+        
+        # Smoothen the change in vegfac between surrounding cells following a gaussian distribution filter 
 
-    s['vegfac'] = ndimage.gaussian_filter(vegfac, sigma=p['veg_sigma'])
+        vegfac = ndimage.gaussian_filter(vegfac, sigma=p['veg_sigma'])
+
+        cache = p['_vegfac'] = dict(rhoveg=s['rhoveg'].copy(),
+                                    vegfac=vegfac)
+
+    s['vegfac'] = cache['vegfac'].copy()
     
     
     # Apply reduction factor of vegetation to the total shear stress 
@@ -89,12 +105,33 @@ def vegshear(s, p):
     return s
 
 
-def germinate (s,p):
+@process(inputs=['rhoveg', 'dzbveg', 'germinate', 'lateral', 'ds', 'dn'],
+         outputs=['germinate', 'lateral', 'drhoveg'],
+         volatile=True)
+def germinate (s,p,dt):
+    '''Germination and lateral expansion of vegetation
+
+    Parameters
+    ----------
+    s : dict
+        Spatial grids
+    p : dict
+        Model configuration parameters
+    dt : float
+        Time step over which vegetation germinates, including the
+        numerical acceleration factor
+
+    Returns
+    -------
+    dict
+        Spatial grids
+
+    '''
 
     s['germinate'][:, :] = (s['rhoveg'] > 0.)
     
     # time [year]
-    n = (365.25*24.*3600. / (p['dt'] * p['accfac']))
+    n = (365.25*24.*3600. / dt)
     
     # Germination
     
@@ -131,8 +168,28 @@ def germinate (s,p):
 
     return s
 
-def grow (s, p): #DURAN 2006
-    
+@process(inputs=['germinate', 'lateral', 'hveg', 'dhveg', 'dzbveg', 'rhoveg', 'zb', 'zs'],
+         outputs=['dhveg', 'hveg', 'rhoveg', 'germinate', 'lateral'])
+def grow (s, p, dt): #DURAN 2006
+    '''Growth of vegetation following Duran (2006)
+
+    Parameters
+    ----------
+    s : dict
+        Spatial grids
+    p : dict
+        Model configuration parameters
+    dt : float
+        Time step over which vegetation grows, including the
+        numerical acceleration factor
+
+    Returns
+    -------
+    dict
+        Spatial grids
+
+    '''
+
     ix = np.logical_or(s['germinate'] != 0., s['lateral'] != 0.) * ( p['V_ver'] > 0.)
                                                     
 
@@ -151,7 +208,7 @@ def grow (s, p): #DURAN 2006
         # plt.show()
 
     # Adding growth
-    s['hveg'] += s['dhveg']*(p['dt'] * p['accfac']) / (365.25*24.*3600.)
+    s['hveg'] += s['dhveg']*dt / (365.25*24.*3600.)
 
     # Compute the density
 
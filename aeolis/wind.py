@@ -35,6 +35,8 @@ import matplotlib.pyplot as plt
 
 # package modules
 import aeolis.shear
+import aeolis.forcing
+import aeolis.transport
 from aeolis.utils import *
 
 
@@ -69,6 +71,9 @@ def initialize(s, p):
     return s
    
     
+@process(outputs=['uw', 'udir', 'uws', 'uwn', 'ustar', 'ustars', 'ustarn', 'ustar0',
+                  'tau', 'taus', 'taun'],
+         volatile=True)
 def interpolate(s, p, t):
     '''Interpolate wind velocity and direction to current time step
 
@@ -95,15 +100,57 @@ def interpolate(s, p, t):
 
     '''
         
+    # Compute wind shear velocity
+    kappa = p['kappa']
+    z     = p['z']
+#    z0    = (np.sum(p['grain_size'])/p['nfractions']) / 30.
+    z0    = p['k']
+    
+    # log-profile factor from wind velocity to shear velocity
+    fac = kappa / np.log(z/z0)
+
     if p['process_wind'] and p['wind_file'] is not None:
 
-        uw_t = p['wind_file'][:,0]
-        uw_s = p['wind_file'][:,1]
-        uw_d = p['wind_file'][:,2] / 180. * np.pi
+        # the wind forcing is spatially uniform, so all derived
+        # quantities are computed once as scalars and only broadcast
+        # to the spatial grids afterwards
+        f = aeolis.forcing.interpolate(p, t)
+        uw = f['uw']
+        udir = np.arctan2(f['sin_udir'], f['cos_udir']) * 180. / np.pi
+
+        uws = - uw * np.sin((-p['alfa'] + udir) / 180. * np.pi)                # alfa [deg] is real world grid cell orientation (clockwise)
+        uwn = - uw * np.cos((-p['alfa'] + udir) / 180. * np.pi)
+
+        if p['ny'] == 0:
+            uwn = 0.
+
+        ustars = uws * fac
+        ustarn = uwn * fac
+        ustar  = np.hypot(ustars, ustarn)
+
+        # shear stress, see :func:`velocity_stress`
+        tau = p['rhoa'] * ustar ** 2
+        if ustar > 0.:
+            taus = tau * ustars / ustar
+            taun = tau * ustarn / ustar
+        else:
+            taus = taun = 0.
 
-        s['uw'][:,:] = interp_circular(t, uw_t, uw_s)
-        s['udir'][:,:] = np.arctan2(interp_circular(t, uw_t, np.sin(uw_d)),
-                                    interp_circular(t, uw_t, np.cos(uw_d))) * 180. / np.pi
+        shp = s['zb'].shape
+
+        s['uw'][:,:] = np.abs(uw)
+        s['udir'][:,:] = udir
+        s['uws'] = np.full(shp, uws)
+        s['uwn'] = np.full(shp, uwn)
+        s['ustars'] = np.full(shp, ustars)
+        s['ustarn'] = np.full(shp, ustarn)
+        s['ustar'] = np.full(shp, ustar)
+        s['ustar0'] = np.full(shp, ustar)
+        s['taus'][:,:] = taus
+        s['taun'][:,:] = taun
+        s['tau'] = np.full(shp, np.hypot(taus, taun))
+
+        return s
 
     s['uws'] = - s['uw'] * np.sin((-p['alfa'] + s['udir']) / 180. * np.pi)        # alfa [deg] is real world grid cell orientation (clockwise)
     s['uwn'] = - s['uw'] * np.cos((-p['alfa'] + s['udir']) / 180. * np.pi)
@@ -114,14 +161,8 @@ def interpolate(s, p, t):
         
     s['uw'] = np.abs(s['uw'])
     
-    # Compute wind shear velocity
-    kappa = p['kappa']
-    z     = p['z']
-#    z0    = (np.sum(p['grain_size'])/p['nfractions']) / 30.
-    z0    = p['k']                                                                                                              
-    
-    s['ustars'] = s['uws'] * kappa / np.log(z/z0)
-    s['ustarn'] = s['uwn'] * kappa / np.log(z/z0) 
+    s['ustars'] = s['uws'] * fac
+    s['ustarn'] = s['uwn'] * fac
     s['ustar']  = np.hypot(s['ustars'], s['ustarn'])
     
     s['ustar0'] = s['ustar'].copy()
@@ -130,30 +171,68 @@ def interpolate(s, p, t):
     
     return s
 
+@process(inputs=['uw', 'udir', 'zb', 'zne', 'tau', 'taus', 'taun', 'ustar', 'ustars', 'ustarn'],
+         outputs=['tau', 'taus', 'taun', 'ustar', 'ustars', 'ustarn', 'hsep', 'zsep'],
+         params=['_shear'])
 def shear(s,p):
     
     # Compute shear velocity field (including separation)
 
     if 'shear' in s.keys() and p['process_shear']:
+
+        # the wind shear perturbation is relative to the undisturbed
+        # wind shear and only depends on the topography and wind
+        # direction, within ``dt_shear`` from its computation the
+        # perturbed wind shear is scaled with the undisturbed wind
+        # shear, unless the wind direction changed more than
+        # ``dudir_shear``
+        rel = p.get('_shear')
+        if rel is not None \
+           and np.abs((s['udir'][0,0] - rel['udir'] + 180.) % 360. - 180.) <= p['dudir_shear'] \
+           and p['_time'] < rel['time'] + p['dt_shear']:
+            
+            s['taus'] = s['tau'] * rel['taus']
+            s['taun'] = s['tau'] * rel['taun']
+            s['tau'] = np.hypot(s['taus'], s['taun'])
+            
+            s = stress_velocity(s,p)
+            
+            if p['process_separation']:
+                s['hsep'] = rel['hsep'].copy()
+                s['zsep'] = s['hsep'] + s['zb']
+
+        else:
         
-        s['shear'].set_topo(s['zb'].copy())
-        s['shear'].set_shear(s['taus'], s['taun'])
-        
-        s['shear'](u0=s['uw'][0,0],
-                   udir=s['udir'][0,0] + p['alfa'],
-                   process_separation = p['process_separation'],
-                   c = p['c_b'],
-                   mu_b = p['mu_b'])
-
-        s['taus'], s['taun'] = s['shear'].get_shear()
-        s['tau'] = np.hypot(s['taus'], s['taun'])                               # set minimum of tau to zero
-               
-        s = stress_velocity(s,p)
-                               
-        # Returns separation surface     
-        if p['process_separation']:
-            s['hsep'] = s['shear'].get_separation()
-            s['zsep'] = s['hsep'] + s['zb']
+            tau0 = s['tau'].copy()
+            
+            s['shear'].set_topo(s['zb'].copy())
+            s['shear'].set_shear(s['taus'], s['taun'])
+            
+            s['shear'](u0=s['uw'][0,0],
+                       udir=s['udir'][0,0] + p['alfa'],
+                       process_separation = p['process_separation'],
+                       c = p['c_b'],
+                       mu_b = p['mu_b'])
+
+            s['taus'], s['taun'] = s['shear'].get_shear()
+            s['tau'] = np.hypot(s['taus'], s['taun'])                               # set minimum of tau to zero
+                   
+            s = stress_velocity(s,p)
+                                   
+            # Returns separation surface     
+            if p['process_separation']:
+                s['hsep'] = s['shear'].get_separation()
+                s['zsep'] = s['hsep'] + s['zb']
+
+            # store relative wind shear
+            if p['dt_shear'] > 0. and np.all(tau0 > 0.):
+                p['_shear'] = dict(time=p['_time'],
+                                   udir=s['udir'][0,0],
+                                   taus=s['taus'] / tau0,
+                                   taun=s['taun'] / tau0,
+                                   hsep=s['hsep'].copy())
+            else:
+                p.pop('_shear', None)
     
     if p['process_nelayer']:
 
@@ -161,8 +240,6 @@ def shear(s,p):
         ustars = s['ustars'].copy()
         ustarn = s['ustarn'].copy()
             
-        s['zne'][:,:] = p['ne_file']
-            
         ix = s['zb'] <= s['zne']
         s['ustar'][ix] = np.maximum(0., s['ustar'][ix] - (s['zne'][ix]-s['zb'][ix])* (1/p['layer_thickness']) * s['ustar'][ix])
         
@@ -205,5 +282,196 @@ def stress_velocity(s, p):
     return s
 
 
+def potential_transport(uw, p):
+    '''Compute potential sediment transport for wind velocities
+
+    The potential sediment transport is the sediment flux over a
+    flat, dry and unlimited bed following the transport formulation
+    selected by ``method_transport``, weighted over the initial
+    distribution of sediment fractions. The shear velocity follows
+    from the logarithmic wind profile and the threshold from the
+    grain size only.
+
+    Parameters
+    ----------
+    uw : numpy.ndarray
+        Wind velocity
+    p : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    numpy.ndarray
+        Potential sediment transport
+
+    See Also
+    --------
+    transport.concentration
+
+    '''
+
+    ustar = np.abs(np.asarray(uw, dtype=float)) * p['kappa'] / np.log(p['z'] / p['k'])
+
+    d = np.asarray(makeiterable(p['grain_size']), dtype=float)
+    w = normalize(np.asarray(makeiterable(p['grain_dist']), dtype=float))
+    uth = p['Aa'] * np.sqrt((p['rhog'] - p['rhoa']) / p['rhoa'] * p['g'] * d)
+
+    # the concentration times the grain speed is the sediment flux
+    ustar = ustar[...,np.newaxis]
+    q = aeolis.transport.concentration(ustar, uth, np.ones(ustar.shape), p)
+    q[(ustar <= uth) | ~np.isfinite(q)] = 0.
+
+    return np.sum(q * w, axis=-1)
+
+
+def reduce_conditions(wind, p, nspeeds=4, ndirections=8):
+    '''Reduce wind time series to representative wind conditions
+
+    Bins the wind time series into classes of wind speed and
+    direction that are each representative for an equal share of the
+    total potential sediment transport. The wind direction is binned
+    in ``ndirections`` sectors centered around north. The wind speed
+    of each class is chosen such that the potential sediment
+    transport during the duration of the class equals the potential
+    sediment transport of all records in the class. The wind
+    direction of each class is the transport-weighted mean direction.
+    Records without potential sediment transport are combined in a
+    single calm class with the mean wind speed and direction.
+
+    Parameters
+    ----------
+    wind : numpy.ndarray
+        Wind time series with columns time, wind velocity and wind
+        direction, see ``wind_file``
+    p : dict
+        Model configuration parameters
+    nspeeds : int, optional
+        Number of wind speed classes
+    ndirections : int, optional
+        Number of wind direction sectors
+
+    Returns
+    -------
+    numpy.ndarray
+        Representative wind conditions with columns wind velocity,
+        wind direction, weight and potential sediment transport,
+        ordered by direction sector and wind speed, starting with the
+        calm class
+
+    See Also
+    --------
+    potential_transport
+    reduce_schedule
+
+    '''
+
+    wind = np.asarray(wind, dtype=float)
+    t = wind[:,0]
+    uw = np.abs(wind[:,1])
+    udir = np.mod(wind[:,2], 360.)
+
+    # duration of each record
+    dt = np.diff(t)
+    dt = np.append(dt, np.mean(dt) if len(dt) else 1.)
+    weight = dt / np.sum(dt)
+
+    q = potential_transport(uw, p)
+    calm = q <= 0.
+
+    # speed classes with equal shares of potential transport
+    ix = np.argsort(uw)
+    Q = np.cumsum(q[ix] * dt[ix])
+    if Q[-1] > 0.:
+        edges = np.interp(np.linspace(0., Q[-1], nspeeds + 1)[1:-1], Q, uw[ix])
+    else:
+        edges = []
+    ispeed = np.digitize(uw, edges)
+
+    # direction sectors centered around north
+    width = 360. / ndirections
+    idir = np.mod(np.floor((udir + width / 2.) / width), ndirections).astype(int)
+
+    # tabulate potential transport to invert it
+    utab = np.linspace(0., np.max(uw), 1001)
+    qtab = potential_transport(utab, p)
+    i0 = max(0, np.argmax(qtab > 0.) - 1)
+
+    conditions = []
+    if np.any(calm):
+        conditions.append((np.sum(uw[calm] * dt[calm]) / np.sum(dt[calm]),
+                           mean_direction(udir[calm], dt[calm]),
+                           np.sum(weight[calm]),
+                           0.))
+
+    for i in range(ndirections):
+        for j in range(nspeeds):
+            ix = ~calm & (idir == i) & (ispeed == j)
+            if not np.any(ix):
+                continue
+
+            qmean = np.sum(q[ix] * dt[ix]) / np.sum(dt[ix])
+            conditions.append((np.interp(qmean, qtab[i0:], utab[i0:]),
+                               mean_direction(udir[ix], q[ix] * dt[ix]),
+                               np.sum(weight[ix]),
+                               qmean))
+
+    return np.asarray(conditions)
+
+
+def reduce_schedule(conditions, duration):
+    '''Compose wind time series from representative wind conditions
+
+    Each representative wind condition is applied for a period
+    proportional to its weight, in the order given. The wind velocity
+    and direction change within one second between conditions.
+
+    Parameters
+    ----------
+    conditions : numpy.ndarray
+        Representative wind conditions, see
+        :func:`reduce_conditions`
+    duration : float
+        Duration of the wind time series
+
+    Returns
+    -------
+    numpy.ndarray
+        Wind time series with columns time, wind velocity and wind
+        direction, see ``wind_file``
+
+    '''
+
+    conditions = np.asarray(conditions)
+
+    t = np.append(0., np.cumsum(conditions[:,2]) * duration)
+
+    schedule = np.zeros((2 * len(conditions), 3))
+    schedule[0::2,0] = t[:-1]
+    schedule[1::2,0] = np.maximum(t[:-1], t[1:] - 1.)
+    schedule[:,1] = np.repeat(conditions[:,0], 2)
+    schedule[:,2] = np.repeat(conditions[:,1], 2)
+
+    return schedule
+
+
+def mean_direction(udir, weights):
+    '''Compute weighted mean direction
+
+    Parameters
+    ----------
+    udir : numpy.ndarray
+        Directions in degrees
+    weights : numpy.ndarray
+        Weights
+
+    Returns
+    -------
+    float
+        Mean direction in degrees between 0 and 360
+
+    '''
 
+    rad = np.deg2rad(udir)
 
+    return np.mod(np.rad2deg(np.arctan2(np.sum(weights * np.sin(rad)),
+                                        np.sum(weights * np.cos(rad)))), 360.)
@@ -0,0 +1,124 @@
+'''This module compares the avalanching methods in avalanching.py. It
+uses the initial bed of the barchan case in ``dune
+development/barchan``, of which the lee side is steepened into a slip
+face that exceeds the static angle of repose, and reports the number
+of iterations, the runtime and the volume error of each method. If
+Numba is available, each method is also timed with the compiled
+kernel.
+
+Run from the repository root::
+
+    python benchmarks/bench_avalanching.py
+
+'''
+
+import os
+import copy
+import timeit
+import numpy as np
+
+import aeolis
+
+
+# barchan case
+CASE = os.path.join(os.path.dirname(__file__), '..', 'dune development', 'barchan')
+
+# slope of slip face
+SLOPE = 1.
+
+# methods
+METHODS = ['explicit', 'redblack']
+
+
+def get_slipface():
+    '''Returns the barchan bed with a slip face and the model configuration
+
+    Returns
+    -------
+    dict
+        Spatial grids
+    dict
+        Model configuration parameters
+
+    '''
+
+    zb = np.loadtxt(os.path.join(CASE, 'z.txt'))
+    zne = np.loadtxt(os.path.join(CASE, 'ne_file.txt'))
+
+    # steepen lee side of dune
+    ny, nx = zb.shape
+    i = np.argmax(zb.max(axis=0))
+    x = np.arange(nx)
+    zb[:,i:] = np.maximum(0., zb[:,i:i+1] - SLOPE * (x[i:] - i))
+
+    p = aeolis.constants.DEFAULT_CONFIG.copy()
+    p.update({
+        'process_avalanche':True,
+        'nx':nx-1,
+        'ny':ny-1,
+    })
+
+    s = {
+        'zb':zb,
+        'zne':np.minimum(zne, zb),
+        'ds':np.ones((ny, nx)),
+        'dn':np.ones((ny, nx)),
+        'gradh':np.zeros((ny, nx)),
+        'theta_stat':p['theta_stat'],
+        'theta_dyn':p['theta_dyn'],
+    }
+
+    return s, p
+
+
+def bench(method, jit=False, number=3):
+    '''Time a single avalanching call for a given method
+
+    Parameters
+    ----------
+    method : str
+        Name of avalanching method
+    jit : bool
+        Use compiled kernel
+    number : int
+        Number of repetitions
+
+    Returns
+    -------
+    float
+        Best time per avalanching call in seconds
+    dict
+        Spatial grids after avalanching
+    dict
+        Avalanching statistics
+
+    '''
+
+    s0, p = get_slipface()
+    p['method_avalanche'] = method
+    p['jit'] = jit
+
+    def run():
+        s = copy.deepcopy(s0)
+        aeolis.avalanching.avalanche(s, p)
+        return s
+
+    t = min(timeit.repeat(run, number=1, repeat=number))
+
+    return t, run(), p['_avalanche']
+
+
+if __name__ == '__main__':
+    s0, p = get_slipface()
+    print('grid: %d x %d, slip face slope: %.2f' % (p['ny']+1, p['nx']+1, SLOPE))
+    print('%-10s %5s %10s %10s %12s %12s %12s' % ('method', 'jit', 'iterations', 'cells',
+                                                   'time [ms]', 'volume err.', 'max. slope'))
+    for method in METHODS:
+        for jit in [False, True][:1+aeolis.kernels.HAVE_NUMBA]:
+            t, s, stats = bench(method, jit=jit)
+            err = np.abs(s['zb'].sum() - s0['zb'].sum()) / s0['zb'].sum()
+            max_grad_h, _, _ = aeolis.avalanching.calc_gradients(s['zb'], p['nx']+1, p['ny']+1,
+                                                                 s['ds'], s['dn'], s['zne'])
+            print('%-10s %5s %10d %10d %12.1f %12.2e %12.3f' % (method, jit, stats['iterations'], stats['cells'],
+                                                                 t * 1e3, err, max_grad_h))
+            assert err < p['max_error'], 'Volume not conserved'
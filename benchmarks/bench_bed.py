@@ -0,0 +1,92 @@
+'''This module times the bed composition update in bed.py. It uses
+the erosion-dominated and deposition-dominated mixed cases from
+tests/test_bed.py, repeated over a large grid with many bed layers,
+to expose the cost of the layer exchange.
+
+Run from the repository root::
+
+    python benchmarks/bench_bed.py
+
+'''
+
+import copy
+import timeit
+import numpy as np
+
+import aeolis
+
+
+# dimensions
+NX = 999
+NY = 199
+NL = 10
+NF = 4
+
+# erosion/deposition rates
+ED2 = 35.
+
+# parameters
+P = aeolis.constants.DEFAULT_CONFIG.copy()
+P.update({
+    '_time':0.,
+    'process_bedupdate':True,
+    'nx':NX,
+    'ny':NY,
+    'nlayers':NL,
+    'nfractions':NF,
+    'thlyr':.1,
+    'rhop':2650.,
+    'porosity':.4,
+    'grain_dist':np.ones((NF,)),
+})
+
+# variables
+S = {
+    'uw':np.ones((NY+1, NX+1)),
+    'zb':np.zeros((NY+1, NX+1)),
+    'zb0':np.zeros((NY+1, NX+1)),
+    'zs':np.zeros((NY+1, NX+1)),
+    'pickup':np.zeros((NY+1, NX+1, NF)),
+    'mass':np.ones((NY+1, NX+1, NL, NF)) / NF * P['rhop'] * (1. - P['porosity']) * P['thlyr'],
+    'thlyr': np.ones((NY+1, NX+1, NL)) * P['thlyr'],
+}
+
+CASES = {
+    'erosion_mixed':[ED2, ED2, -ED2, 0.],
+    'deposition_mixed':[-ED2, -ED2, ED2, 0.],
+}
+
+
+def bench(pickup, number=5):
+    '''Time a single bed update for a given pickup per fraction
+
+    Parameters
+    ----------
+    pickup : list
+        Pickup per fraction applied to all grid cells
+    number : int
+        Number of repetitions
+
+    Returns
+    -------
+    float
+        Best time per bed update in seconds
+
+    '''
+
+    s = copy.deepcopy(S)
+    s['pickup'][:,:,:] = pickup
+    mass = s['mass'].copy()
+
+    def run():
+        s['mass'][...] = mass
+        s['pickup'][:,:,:] = pickup
+        aeolis.bed.update(s, P)
+
+    return min(timeit.repeat(run, number=1, repeat=number))
+
+
+if __name__ == '__main__':
+    print('grid: %d x %d, layers: %d, fractions: %d' % (NY+1, NX+1, NL, NF))
+    for name, pickup in CASES.items():
+        print('%-20s %8.2f ms' % (name, bench(pickup) * 1e3))
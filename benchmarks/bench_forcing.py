@@ -0,0 +1,105 @@
+'''This module compares the interpolation of the forcing time series
+by the compiled forcing in forcing.py with the circular interpolation
+of each individual forcing time series. The wind, tide, wave and
+meteorological time series span a year with a resolution of 10
+minutes and are interpolated at subsequent time steps of 60
+seconds.
+
+Run from the repository root::
+
+    python benchmarks/bench_forcing.py
+
+'''
+
+import timeit
+import numpy as np
+
+import aeolis
+from aeolis.utils import interp_circular, interp_array
+
+
+# duration of forcing time series
+DURATION = 365. * 24. * 3600.
+
+# time resolution of forcing time series
+DT_FORCING = 600.
+
+# time step
+DT = 60.
+
+# number of time steps
+N = 2000
+
+
+def get_params():
+    '''Returns model configuration parameters with forcing time series'''
+
+    t = np.arange(0., DURATION + 1., DT_FORCING)
+    r = np.random.uniform(0, 1, (len(t), 5))
+
+    return dict(wind_file=np.column_stack((t, 10. * r[:,0], 360. * r[:,1])),
+                tide_file=np.column_stack((t, r[:,2])),
+                wave_file=np.column_stack((t, r[:,3])),
+                meteo_file=np.column_stack([t] + [r[:,4]] * 5))
+
+
+def bench_circular(p, number=3):
+    '''Time circular interpolation of each forcing time series
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+    number : int
+        Number of repetitions
+
+    Returns
+    -------
+    float
+        Best time per time step in seconds
+
+    '''
+
+    def run():
+        for t in np.arange(N) * DT:
+            uw_t = p['wind_file'][:,0]
+            uw_d = p['wind_file'][:,2] / 180. * np.pi
+            interp_circular(t, uw_t, p['wind_file'][:,1])
+            interp_circular(t, uw_t, np.sin(uw_d))
+            interp_circular(t, uw_t, np.cos(uw_d))
+            interp_circular(t, p['tide_file'][:,0], p['tide_file'][:,1])
+            interp_circular(t, p['wave_file'][:,0], p['wave_file'][:,1])
+            interp_array(t, p['meteo_file'][:,0], p['meteo_file'][:,1:], circular=True)
+
+    return min(timeit.repeat(run, number=1, repeat=number)) / N
+
+
+def bench_compiled(p, number=3):
+    '''Time interpolation of the compiled forcing
+
+    Parameters
+    ----------
+    p : dict
+        Model configuration parameters
+    number : int
+        Number of repetitions
+
+    Returns
+    -------
+    float
+        Best time per time step in seconds
+
+    '''
+
+    def run():
+        for t in np.arange(N) * DT:
+            aeolis.forcing.interpolate(p, t)
+
+    return min(timeit.repeat(run, number=1, repeat=number)) / N
+
+
+if __name__ == '__main__':
+    p = get_params()
+    print('forcing: %d records, time steps: %d' % (len(p['wind_file']), N))
+    print('%-20s %8.2f us' % ('circular', bench_circular(p) * 1e6))
+    print('%-20s %8.2f us' % ('compiled', bench_compiled(p) * 1e6))
@@ -0,0 +1,86 @@
+'''This module times the generation of wind time series by the
+WindGenerator class in model.py. The Markov chain that determines
+the wind speed states is walked by the kernel in kernels.py if Numba
+is available, or by the vectorized NumPy implementation otherwise.
+Both are timed, as well as the interpreted kernel.
+
+Run from the repository root::
+
+    python benchmarks/bench_wind.py
+
+'''
+
+import timeit
+import numpy as np
+
+import aeolis
+
+
+# duration of wind time series
+DURATION = 365. * 24. * 3600.
+
+# time resolution
+DT = 60.
+
+
+def bench(number=3):
+    '''Time the generation of a wind time series
+
+    Parameters
+    ----------
+    number : int
+        Number of repetitions
+
+    Returns
+    -------
+    float
+        Best time per wind time series in seconds
+
+    '''
+
+    wind = aeolis.model.WindGenerator(dt=DT)
+
+    def run():
+        wind.generate(duration=DURATION)
+
+    return min(timeit.repeat(run, number=1, repeat=number))
+
+
+def bench_kernel(jit=True, number=3):
+    '''Time the Markov chain kernel
+
+    Parameters
+    ----------
+    jit : bool or None
+        Use compiled kernel, or the vectorized NumPy implementation
+        if None
+    number : int
+        Number of repetitions
+
+    Returns
+    -------
+    float
+        Best time per Markov chain in seconds
+
+    '''
+
+    wind = aeolis.model.WindGenerator(dt=DT)
+    r = np.random.uniform(0, 1, (int(DURATION / DT),))
+    kernel = aeolis.kernels.markov_chain
+    if not jit:
+        kernel = kernel.py_func
+    if jit is None:
+        kernel = wind.markov_chain
+
+    def run():
+        kernel(wind.MTMcum, r, 0)
+
+    return min(timeit.repeat(run, number=1, repeat=number))
+
+
+if __name__ == '__main__':
+    print('duration: %d days, time step: %d s' % (DURATION / 86400., DT))
+    print('%-20s %8.2f ms' % ('generate', bench() * 1e3))
+    print('%-20s %8.2f ms' % ('markov chain (numpy)', bench_kernel(None) * 1e3))
+    for jit in [False, True][:1+aeolis.kernels.HAVE_NUMBA]:
+        print('%-20s %8.2f ms' % ('markov chain (jit=%s)' % jit, bench_kernel(jit) * 1e3))
@@ -55,6 +55,10 @@ setup(
         'scipy',
         'numpy',
     ],
+    extras_require={
+        'jit': ['numba'],
+        'numexpr': ['numexpr'],
+    },
     python_requires='>=2.7, <4',
     tests_require=[
         'nose'
@@ -63,6 +67,7 @@ setup(
     entry_points={'console_scripts': [
         'aeolis = aeolis.console:aeolis',
         'aeolis-wind = aeolis.console:wind',
+        'aeolis-wind-reduce = aeolis.console:wind_reduce',
     ]},
     include_package_data=True,
 )
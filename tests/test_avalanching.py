@@ -0,0 +1,119 @@
+'''This module tests the functions in avalanching.py. Avalanching
+should conserve the bed volume and reduce bed slopes steeper than the
+static angle of repose to the dynamic angle of repose, while leaving
+the bed unaffected away from the slip face.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import numpy as np
+import copy
+
+import aeolis
+
+
+# dimensions
+NX = 99
+NY = 49
+
+# parameters
+P = aeolis.constants.DEFAULT_CONFIG.copy()
+P.update({
+    'process_avalanche':True,
+    'nx':NX,
+    'ny':NY,
+})
+
+# variables
+S = {
+    'zb':np.zeros((NY+1, NX+1)),
+    'zne':np.zeros((NY+1, NX+1)) - 10.,
+    'ds':np.ones((NY+1, NX+1)),
+    'dn':np.ones((NY+1, NX+1)),
+    'gradh':np.zeros((NY+1, NX+1)),
+    'theta_stat':P['theta_stat'],
+    'theta_dyn':P['theta_dyn'],
+}
+
+
+def get_slipface():
+    '''Returns model state with a gentle stoss slope and an over-steepened slip face'''
+
+    s = copy.deepcopy(S)
+    x, y = np.meshgrid(np.arange(NX+1), np.arange(NY+1))
+    s['zb'][:,:] = np.maximum(0., 2. * np.exp(-((y - NY / 2.) / 10.)**2) * (1. - np.abs(x - 50.) / 20.))
+    s['zb'][:,51:] = 0.
+    return s
+
+
+def test_trivial():
+    '''Test if a flat bed does not avalanche'''
+
+    s = copy.deepcopy(S)
+    p = P.copy()
+    s = aeolis.avalanching.avalanche(s, p)
+
+    assert_equal_array(s['zb'],
+                       S['zb'],
+                       msg='Bed level changed')
+
+    assert_equal(p['_avalanche']['iterations'], 0)
+
+
+def assert_slipface(method):
+    '''Convenience function to test whether avalanching on a slip face conserves volume, reduces the bed slope and only affects the slip face
+
+    Parameters
+    ----------
+    method : str
+        Name of avalanching method
+
+    '''
+
+    s1 = get_slipface()
+    s2 = copy.deepcopy(s1)
+    p = P.copy()
+    p['method_avalanche'] = method
+    s2 = aeolis.avalanching.avalanche(s2, p)
+
+    assert_greater(p['_avalanche']['iterations'], 0)
+
+    assert_almost_equal(s2['zb'].sum(),
+                        s1['zb'].sum(),
+                        msg='Bed volume not conserved')
+
+    max_grad_h, _, _ = aeolis.avalanching.calc_gradients(s2['zb'], NX+1, NY+1, s2['ds'], s2['dn'], s2['zne'])
+    assert_less(max_grad_h,
+                np.tan(np.deg2rad(P['theta_stat'])),
+                msg='Bed slope not reduced')
+
+    assert_equal_array(s2['zb'][:,:40],
+                       s1['zb'][:,:40],
+                       msg='Bed level changed away from slip face')
+
+    assert_equal(p['_avalanche']['cells'],
+                 np.sum(s2['zb'] != s1['zb']))
+
+
+def test_slipface_explicit():
+    '''Test avalanching on a slip face with explicit relaxation'''
+
+    assert_slipface('explicit')
+
+
+def test_slipface_redblack():
+    '''Test avalanching on a slip face with red-black relaxation'''
+
+    assert_slipface('redblack')
+
+
+@raises(ValueError)
+def test_unknown_method():
+    '''Test if an unknown avalanching method raises an error'''
+
+    s = get_slipface()
+    p = P.copy()
+    p['method_avalanche'] = 'unknown'
+    aeolis.avalanching.avalanche(s, p)
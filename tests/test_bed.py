@@ -48,6 +48,7 @@ P.update({
 S = {
     'uw':np.ones((NY+1, NX+1)),
     'zb':np.zeros((NY+1, NX+1)),
+    'zb0':np.zeros((NY+1, NX+1)),
     'zs':np.zeros((NY+1, NX+1)),
     'pickup':np.zeros((NY+1, NX+1, NF)),
     'mass':np.ones((NY+1, NX+1, NL, NF)) / NF * P['rhop'] * (1. - P['porosity']) * P['thlyr'],
@@ -208,6 +209,25 @@ def test_deposition_progressive():
                              msg='Bed level did not increase')
 
 
+def test_deposition_burial():
+    '''Test if deposition of multiple layer masses buries the existing layers under fresh deposits'''
+
+    d = np.asarray([.6, .3, .1, 0.])
+    
+    s = copy.deepcopy(S)
+    s['pickup'][0,0,:] = -2.5 * S['mass'][0,0,0,:].sum() * d
+    s = aeolis.bed.update(s, P)
+    assert_continuity(s)
+
+    assert_almost_equal_array(s['mass'][0,0,:2,:] / s['mass'][0,0,:2,:].sum(axis=-1, keepdims=True),
+                              d[np.newaxis,:].repeat(2, axis=0),
+                              msg='Top layers not filled with deposits')
+
+    assert_almost_equal_array(s['mass'][0,0,2,:],
+                              S['mass'][0,0,0,:],
+                              msg='Existing layers not buried')
+
+    
 def test_mixtoplayer_small():
     '''Test if mixing of top layers is mass conservative if mixing depth is smaller than the total bed layer thickness'''
 
@@ -223,3 +243,17 @@ def test_mixtoplayer_large():
     s['Hs'] *= 10.
     s = aeolis.bed.mixtoplayer(s, P)
     assert_continuity(s)
+
+
+def test_mixtoplayer_nowaves():
+    '''Test if mixing of top layers leaves the bed composition unaffected in the absence of waves'''
+
+    s = copy.deepcopy(S)
+    s['mass'][:,:,0,:] = np.asarray([.6, .3, .1, 0.]) * S['mass'][:,:,0,:].sum(axis=-1, keepdims=True)
+    s['Hs'][:,:] = 0.
+    s = aeolis.bed.mixtoplayer(s, P)
+    assert_continuity(s)
+
+    assert_equal_array(s['mass'][:,:,0,:],
+                       np.asarray([.6, .3, .1, 0.]) * S['mass'][:,:,0,:].sum(axis=-1, keepdims=True),
+                       msg='Bed composition changed')
@@ -0,0 +1,140 @@
+'''This module tests the functions in forcing.py. Interpolation of
+the compiled forcing should be equivalent to circular interpolation
+of each individual forcing time series.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import aeolis
+
+
+# forcing time series
+T = np.arange(0., 7201., 600.)
+WIND = np.column_stack((T, 10. + np.sin(T / 1000.), np.mod(T / 20., 360.)))
+TIDE = np.column_stack((T, np.cos(T / 2000.)))
+WAVE = np.column_stack((T[::3], 1. + T[::3] / 7200.))
+METEO = np.column_stack([np.arange(0., 3601., 900.)] + [np.arange(5.) + i for i in range(5)])
+
+# times, including times beyond the time series
+TIMES = [0., 300., 600., 3599.5, 3600.5, 7000., 7200., 7200.5, 7201., 9000., 20000.]
+
+
+def get_params(**kwargs):
+    '''Returns model configuration parameters with forcing time series'''
+
+    p = dict(wind_file=WIND, tide_file=TIDE, wave_file=None, meteo_file=None)
+    p.update(kwargs)
+    return p
+
+
+def test_interpolate_same_axis():
+    '''Test if time series with the same time axis are interpolated identically'''
+
+    p = get_params()
+    for t in TIMES:
+        f = aeolis.forcing.interpolate(p, t)
+        assert_equal(f['uw'], aeolis.utils.interp_circular(t, T, WIND[:,1]))
+        assert_equal(f['zs'], aeolis.utils.interp_circular(t, T, TIDE[:,1]))
+
+    assert_equal(len(p['_forcing']['timelines']), 1)
+
+
+def test_interpolate_common_axis():
+    '''Test if time series with the same time range are aligned on a common time axis'''
+
+    p = get_params(wave_file=WAVE)
+    for t in TIMES:
+        f = aeolis.forcing.interpolate(p, t)
+        assert_almost_equal(f['uw'], aeolis.utils.interp_circular(t, T, WIND[:,1]))
+        assert_almost_equal(f['Hs'], aeolis.utils.interp_circular(t, WAVE[:,0], WAVE[:,1]))
+
+    assert_equal(len(p['_forcing']['timelines']), 1)
+
+
+def test_interpolate_different_range():
+    '''Test if time series with a different time range are repeated independently'''
+
+    p = get_params(meteo_file=METEO)
+    for t in TIMES:
+        f = aeolis.forcing.interpolate(p, t)
+        assert_equal(f['zs'], aeolis.utils.interp_circular(t, T, TIDE[:,1]))
+        assert_equal(f['P'], aeolis.utils.interp_circular(t, METEO[:,0], METEO[:,5]))
+
+    assert_equal(len(p['_forcing']['timelines']), 2)
+
+
+def test_recompile():
+    '''Test if replaced forcing time series are recompiled'''
+
+    p = get_params()
+    aeolis.forcing.interpolate(p, 300.)
+
+    p['tide_file'] = TIDE * [1., 2.]
+    f = aeolis.forcing.interpolate(p, 300.)
+    assert_equal(f['zs'], 2. * aeolis.utils.interp_circular(300., T, TIDE[:,1]))
+
+
+def write_forcing(path, f):
+    '''Write forcing time series in text, NumPy and netCDF format'''
+
+    fnames = [os.path.join(path, 'forcing.txt'),
+              os.path.join(path, 'forcing.npy')]
+
+    np.savetxt(fnames[0], f)
+    np.save(fnames[1], f)
+
+    if aeolis.forcing.HAVE_NETCDF:
+        fnames.append(os.path.join(path, 'forcing.nc'))
+        with aeolis.forcing.netCDF4.Dataset(fnames[-1], 'w') as nc:
+            nc.createDimension('time', len(f))
+            for i, name in enumerate(['time', 'uw', 'udir']):
+                nc.createVariable(name, 'f8', ('time',))[:] = f[:,i]
+
+    return fnames
+
+
+def test_load():
+    '''Test if forcing files are read entirely in all formats'''
+
+    path = tempfile.mkdtemp()
+    try:
+        for fname in write_forcing(path, WIND):
+            assert_equal_array(aeolis.forcing.load(fname), WIND)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_interpolate_window():
+    '''Test if forcing read in windows is interpolated identically'''
+
+    path = tempfile.mkdtemp()
+    try:
+        for fname in write_forcing(path, WIND):
+            p = get_params(wind_file=fname, forcing_window=1000.)
+            p['_readers'] = {'wind_file':aeolis.forcing.ForcingReader(fname, 1000., stride=3)}
+            for t in TIMES + TIMES[::-1]:
+                f = aeolis.forcing.interpolate(p, t)
+                assert_equal(f['uw'], aeolis.utils.interp_circular(t, T, WIND[:,1]))
+                assert_equal(f['zs'], aeolis.utils.interp_circular(t, T, TIDE[:,1]))
+                assert_less(len(p['_readers']['wind_file'].chunk), len(WIND))
+    finally:
+        shutil.rmtree(path)
+
+
+def test_load_realization():
+    '''Test if realization is read from ensemble of forcing time series'''
+
+    path = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(path, 'ensemble.npy')
+        np.save(fname, np.stack((WIND, WIND * [1., 2., 1.])))
+        assert_equal_array(aeolis.forcing.load(fname, realization=1), WIND * [1., 2., 1.])
+    finally:
+        shutil.rmtree(path)
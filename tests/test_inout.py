@@ -0,0 +1,64 @@
+'''This module tests the functions in inout.py. Model configurations
+with the same input data should have the same hash, such that
+spun-up bed compositions can be reused.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import aeolis
+
+
+def get_params(**kwargs):
+    '''Returns model configuration parameters'''
+
+    p = dict(bed_file=np.linspace(-5., 5., 100),
+             grain_size=[150e-6, 250e-6],
+             tstop=3600.,
+             _private=1.)
+    p.update(kwargs)
+    return p
+
+
+def test_hash_equal():
+    '''Test if equal configurations have equal hashes'''
+
+    assert_equal(aeolis.inout.get_hash(get_params()),
+                 aeolis.inout.get_hash(get_params(bed_file=np.linspace(-5., 5., 100),
+                                                  _private=2.)))
+
+
+def test_hash_array():
+    '''Test if arrays are hashed by their contents'''
+
+    assert_not_equal(aeolis.inout.get_hash(get_params()),
+                     aeolis.inout.get_hash(get_params(bed_file=np.linspace(-5., 6., 100))))
+
+
+def test_hash_exclude():
+    '''Test if excluded parameters are not hashed'''
+
+    assert_not_equal(aeolis.inout.get_hash(get_params()),
+                     aeolis.inout.get_hash(get_params(tstop=7200.)))
+    assert_equal(aeolis.inout.get_hash(get_params(), exclude=['tstop']),
+                 aeolis.inout.get_hash(get_params(tstop=7200.), exclude=['tstop']))
+
+
+def test_hash_file():
+    '''Test if files are hashed by their contents'''
+
+    path = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(path, 'wind.txt')
+        np.savetxt(fname, [[0., 10., 0.]])
+        h = aeolis.inout.get_hash(get_params(wind_file=fname))
+        np.savetxt(fname, [[0., 12., 0.]])
+        assert_not_equal(aeolis.inout.get_hash(get_params(wind_file=fname)), h)
+    finally:
+        shutil.rmtree(path)
@@ -0,0 +1,173 @@
+'''This module tests the functions in kernels.py. The loop-based
+kernels should be equivalent to the vectorized NumPy implementations
+they replace. The kernels are tested compiled if Numba is available
+and interpreted otherwise.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import numpy as np
+import copy
+
+import aeolis
+
+
+# dimensions
+NX = 29
+NY = 14
+
+# parameters
+P = aeolis.constants.DEFAULT_CONFIG.copy()
+P.update({
+    'process_avalanche':True,
+    'nx':NX,
+    'ny':NY,
+    'jit':False,
+})
+
+# variables
+S = {
+    'zb':np.zeros((NY+1, NX+1)),
+    'zne':np.zeros((NY+1, NX+1)) - 10.,
+    'ds':np.ones((NY+1, NX+1)),
+    'dn':np.ones((NY+1, NX+1)),
+    'gradh':np.zeros((NY+1, NX+1)),
+    'theta_stat':P['theta_stat'],
+    'theta_dyn':P['theta_dyn'],
+}
+
+
+def get_slipface(ny=NY):
+    '''Returns model state with an over-steepened slip face'''
+
+    s = {k:v[:ny+1,:] if isinstance(v, np.ndarray) else v
+         for k, v in copy.deepcopy(S).items()}
+    x, y = np.meshgrid(np.arange(NX+1), np.arange(ny+1))
+    s['zb'][:,:] = np.maximum(0., 2. * np.exp(-((y - ny / 2.) / 4.)**2) * (1. - np.abs(x - 15.) / 10.))
+    s['zb'][:,16:] = 0.
+    return s
+
+
+def assert_avalanche(method, ny=NY):
+    '''Convenience function to test whether the avalanching kernel is equivalent to the NumPy implementation
+
+    Parameters
+    ----------
+    method : str
+        Name of avalanching method
+    ny : int
+        Number of grid cells in y-direction
+
+    '''
+
+    p = P.copy()
+    p.update({'method_avalanche':method, 'ny':ny})
+
+    s1 = aeolis.avalanching.avalanche(get_slipface(ny), p)
+    n1 = p['_avalanche']['iterations']
+
+    s2 = get_slipface(ny)
+    E = 0.2 if method == 'explicit' else p['relax_avalanche']
+    n2 = aeolis.kernels.avalanche(s2['zb'], s2['zne'], s2['ds'], s2['dn'],
+                                  np.tan(np.deg2rad(p['theta_dyn'])),
+                                  E, 1 if method == 'explicit' else 2,
+                                  p['max_iter_ava'], ny == 0)
+
+    assert_greater(n1, 0)
+    assert_equal(n1, n2)
+
+    assert_almost_equal_array(s1['zb'],
+                              s2['zb'],
+                              msg='Bed level differs')
+
+
+def test_avalanche_explicit():
+    '''Test explicit avalanching kernel'''
+
+    assert_avalanche('explicit')
+
+
+def test_avalanche_redblack():
+    '''Test red-black avalanching kernel'''
+
+    assert_avalanche('redblack')
+
+
+def test_avalanche_1d():
+    '''Test avalanching kernel in 1D'''
+
+    assert_avalanche('explicit', ny=0)
+
+
+def test_markov_chain():
+    '''Test Markov chain kernel'''
+
+    wind = aeolis.model.WindGenerator()
+    r = np.random.uniform(0, 1, (1000,))
+
+    states = []
+    state = 0
+    for r1 in r:
+        state = next(j for j,v in enumerate(wind.MTMcum[state]) if v > r1)
+        states.append(state)
+
+    assert_equal_array(aeolis.kernels.markov_chain(wind.MTMcum, r, 0),
+                       np.asarray(states),
+                       msg='States differ')
+
+
+def test_markov_chain_vectorized():
+    '''Test if vectorized Markov chain equals kernel'''
+
+    wind = aeolis.model.WindGenerator()
+    for n in [1, 10, 1001]:
+        r = np.random.uniform(0, 1, (n,))
+        assert_equal_array(wind.markov_chain(wind.MTMcum, r, 5),
+                           aeolis.kernels.markov_chain(wind.MTMcum, r, 5),
+                           msg='States differ')
+
+
+def test_markov_chain_ensemble():
+    '''Test if vectorized Markov chains equal kernel'''
+
+    wind = aeolis.model.WindGenerator()
+    r = np.random.uniform(0, 1, (4, 1001))
+    states = wind.markov_chain(wind.MTMcum, r, 5)
+    for i in range(4):
+        assert_equal_array(states[i],
+                           aeolis.kernels.markov_chain(wind.MTMcum, r[i], 5),
+                           msg='States differ')
+
+
+def test_wind_generator_seed():
+    '''Test if wind generator with the same seed generates the same wind time series'''
+
+    u1 = aeolis.model.WindGenerator(seed=1).generate(duration=3600.)[:]
+    u2 = aeolis.model.WindGenerator(seed=1).generate(duration=3600.)[:]
+
+    assert_equal_array(u1, u2)
+
+
+def test_wind_generator_global_seed():
+    '''Test if wind generator without seed uses the global random state'''
+
+    np.random.seed(1)
+    u1 = aeolis.model.WindGenerator().generate(duration=3600.)[:]
+    np.random.seed(1)
+    u2 = aeolis.model.WindGenerator().generate(duration=3600.)[:]
+
+    assert_equal_array(u1, u2)
+
+
+def test_wind_generator_ensemble():
+    '''Test if first realization of seeded wind ensemble equals wind time series'''
+
+    u = aeolis.model.WindGenerator(seed=1).generate(duration=3600.)[:]
+    ensemble = aeolis.model.WindGenerator(seed=1).generate_ensemble(n=3, duration=3600.,
+                                                                    direction=90.,
+                                                                    direction_std=10.)
+
+    assert_equal(ensemble.shape, (3, len(u), 3))
+    assert_equal_array(ensemble[0,:,1], u)
@@ -0,0 +1,523 @@
+'''This module tests the time stepping in model.py. Model runs on a
+small sloping beach with a steady onshore wind are compared to
+reference runs with the same configuration.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import aeolis
+from aeolis.model import AeoLiS, AeoLiSRunner
+
+
+def write_model(path, wind=12., **kwargs):
+    '''Writes model configuration of sloping beach
+
+    Parameters
+    ----------
+    path : str
+        Model directory
+    wind : float or numpy.ndarray
+        Wind speed or wind time series
+    kwargs : dict
+        Model configuration parameters
+
+    Returns
+    -------
+    str
+        Model configuration file
+
+    '''
+
+    x, y = np.meshgrid(np.arange(0., 60., 2.), np.arange(0., 6., 2.))
+    z = -2. + .1 * x
+
+    if np.isscalar(wind):
+        wind = [[0., wind, 270.], [1e6, wind, 270.]]
+
+    files = dict(xgrid_file=x, ygrid_file=y, bed_file=z, wind_file=wind)
+    for k, v in files.items():
+        files[k] = os.path.join(path, '%s.txt' % k.replace('_file', ''))
+        np.savetxt(files[k], v)
+
+    p = dict(nx=29,
+             ny=2,
+             dt=600.,
+             tstop=3600.,
+             nfractions=3,
+             nlayers=4,
+             grain_size='0.00015 0.00025 0.0005',
+             grain_dist='0.3 0.5 0.2',
+             layer_thickness=.01,
+             scheme='euler_backward',
+             solver='trunk',
+             process_separation='F',
+             output_times=3600.,
+             output_vars='zb Ct mass',
+             spinup_cache=os.path.join(path, 'spinup'))
+    p.update(files)
+    p.update(kwargs)
+
+    configfile = os.path.join(path, 'aeolis.txt')
+    with open(configfile, 'w') as fp:
+        for k, v in p.items():
+            if isinstance(v, bool):
+                v = 'T' if v else 'F'
+            fp.write('%s = %s\n' % (k, v))
+
+    return configfile
+
+
+def test_spinup():
+    '''Test if spin-up converges, resets the model state and is read from cache'''
+
+    path = tempfile.mkdtemp()
+    try:
+        configfile = write_model(path, spinup=True, tol_spinup=.003, spinup_max_steps=200)
+        model = AeoLiSRunner(configfile)
+        model.initialize()
+
+        assert_greater(model.get_count('spinup.steps'), 1)
+        assert_less(model.get_count('spinup.steps'), 200)
+        assert_equal(model.t, 0.)
+        assert_equal(model.get_count('time'), 0)
+        assert_equal(model.n, 0)
+        assert_almost_equal_array(model.s['zb'], -2. + .1 * model.s['x'])
+        assert_equal(model.p['accfac'], 1.)
+        assert_equal(model.p['solver'], 'trunk')
+        assert_equal(len(os.listdir(os.path.join(path, 'spinup'))), 1)
+
+        # spun-up bed composition differs from initial composition
+        gs = model.s['mass'][:,:,0,:] / model.s['mass'][:,:,0,:].sum(axis=-1, keepdims=True)
+        assert_greater(np.max(np.abs(gs - model.p['grain_dist'])), .01)
+
+        mass = model.s['mass'].copy()
+        model.update()
+        assert_equal(model.get_count('time'), 1)
+        assert_equal(model.n, 1)
+
+        # spun-up bed composition is read from cache
+        model = AeoLiSRunner(configfile)
+        model.initialize()
+        assert_equal(model.get_count('spinup.steps'), 0)
+        assert_equal_array(model.s['mass'], mass)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_incremental():
+    '''Test if skipped processes restore the results of their previous execution'''
+
+    path = tempfile.mkdtemp()
+    try:
+        models = []
+        for incremental in [False, True]:
+            model = AeoLiS(write_model(path, incremental=incremental))
+            model.initialize()
+            while model.t < model.p['tstop']:
+                model.update()
+            models.append(model)
+
+        assert_greater(models[1].get_count('avalanching.angele_of_repose.skipped'), 0)
+        for k in ['zb', 'mass', 'Ct', 'pickup', 'uth', 'Cu', 'ustar']:
+            assert_equal_array(models[0].s[k], models[1].s[k])
+    finally:
+        shutil.rmtree(path)
+
+
+def test_incremental_rerun():
+    '''Test if processes are executed if their inputs or parameters changed'''
+
+    @aeolis.utils.process(inputs=['zb'], outputs=['Ct'], params=['accfac'])
+    def scale(s, p):
+        s['Ct'][...] = s['zb'][:,:,np.newaxis] * p['accfac']
+        return s
+
+    path = tempfile.mkdtemp()
+    try:
+        model = AeoLiS(write_model(path, incremental=True))
+        model.initialize()
+        model.run_process(scale)
+        Ct = model.s['Ct'].copy()
+
+        # unchanged inputs and parameters
+        model.s['Ct'][...] = 0.
+        model.run_process(scale)
+        assert_equal(model.get_count('test_model.scale'), 1)
+        assert_equal(model.get_count('test_model.scale.skipped'), 1)
+        assert_equal_array(model.s['Ct'], Ct)
+
+        # changed spatial grid
+        model.s['zb'] += 1.
+        model.run_process(scale)
+        assert_equal(model.get_count('test_model.scale'), 2)
+        assert_almost_equal_array(model.s['Ct'], Ct + 1.)
+
+        # changed parameter
+        model.p['accfac'] = 2.
+        model.run_process(scale)
+        assert_equal(model.get_count('test_model.scale'), 3)
+        assert_almost_equal_array(model.s['Ct'], 2. * Ct + 2.)
+
+        # changed model configuration
+        model.run_process(scale)
+        model.set_var('tstop', 7200.)
+        model.run_process(scale)
+        assert_equal(model.get_count('test_model.scale'), 4)
+        assert_equal(model.get_count('test_model.scale.skipped'), 2)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_accfac():
+    '''Test if the acceleration factor grows, is lowered, is bounded and rescales the concentration'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model = AeoLiS(write_model(path, accfac_adaptive=True, accfac_max=10., tol_accfac=.01))
+        model.initialize()
+
+        def check(accfac, dzb, expected, **kwargs):
+            model.p['accfac'] = accfac
+            model.s['dzb'][...] = dzb
+            model.s['Ct'][...] = 1.
+            model.update_accfac(**kwargs)
+            assert_almost_equal(model.p['accfac'], expected)
+            assert_almost_equal_array(model.s['Ct'], expected / accfac)
+
+        # growth
+        check(2., 0., 2.2)
+        check(2., .005, 2.2)
+
+        # lowered if bed level change exceeds stability limit
+        check(4., .02, 1.8)
+
+        # lowered if avalanching occurred
+        check(4., 0., 4. / 1.1, avalanched=True)
+
+        # bounds
+        check(10., 0., 10.)
+        check(4., 1., 1.)
+
+        # restored after truncation to hit output time
+        check(.5, 0., 8., truncated=8.)
+        check(.5, .1, 1., truncated=8.)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_accfac_output_times():
+    '''Test if the acceleration factor is truncated to hit the output times'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model = AeoLiS(write_model(path, tstop=7200., accfac_adaptive=True, accfac_max=100.,
+                                   tol_accfac=1.))
+        model.initialize()
+
+        times = [model.t]
+        while model.t < model.p['tstop']:
+            model.update()
+            assert_almost_equal(model.t - times[-1], model.dt * model.s['accfaceff'][0,0])
+            times.append(model.t)
+
+        assert_greater(np.max(np.diff(times)), model.p['dt'])
+        assert_in(3600., times)
+        assert_equal(times[-1], 7200.)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_accfac_incremental():
+    '''Test if the equilibrium sediment concentration is recomputed if the acceleration factor changes'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model = AeoLiS(write_model(path, incremental=True))
+        model.initialize()
+        model.update()
+
+        # equilibrium sediment concentration is both read and written
+        model.run_process(aeolis.transport.equilibrium)
+        model.run_process(aeolis.transport.equilibrium)
+        Cu = model.s['Cu'].copy()
+        model.run_process(aeolis.transport.equilibrium)
+        assert_equal(model.get_count('transport.equilibrium.skipped'), 1)
+
+        model.p['accfac'] = 2.
+        model.run_process(aeolis.transport.equilibrium)
+        assert_equal(model.get_count('transport.equilibrium.skipped'), 1)
+        assert_almost_equal_array(model.s['Cu'], 2. * Cu)
+    finally:
+        shutil.rmtree(path)
+
+
+def run_adaptive(path, **kwargs):
+    '''Runs model with adaptive time step during a storm
+
+    Returns
+    -------
+    AeoLiS
+        Model
+    list
+        Model times
+    list
+        Time steps
+
+    '''
+
+    wind = [[0., 4., 270.], [3600., 4., 270.], [3601., 16., 270.], [1e6, 16., 270.]]
+    model = AeoLiS(write_model(path, wind=wind, tstop=7200., dt_adaptive=True, **kwargs))
+    model.initialize()
+
+    times, dts = [model.t], []
+    while model.t < model.p['tstop']:
+        model.update()
+        times.append(model.t)
+        dts.append(model.dt)
+
+    return model, times, dts
+
+
+def test_adaptive_rollback():
+    '''Test if rejected time steps are rolled back exactly'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model, times, dts = run_adaptive(path, dt_min=10., dt_max=1800.)
+        assert_greater(model.get_count('rejected'), 0)
+        assert_equal(model.get_count('time'), len(dts))
+        assert_equal(model.get_count('accfac'), len(dts))
+
+        # repeat accepted time steps only
+        reference = AeoLiS(write_model(path, wind=model.p['wind_file'], tstop=7200.))
+        reference.initialize()
+        for dt in dts:
+            AeoLiS.update(reference, dt)
+
+        assert_almost_equal(model.t, reference.t)
+        for k, v in model.s.items():
+            if isinstance(v, np.ndarray):
+                assert_equal_array(v, reference.s[k])
+
+        # run statistics only include accepted time steps
+        for k in ['wind.shear', 'transport.equilibrium', 'bed.update', 'matrixsolve']:
+            assert_equal(model.get_count(k), reference.get_count(k))
+    finally:
+        shutil.rmtree(path)
+
+
+def test_adaptive_notconverged():
+    '''Test if a time step that did not converge is rejected once'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model = AeoLiS(write_model(path, wind=4., dt_adaptive=True))
+        model.initialize()
+
+        # first attempt does not converge
+        run_process = model.run_process
+        attempts = []
+        def run_process_notconverged(func, *args):
+            run_process(func, *args)
+            if func is aeolis.bed.update:
+                attempts.append(model.t)
+                if len(attempts) == 1:
+                    model._count('notconverged')
+        model.run_process = run_process_notconverged
+
+        model.update()
+        assert_equal(len(attempts), 2)
+        assert_equal(model.get_count('rejected'), 1)
+        assert_equal(model.get_count('notconverged'), 0)
+        assert_equal(model.get_count('time'), 1)
+        assert_equal(model.get_count('bed.update'), 1)
+        assert_almost_equal(model.t, model.p['dt'] / 2.)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_adaptive_timestep():
+    '''Test if adaptive time step hits output times and is bounded'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model, times, dts = run_adaptive(path, dt_min=10., dt_max=1800.)
+
+        # output times are hit exactly
+        assert_in(3600., times)
+        assert_equal(times[-1], 7200.)
+
+        # time step grows during calm conditions and shrinks during
+        # the storm, unless truncated to hit output times
+        truncated = np.mod(times[1:], model.p['output_times']) == 0.
+        dts = np.asarray(dts)
+        assert_true(np.all(dts[~truncated] >= model.p['dt_min']))
+        assert_true(np.all(dts <= model.p['dt_max']))
+        assert_greater(np.max(np.diff(dts)), 0.)
+        assert_less(np.min(np.diff(dts)), 0.)
+        assert_greater(np.max(dts), model.p['dt'])
+        assert_less(np.min(dts[np.asarray(times[:-1]) > 3600.]), model.p['dt'])
+    finally:
+        shutil.rmtree(path)
+
+
+def test_output_statistics():
+    '''Test if output statistics are weighted by the time step'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model = AeoLiSRunner(write_model(path, output_vars='zb_avg zb_var zb_sum'))
+        model.initialize()
+
+        model.s['zb'][...] = 1.
+        model.output_update(100.)
+        model.s['zb'][...] = 2.
+        model.output_update(300.)
+
+        assert_almost_equal_array(model.get_statistic('zb', 'avg'), 1.75)
+        assert_almost_equal_array(model.get_statistic('zb', 'var'), .375)
+        assert_almost_equal_array(model.get_statistic('zb', 'sum'), 3.)
+
+        # equal time steps
+        model.output_clear()
+        for zb in [1., 2., 4.]:
+            model.s['zb'][...] = zb
+            model.output_update(600.)
+
+        assert_almost_equal_array(model.get_statistic('zb', 'avg'), 7. / 3.)
+        assert_almost_equal_array(model.get_statistic('zb', 'var'), np.var([1., 2., 4.], ddof=1))
+    finally:
+        shutil.rmtree(path)
+
+
+def test_fastforward():
+    '''Test if skipping periods without transport does not change the model state'''
+
+    path = tempfile.mkdtemp()
+    try:
+        models = []
+        for fastforward in [False, True]:
+            model = AeoLiS(write_model(path, wind=1., tstop=7200., fastforward=fastforward))
+            model.initialize()
+            while model.t < model.p['tstop']:
+                model.update()
+            models.append(model)
+
+        assert_equal(models[0].get_count('time'), 12)
+        assert_equal(models[1].get_count('time'), 1)
+        assert_equal(models[1].get_count('fastforward'), 2)
+        assert_equal(models[1].get_count('fastforward.steps'), 11)
+        assert_equal(models[1].get_count('avalanching.avalanche'), 3)
+        assert_equal(models[0].t, models[1].t)
+        for k in ['zb', 'moist', 'salt', 'mass', 'Ct']:
+            assert_almost_equal_array(models[0].s[k], models[1].s[k])
+        assert_almost_equal_array(models[0].s['dzbavg'], 0.)
+        assert_almost_equal_array(models[1].s['dzbavg'], 0.)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_fastforward_threshold():
+    '''Test if skipping periods without transport stops at the first time step above the threshold'''
+
+    path = tempfile.mkdtemp()
+    try:
+        wind = [[0., 1., 270.], [3000., 1., 270.], [3001., 16., 270.], [1e6, 16., 270.]]
+        model = AeoLiS(write_model(path, wind=wind, tstop=7200., output_times=7200.,
+                                   fastforward=True))
+        model.initialize()
+
+        # threshold is not known before first time step
+        model.update()
+        assert_equal(model.t, 600.)
+
+        model.update()
+        assert_equal(model.t, 3600.)
+        assert_equal(model.get_count('fastforward.steps'), 5)
+
+        model.update()
+        assert_equal(model.t, 4200.)
+        assert_equal(model.get_count('fastforward'), 1)
+        assert_greater(np.max(model.s['Ct']), 0.)
+    finally:
+        shutil.rmtree(path)
+
+
+def test_multirate():
+    '''Test if multi-rate processes are executed at their own interval'''
+
+    path = tempfile.mkdtemp()
+    try:
+        model = AeoLiS(write_model(path, process_vegetation=True, dt_vegetation=1800.,
+                                   dt_avalanche=1800., dt_shear=1200.))
+        model.initialize()
+
+        times = []
+        while model.t < model.p['tstop']:
+            model.update()
+            times.append(model.p['_shear']['time'])
+
+        assert_equal(model.get_count('time'), 6)
+        assert_equal(model.get_count('avalanching.avalanche'), 2)
+        assert_equal(model.get_count('vegetation.germinate'), 2)
+        assert_equal(model.get_count('vegetation.grow'), 2)
+        assert_equal(model.tp['vegetation'], 3600.)
+        assert_equal(times, [0., 0., 1200., 1200., 2400., 2400.])
+    finally:
+        shutil.rmtree(path)
+
+
+def test_shear_direction():
+    '''Test if wind shear perturbation is recomputed if the wind direction changes'''
+
+    path = tempfile.mkdtemp()
+    try:
+        wind = [[0., 12., 270.], [1200., 12., 270.], [1800., 12., 290.], [1e6, 12., 290.]]
+        model = AeoLiS(write_model(path, wind=wind, dt_shear=3600., dudir_shear=10.))
+        model.initialize()
+
+        times = []
+        while model.t < model.p['tstop']:
+            model.update()
+            times.append(model.p['_shear']['time'])
+
+        assert_equal(times, [0., 0., 0., 1800., 1800., 1800.])
+    finally:
+        shutil.rmtree(path)
+
+
+def test_shear_rescale():
+    '''Test if rescaled wind shear equals recomputed wind shear if the wind direction is unchanged'''
+
+    path = tempfile.mkdtemp()
+    try:
+        wind = [[0., 10., 270.], [600., 14., 270.], [1e6, 14., 270.]]
+        model = AeoLiS(write_model(path, wind=wind, dt_shear=3600.))
+        model.initialize()
+
+        def shear(t):
+            model.p['_time'] = t
+            model.run_process(aeolis.wind.interpolate, t)
+            model.run_process(aeolis.wind.shear)
+            return {k:model.s[k].copy() for k in ['tau', 'taus', 'taun', 'ustar', 'ustars', 'ustarn']}
+
+        shear(0.)
+        rescaled = shear(600.)
+        assert_equal(model.p['_shear']['time'], 0.)
+
+        model.p.pop('_shear')
+        recomputed = shear(600.)
+        assert_equal(model.p['_shear']['time'], 600.)
+
+        for k in rescaled.keys():
+            assert_greater(np.max(recomputed[k]), 0.)
+            assert_almost_equal_array(rescaled[k], recomputed[k])
+    finally:
+        shutil.rmtree(path)
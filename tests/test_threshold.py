@@ -0,0 +1,95 @@
+'''This module tests the functions in threshold.py. Contributions to
+the wind velocity threshold are cached and should only be recomputed
+if their inputs changed.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import numpy as np
+
+import aeolis
+
+
+# dimensions
+NX = 9
+NY = 4
+NF = 3
+
+# parameters
+P = aeolis.constants.DEFAULT_CONFIG.copy()
+P.update({
+    'nx':NX,
+    'ny':NY,
+    'nfractions':NF,
+    'grain_size':np.asarray([150e-6, 300e-6, 1000e-6]),
+    'th_moisture':False,
+})
+
+
+def get_state(zb=0., zs=-1., ustar=.3):
+    '''Returns spatial grids of a dry bed with uniform composition'''
+
+    return {'zb':zb + np.zeros((NY+1, NX+1)),
+            'zs':zs + np.zeros((NY+1, NX+1)),
+            'ustar':ustar + np.zeros((NY+1, NX+1)),
+            'mass':np.ones((NY+1, NX+1, 1, NF)),
+            'threshold_mask':np.ones((NY+1, NX+1)),
+            'uth':np.zeros((NY+1, NX+1, NF)),
+            'uth0':np.zeros((NY+1, NX+1, NF)),
+            'uthf':np.zeros((NY+1, NX+1, NF))}
+
+
+def test_wet_cache():
+    '''Test if the threshold is only recomputed if the wet cells changed'''
+
+    p = P.copy()
+    aeolis.threshold.initialize({}, p)
+
+    s = aeolis.threshold.compute(get_state(), p, 1.)
+    uth = s['uth'].copy()
+    cache = p['_threshold']['uth']
+
+    # bed level changes without flooding, cached threshold is reused
+    s = aeolis.threshold.compute(get_state(zb=.1), p, 1.)
+    assert_true(p['_threshold']['uth'] is cache)
+    assert_equal_array(s['uth'], uth)
+
+    # bed is flooded, threshold is recomputed
+    zb = np.zeros((NY+1, NX+1))
+    zb[:,:2] = -2.
+    s = aeolis.threshold.compute(get_state(zb=zb), p, 1.)
+    assert_false(p['_threshold']['uth'] is cache)
+    assert_true(np.all(np.isinf(s['uth'][:,:2,:])))
+    assert_equal_array(s['uth'][:,2:,:], uth[:,2:,:])
+
+
+def test_roughness_cache():
+    '''Test if the roughness factor is only recomputed if the bed composition or non-erodible fractions changed'''
+
+    p = P.copy()
+    aeolis.threshold.initialize({}, p)
+
+    s = aeolis.threshold.compute(get_state(), p, 1.)
+    uth = s['uth'].copy()
+    cache = p['_threshold']['Rti']
+    assert_true(np.all(cache > 1.))
+
+    # wind changes without changing the non-erodible fractions
+    s = aeolis.threshold.compute(get_state(ustar=.25), p, 1.)
+    assert_true(p['_threshold']['Rti'] is cache)
+    assert_equal_array(s['uth'], uth)
+
+    # all fractions become erodible, roughness factor is recomputed
+    s = aeolis.threshold.compute(get_state(ustar=10.), p, 1.)
+    assert_false(p['_threshold']['Rti'] is cache)
+    assert_almost_equal_array(p['_threshold']['Rti'], 1.)
+
+    # bed composition changes
+    cache = p['_threshold']['Rti']
+    s = get_state()
+    s['mass'][:,:,:,0] = 2.
+    s = aeolis.threshold.compute(s, p, 1.)
+    assert_false(p['_threshold']['Rti'] is cache)
+    assert_less(np.max(s['uth'][:,:,-1]), np.max(uth[:,:,-1]))
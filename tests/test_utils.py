@@ -0,0 +1,49 @@
+'''This module tests the functions in utils.py. Elementwise
+expressions should evaluate to the same result with and without
+numexpr.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import numpy as np
+
+import aeolis
+
+
+# variables
+V = {
+    'ustar':np.linspace(0., 1., 20).reshape((4, 5, 1)),
+    'uth':np.linspace(.1, .3, 3),
+    'u':np.ones((4, 5, 3)),
+    'C':1.5,
+}
+
+# expression and equivalent NumPy result
+EXPR = 'where(ustar > uth, C * (ustar - uth)**3 / u, 0.)'
+RESULT = np.where(V['ustar'] > V['uth'], V['C'] * (V['ustar'] - V['uth'])**3 / V['u'], 0.)
+
+
+def test_evaluate_numpy():
+    '''Test if expression without numexpr equals NumPy result'''
+
+    assert_equal_array(aeolis.utils.evaluate(EXPR, V, use_numexpr=False),
+                       RESULT)
+
+
+def test_evaluate_numexpr():
+    '''Test if expression with numexpr, if available, equals NumPy result'''
+
+    assert_almost_equal_array(aeolis.utils.evaluate(EXPR, V, use_numexpr=True),
+                              RESULT)
+
+
+def test_evaluate_out():
+    '''Test if expression is written into existing array'''
+
+    out = np.zeros((4, 5, 3))
+    aeolis.utils.evaluate(EXPR, V, out=out)
+
+    assert_almost_equal_array(out,
+                              RESULT)
@@ -0,0 +1,70 @@
+'''This module tests the functions in vegetation.py. The vegetation
+shear reduction factor is cached and should only be recomputed if the
+vegetation density changed more than the tolerance.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import numpy as np
+
+import aeolis
+
+
+# dimensions
+NX = 9
+NY = 4
+
+# parameters
+P = aeolis.constants.DEFAULT_CONFIG.copy()
+P.update({
+    'nx':NX,
+    'ny':NY,
+    'veg_tolerance':.01,
+})
+
+
+def get_state(rhoveg):
+    '''Returns spatial grids with uniform wind shear'''
+
+    return {'zb':np.zeros((NY+1, NX+1)),
+            'ustar':np.ones((NY+1, NX+1)),
+            'ustars':np.ones((NY+1, NX+1)),
+            'ustarn':np.zeros((NY+1, NX+1)),
+            'vegfac':np.zeros((NY+1, NX+1)),
+            'rhoveg':rhoveg}
+
+
+def test_vegshear_cache():
+    '''Test if the vegetation factor is only recomputed if the vegetation density changed more than the tolerance'''
+
+    p = P.copy()
+    rhoveg = np.linspace(0., .5, NX+1)[np.newaxis,:].repeat(NY+1, axis=0)
+
+    s = aeolis.vegetation.vegshear(get_state(rhoveg), p)
+    cache = p['_vegfac']
+    vegfac = s['vegfac'].copy()
+    assert_less(np.min(vegfac), 1.)
+    assert_almost_equal_array(s['ustar'], vegfac)
+
+    # change within tolerance, cached vegetation factor is reused
+    s = aeolis.vegetation.vegshear(get_state(rhoveg + .005), p)
+    assert_true(p['_vegfac'] is cache)
+    assert_equal_array(s['vegfac'], vegfac)
+
+    # change exceeds tolerance, vegetation factor is recomputed
+    s = aeolis.vegetation.vegshear(get_state(rhoveg + .02), p)
+    assert_false(p['_vegfac'] is cache)
+    assert_true(np.all(s['vegfac'] < vegfac))
+
+    # cache is compared to the vegetation density of its computation
+    s = aeolis.vegetation.vegshear(get_state(rhoveg + .025), p)
+    assert_equal_array(p['_vegfac']['rhoveg'], rhoveg + .02)
+    s = aeolis.vegetation.vegshear(get_state(rhoveg + .035), p)
+    assert_equal_array(p['_vegfac']['rhoveg'], rhoveg + .035)
+
+    # no tolerance, vegetation factor is recomputed upon any change
+    p['veg_tolerance'] = 0.
+    s = aeolis.vegetation.vegshear(get_state(rhoveg + .036), p)
+    assert_equal_array(p['_vegfac']['rhoveg'], rhoveg + .036)
@@ -0,0 +1,70 @@
+'''This module tests the functions in wind.py. Representative wind
+conditions should reproduce the potential sediment transport and the
+duration of the full wind time series.
+
+'''
+
+from nose.tools import *
+from .tools import *
+
+import numpy as np
+
+import aeolis
+
+
+# parameters
+P = aeolis.constants.DEFAULT_CONFIG.copy()
+P.update({
+    'grain_size':[150e-6, 250e-6, 500e-6],
+    'grain_dist':[.3, .5, .2],
+})
+
+# wind time series
+T = np.arange(0., 86400., 600.)
+WIND = np.column_stack((T,
+                        8. + 6. * np.sin(2. * np.pi * T / 43200.),
+                        np.mod(180. + 90. * np.cos(2. * np.pi * T / 86400.), 360.)))
+
+
+def test_potential_transport_calm():
+    '''Test if wind velocities below the threshold have no potential transport'''
+
+    assert_equal_array(aeolis.wind.potential_transport(np.asarray([0., 1., 2.]), P),
+                       np.zeros((3,)))
+
+
+def test_potential_transport_normalized():
+    '''Test if the potential transport is independent of the scaling of the grain size distribution'''
+
+    p = P.copy()
+    p['grain_dist'] = [3., 5., 2.]
+
+    assert_almost_equal_array(aeolis.wind.potential_transport(WIND[:,1], p),
+                              aeolis.wind.potential_transport(WIND[:,1], P))
+
+
+def test_reduce_conditions():
+    '''Test if representative wind conditions reproduce the potential transport and duration'''
+
+    conditions = aeolis.wind.reduce_conditions(WIND, P, nspeeds=3, ndirections=4)
+
+    assert_almost_equal(np.sum(conditions[:,2]), 1.)
+
+    q = aeolis.wind.potential_transport(WIND[:,1], P)
+    assert_almost_equal(np.sum(conditions[:,2] * conditions[:,3]),
+                        np.mean(q))
+
+    assert_almost_equal(np.sum(conditions[:,2] * aeolis.wind.potential_transport(conditions[:,0], P)) / np.mean(q),
+                        1., places=3)
+
+
+def test_reduce_schedule():
+    '''Test if wind conditions are applied for a duration proportional to their weight'''
+
+    conditions = aeolis.wind.reduce_conditions(WIND, P, nspeeds=3, ndirections=4)
+    schedule = aeolis.wind.reduce_schedule(conditions, 86400.)
+
+    assert_true(np.all(np.diff(schedule[:,0]) >= 0.))
+    assert_almost_equal_array(schedule[2::2,0] - schedule[0:-2:2,0],
+                              conditions[:-1,2] * 86400.)
+    assert_equal_array(schedule[0::2,1], conditions[:,0])